@@ -0,0 +1,61 @@
+"""Compare vectorized bucketing with the scalar reference implementation.
+
+Usage:
+    python -m benchmarks.bucketing --units 1000000
+"""
+import argparse
+import statistics
+import time
+import uuid
+
+from src.bucketing import is_unit_in_sample, units_in_sample
+
+
+def measure_seconds(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--units", type=int, default=1_000_000)
+    parser.add_argument("--scalar-units", type=int, default=100_000)
+    parser.add_argument("--sample-ratio", type=float, default=0.3)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    experiment_id = uuid.uuid4()
+    unit_ids = [str(uuid.uuid4()) for _ in range(args.units)]
+    scalar_unit_ids = unit_ids[: args.scalar_units]
+
+    vectorized = measure_seconds(
+        lambda: units_in_sample(experiment_id, unit_ids, args.sample_ratio),
+        args.repeat,
+    )
+    scalar = measure_seconds(
+        lambda: [
+            is_unit_in_sample(experiment_id, unit_id, args.sample_ratio)
+            for unit_id in scalar_unit_ids
+        ],
+        1,
+    )
+    in_sample = units_in_sample(experiment_id, unit_ids, args.sample_ratio).mean()
+
+    print(f"{'implementation':>14} {'units':>9} {'seconds':>8} {'units/s':>11}")
+    print(
+        f"{'vectorized':>14} {len(unit_ids):>9} {vectorized:>8.3f} "
+        f"{len(unit_ids) / vectorized:>11.0f}"
+    )
+    print(
+        f"{'scalar':>14} {len(scalar_unit_ids):>9} {scalar:>8.3f} "
+        f"{len(scalar_unit_ids) / scalar:>11.0f}"
+    )
+    print(f"in sample: {in_sample:.4f} (target {args.sample_ratio})")
+
+
+if __name__ == "__main__":
+    main()
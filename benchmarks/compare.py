@@ -0,0 +1,61 @@
+"""Compare two harness result files and fail on latency or query regressions.
+
+Usage:
+    python -m benchmarks.compare baseline.json current.json --threshold 0.2
+"""
+import argparse
+import json
+import sys
+
+
+def load_scenarios(path: str) -> dict[str, dict]:
+    with open(path) as results:
+        return {scenario["name"]: scenario for scenario in json.load(results)["scenarios"]}
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    regressions = []
+    for name, scenario in current.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if before["p95_ms"] and scenario["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append(
+                f"{name}: p95 {before['p95_ms']:.2f} ms -> {scenario['p95_ms']:.2f} ms"
+            )
+        before_queries = before["queries_per_request"]
+        queries = scenario["queries_per_request"]
+        if None not in (before_queries, queries) and queries > before_queries:
+            regressions.append(f"{name}: queries {before_queries} -> {queries}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    baseline = load_scenarios(args.baseline)
+    current = load_scenarios(args.current)
+    print(f"{'scenario':>34} {'p95 before':>11} {'p95 after':>10} {'queries':>9}")
+    for name, scenario in current.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        print(
+            f"{name:>34} {before['p95_ms']:>11.2f} {scenario['p95_ms']:>10.2f} "
+            f"{before['queries_per_request']!s:>4}->{scenario['queries_per_request']!s:<4}"
+        )
+
+    regressions = compare(baseline, current, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
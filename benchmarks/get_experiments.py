@@ -0,0 +1,86 @@
+"""Compare the legacy joined listing query with the two-phase one.
+
+Usage:
+    BENCHMARK_DATABASE_URL=postgresql://... python -m benchmarks.get_experiments
+"""
+import argparse
+
+from sqlalchemy import asc, or_
+from sqlalchemy.orm import Session, joinedload
+
+from src.crud.experiment import get_experiments
+from src.models import Experiment, Team
+
+from .utils import QueryStats, get_engine, measure, seed
+
+
+def get_experiments_joined(db: Session, team_name: str | None, limit: int):
+    query = (
+        db.query(Experiment)
+        .join(Experiment.teams)
+        .options(joinedload(Experiment.teams).load_only(Team.id, Team.name))
+        .order_by(asc(Experiment.description))
+    )
+
+    if team_name:
+        filtered_team = db.query(Team).filter(Team.name == team_name).first()
+        query = query.filter(
+            or_(Team.id == filtered_team.id, Team.parent_team == filtered_team.id)
+        )
+
+    return query.limit(limit).all()
+
+
+def get_experiments_two_phase(db: Session, team_name: str | None, limit: int):
+    experiments, _ = get_experiments(db, team_name, limit)
+    return experiments
+
+
+def run_scenario(engine, stats, fn, team_name, limit, repeat):
+    with Session(engine) as db:
+        fn(db, team_name, limit)
+        db.expunge_all()
+        stats.reset()
+        experiments = fn(db, team_name, limit)
+        statements, rows = stats.statements, stats.rows
+
+        def call():
+            db.expunge_all()
+            fn(db, team_name, limit)
+
+        latency = measure(call, repeat)
+
+    return len(experiments), statements, rows, latency
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = get_engine()
+    stats = QueryStats(engine)
+    print(
+        f"{'experiments':>11} {'filter':>8} {'query':>9} {'returned':>8} "
+        f"{'stmts':>5} {'rows':>6} {'p50 ms':>8}"
+    )
+    for size in args.sizes:
+        teams = seed(engine, size)
+        for team_name in (None, teams[0]["name"]):
+            for label, fn in (
+                ("joined", get_experiments_joined),
+                ("two-phase", get_experiments_two_phase),
+            ):
+                returned, statements, rows, latency = run_scenario(
+                    engine, stats, fn, team_name, args.limit, args.repeat
+                )
+                print(
+                    f"{size:>11} {'team' if team_name else 'none':>8} {label:>9} "
+                    f"{returned:>8} {statements:>5} {rows:>6} {latency:>8.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
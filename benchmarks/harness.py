@@ -0,0 +1,578 @@
+"""Run per-route benchmark scenarios and report latency, throughput and queries.
+
+Usage:
+    BENCHMARK_DATABASE_URL=postgresql://... python -m benchmarks.harness \\
+        --experiments 100000 --depth 6 --output results.json
+
+The app runs in-process on the benchmark database, so every scenario also
+reports how many SQL statements one request executes. Pass --base-url to
+drive an already running server instead (query counts are then unavailable).
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import platform
+import statistics
+import subprocess
+import time
+import uuid
+from dataclasses import asdict, dataclass
+
+import httpx
+from sqlalchemy import event
+
+from .utils import get_engine, seed
+
+BULK_SIZE = 50
+BUCKET_UNITS = 1000
+CHANGES_WAIT_SECONDS = 0.1
+# A change feed position no change reaches, so long polls wait out their timeout.
+IDLE_CHANGES_SINCE = 2**62
+STREAM_EVENTS = 100
+FREE_TEAMS = 200
+LOOKUP_TEAMS = 100
+MOVABLE_TEAMS = 100
+UPDATED_EXPERIMENTS = 100
+
+
+@dataclass
+class Scenario:
+    name: str
+    build_request: object
+    requests: int
+    events: int | None = None
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    method: str
+    path: str
+    requests: int
+    errors: int
+    throughput_rps: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    queries_per_request: int | None
+
+
+class BenchmarkState:
+    def __init__(self, teams: list[dict]):
+        self.run_id = uuid.uuid4().hex[:8]
+        self.counter = itertools.count()
+        self.teams = teams
+        self.roots = [team for team in teams if team["parent_team"] is None]
+        parent_ids = {team["parent_team"] for team in teams}
+        self.leaves = [team for team in teams if team["id"] not in parent_ids]
+        self.free_team_ids = []
+        self.movable_team_ids = []
+        self.move_parent_ids = []
+        self.experiment_ids = []
+
+    def next_name(self, prefix: str) -> str:
+        return f"bench-{self.run_id}-{prefix}-{next(self.counter)}"
+
+    def pick(self, items: list, index: int):
+        return items[index % len(items)]
+
+
+async def prepare(client: httpx.AsyncClient, state: BenchmarkState):
+    names = [state.next_name("free") for _ in range(FREE_TEAMS + MOVABLE_TEAMS + 2)]
+    response = await client.post(
+        "/teams/bulk",
+        content="".join(json.dumps({"name": name}) + "\n" for name in names),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    response.raise_for_status()
+    response = await client.get("/export/teams")
+    ids_by_name = {
+        team["name"]: team["id"]
+        for team in map(json.loads, response.text.splitlines())
+    }
+    team_ids = [ids_by_name[name] for name in names]
+    state.free_team_ids = team_ids[:FREE_TEAMS]
+    state.movable_team_ids = team_ids[FREE_TEAMS : FREE_TEAMS + MOVABLE_TEAMS]
+    state.move_parent_ids = team_ids[FREE_TEAMS + MOVABLE_TEAMS :]
+
+    response = await client.post(
+        "/experiments/bulk",
+        json=[
+            experiment_payload(state, state.pick(state.free_team_ids, index))
+            for index in range(UPDATED_EXPERIMENTS)
+        ],
+    )
+    response.raise_for_status()
+    state.experiment_ids = response.json()["experiment_ids"]
+
+
+def experiment_payload(state: BenchmarkState, team_id: str) -> dict:
+    return {
+        "description": state.next_name("experiment"),
+        "sample_ratio": 0.5,
+        "allowed_team_assignments": 1,
+        "team_ids": [team_id],
+    }
+
+
+def get_scenarios(state: BenchmarkState, requests: int) -> list[Scenario]:
+    deep_leaf = max(state.leaves, key=lambda team: team["name"].count("-"))
+    unit_ids = [f"user-{number}" for number in range(BUCKET_UNITS)]
+    few = max(requests // 10, 5)
+
+    def get(path, **params):
+        return lambda index: ("GET", path, {"params": params})
+
+    return [
+        Scenario("root", get("/"), requests),
+        Scenario("health_db_pool", get("/health/db-pool"), requests),
+        Scenario("metrics", get("/metrics"), requests),
+        Scenario("list_teams", get("/teams/", limit=100), requests),
+        Scenario("list_experiments", get("/experiments/", limit=100), requests),
+        Scenario(
+            "list_experiments_by_team",
+            lambda index: (
+                "GET",
+                "/experiments/",
+                {"params": {"team_name": state.pick(state.roots, index)["name"]}},
+            ),
+            requests,
+        ),
+        Scenario(
+            "list_experiments_by_team_subtree",
+            lambda index: (
+                "GET",
+                "/experiments/",
+                {
+                    "params": {
+                        "team_name": state.pick(state.roots, index)["name"],
+                        "include_descendants": True,
+                    }
+                },
+            ),
+            requests,
+        ),
+        Scenario(
+            "lookup_experiments_by_teams",
+            lambda index: (
+                "POST",
+                "/experiments/by-teams",
+                {
+                    "json": {
+                        "team_names": [
+                            state.pick(state.teams, index * LOOKUP_TEAMS + offset)[
+                                "name"
+                            ]
+                            for offset in range(LOOKUP_TEAMS)
+                        ],
+                        "include_descendants": True,
+                    }
+                },
+            ),
+            requests,
+        ),
+        Scenario(
+            "search_experiments",
+            lambda index: (
+                "GET",
+                "/experiments/search",
+                {"params": {"q": f"experimnt {index % 1000:04d}"}},
+            ),
+            requests,
+        ),
+        Scenario(
+            "autocomplete_experiments",
+            lambda index: (
+                "GET",
+                "/experiments/search",
+                {"params": {"q": f"experiment-00{index % 100:02d}", "prefix": True}},
+            ),
+            requests,
+        ),
+        Scenario(
+            "create_team",
+            lambda index: ("POST", "/teams/", {"json": {"name": state.next_name("team")}}),
+            requests,
+        ),
+        Scenario(
+            "import_teams",
+            lambda index: (
+                "POST",
+                "/teams/bulk",
+                {
+                    "content": "".join(
+                        json.dumps({"name": state.next_name("import")}) + "\n"
+                        for _ in range(BULK_SIZE)
+                    ),
+                    "headers": {"Content-Type": "application/x-ndjson"},
+                },
+            ),
+            few,
+        ),
+        Scenario(
+            "update_team_parent",
+            lambda index: (
+                "PUT",
+                f"/teams/{state.pick(state.movable_team_ids, index)}/parent",
+                {"json": {"parent_team_id": state.pick(state.move_parent_ids, index)}},
+            ),
+            requests,
+        ),
+        Scenario(
+            "create_experiment",
+            lambda index: (
+                "POST",
+                "/experiments/",
+                {
+                    "json": experiment_payload(
+                        state, state.pick(state.free_team_ids, index)
+                    )
+                },
+            ),
+            requests,
+        ),
+        Scenario(
+            "create_experiments_bulk",
+            lambda index: (
+                "POST",
+                "/experiments/bulk",
+                {
+                    "json": [
+                        experiment_payload(
+                            state, state.pick(state.free_team_ids, index + offset)
+                        )
+                        for offset in range(BULK_SIZE)
+                    ]
+                },
+            ),
+            few,
+        ),
+        Scenario(
+            "update_assignments",
+            lambda index: (
+                "PUT",
+                f"/experiments/{state.pick(state.experiment_ids, index)}/teams",
+                {
+                    "params": {
+                        "team_ids": [
+                            state.pick(state.free_team_ids, index * 7 + index // 100)
+                        ]
+                    }
+                },
+            ),
+            requests,
+        ),
+        Scenario(
+            "update_assignments_bulk",
+            lambda index: (
+                "PUT",
+                "/experiments/assignments/bulk",
+                {
+                    "json": [
+                        {
+                            "experiment_id": experiment_id,
+                            "team_ids": [
+                                state.pick(state.free_team_ids, index + offset * 3)
+                            ],
+                        }
+                        for offset, experiment_id in enumerate(state.experiment_ids)
+                    ]
+                },
+            ),
+            few,
+        ),
+        Scenario(
+            "bucket_units",
+            lambda index: (
+                "POST",
+                f"/experiments/{state.pick(state.experiment_ids, index)}/bucket",
+                {"json": {"unit_ids": unit_ids}},
+            ),
+            requests,
+        ),
+        Scenario(
+            "snapshot_team_experiments",
+            lambda index: (
+                "GET",
+                f"/snapshot/teams/{deep_leaf['id']}/experiments",
+                {},
+            ),
+            requests,
+        ),
+        Scenario("changes", get("/changes", limit=100), requests),
+        Scenario(
+            "changes_long_poll",
+            get("/changes", since=IDLE_CHANGES_SINCE, wait=CHANGES_WAIT_SECONDS),
+            few,
+        ),
+        Scenario(
+            "changes_stream", get("/changes/stream"), few, events=STREAM_EVENTS
+        ),
+        Scenario("snapshot_export", get("/snapshot/export"), few),
+        Scenario("export_teams", get("/export/teams"), few),
+        Scenario("export_experiments", get("/export/experiments"), 3),
+    ]
+
+
+class StatementCounter:
+    def __init__(self, engines):
+        self.count = 0
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+
+    def _before_cursor_execute(self, *args):
+        self.count += 1
+
+
+class StreamingASGITransport(httpx.AsyncBaseTransport):
+    # httpx.ASGITransport collects the whole body before it returns, which
+    # never happens for an event stream. This transport hands the body over as
+    # the app sends it and reports a disconnect once the response is closed.
+    def __init__(self, app):
+        self.app = app
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        chunks = asyncio.Queue()
+        started = asyncio.get_running_loop().create_future()
+        closed = asyncio.Event()
+        request_sent = False
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await closed.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                started.set_result(message)
+            elif message["type"] == "http.response.body":
+                await chunks.put(message.get("body", b""))
+                if not message.get("more_body", False):
+                    await chunks.put(None)
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": request.method,
+            "headers": [(key.lower(), value) for key, value in request.headers.raw],
+            "scheme": request.url.scheme,
+            "path": request.url.path,
+            "raw_path": request.url.raw_path.split(b"?")[0],
+            "query_string": request.url.query,
+            "server": (request.url.host, request.url.port),
+            "client": ("127.0.0.1", 123),
+            "root_path": "",
+        }
+        app = asyncio.create_task(self.app(scope, receive, send))
+        await asyncio.wait({app, started}, return_when=asyncio.FIRST_COMPLETED)
+        if not started.done():
+            await app
+            raise RuntimeError("The app finished without starting a response")
+
+        start = started.result()
+        return httpx.Response(
+            start["status"],
+            headers=start.get("headers", []),
+            stream=QueuedByteStream(chunks, closed, app),
+        )
+
+
+class QueuedByteStream(httpx.AsyncByteStream):
+    def __init__(self, chunks: asyncio.Queue, closed: asyncio.Event, app):
+        self.chunks = chunks
+        self.closed = closed
+        self.app = app
+
+    async def __aiter__(self):
+        while (chunk := await self.chunks.get()) is not None:
+            yield chunk
+
+    async def aclose(self):
+        self.closed.set()
+        await self.app
+
+
+async def send(client: httpx.AsyncClient, scenario: Scenario, index: int):
+    method, path, kwargs = scenario.build_request(index)
+    if scenario.events is None:
+        return await client.request(method, path, **kwargs)
+
+    # Event streams never end, so read a fixed number of events and hang up.
+    async with client.stream(method, path, **kwargs) as response:
+        if response.status_code < 400:
+            events = 0
+            async for line in response.aiter_lines():
+                events += line.startswith("id: ")
+                if events == scenario.events:
+                    break
+        return response
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    concurrency: int,
+    counter: StatementCounter | None,
+) -> ScenarioResult:
+    method, path, _ = scenario.build_request(0)
+    await send(client, scenario, 0)
+
+    queries = None
+    if counter is not None:
+        counter.count = 0
+        await send(client, scenario, 1)
+        queries = counter.count
+
+    indexes = iter(range(2, scenario.requests + 2))
+    latencies = []
+    errors = []
+
+    async def worker():
+        for index in indexes:
+            started = time.perf_counter()
+            try:
+                response = await send(client, scenario, index)
+            except httpx.HTTPError as e:
+                errors.append(type(e).__name__)
+                continue
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+            else:
+                latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    quantiles = (
+        statistics.quantiles(latencies, n=100, method="inclusive")
+        if len(latencies) > 1
+        else [latencies[0] if latencies else 0.0] * 99
+    )
+    return ScenarioResult(
+        name=scenario.name,
+        method=method,
+        path=path,
+        requests=len(latencies),
+        errors=len(errors),
+        throughput_rps=round(len(latencies) / elapsed, 2),
+        p50_ms=round(quantiles[49], 3),
+        p95_ms=round(quantiles[94], 3),
+        p99_ms=round(quantiles[98], 3),
+        queries_per_request=queries,
+    )
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args, teams: list[dict], engine) -> dict:
+    counter = None
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=120)
+        stream_client = httpx.AsyncClient(base_url=args.base_url, timeout=120)
+    else:
+        from src import cache, database
+        from src.main import app
+
+        if not args.cache:
+            cache.set_cache(cache.NullCache())
+        # ASGITransport does not run the lifespan that creates the engines.
+        database.init_engines()
+        engines = [database.engine]
+        if database.async_engine is not None:
+            engines.append(database.async_engine.sync_engine)
+        counter = StatementCounter(engines)
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url="http://benchmark",
+            timeout=120,
+        )
+        stream_client = httpx.AsyncClient(
+            transport=StreamingASGITransport(app),
+            base_url="http://benchmark",
+            timeout=120,
+        )
+
+    state = BenchmarkState(teams)
+    results = []
+    async with client, stream_client:
+        await prepare(client, state)
+        for scenario in get_scenarios(state, args.requests):
+            if args.scenario and scenario.name not in args.scenario:
+                continue
+            result = await run_scenario(
+                stream_client if scenario.events else client,
+                scenario,
+                args.concurrency,
+                counter,
+            )
+            results.append(result)
+            print(
+                f"{result.name:>34} {result.requests:>6} {result.errors:>4} "
+                f"{result.throughput_rps:>9.1f} {result.p50_ms:>9.2f} "
+                f"{result.p95_ms:>9.2f} {result.p99_ms:>9.2f} "
+                f"{'-' if result.queries_per_request is None else result.queries_per_request:>7}"
+            )
+
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "dialect": engine.dialect.name,
+            "target": args.base_url or "in-process",
+            "experiments": args.experiments,
+            "depth": args.depth,
+            "teams": len(teams),
+            "concurrency": args.concurrency,
+            "cache": args.cache,
+        },
+        "scenarios": [asdict(result) for result in results],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--experiments", type=int, default=100_000)
+    parser.add_argument("--depth", type=int, default=6)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--scenario", action="append")
+    parser.add_argument("--cache", action="store_true")
+    parser.add_argument("--base-url")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    teams = seed(engine, args.experiments, args.depth)
+    print(
+        f"{'scenario':>34} {'ok':>6} {'err':>4} {'req/s':>9} {'p50 ms':>9} "
+        f"{'p95 ms':>9} {'p99 ms':>9} {'queries':>7}"
+    )
+    results = asyncio.run(run(args, teams, engine))
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Drive concurrent HTTP load against a running app and report throughput.
+
+Start the app in the mode under test, for example:
+    DATABASE_ASYNC=false uvicorn src.main:app --port 8000
+    DATABASE_ASYNC=true uvicorn src.main:app --port 8000
+
+then run:
+    python -m benchmarks.load --base-url http://localhost:8000 --concurrency 200
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+DEFAULT_PATHS = ["/teams/?limit=20", "/experiments/?limit=20"]
+
+
+async def worker(client, paths, deadline, latencies, failures):
+    index = 0
+    while time.perf_counter() < deadline:
+        path = paths[index % len(paths)]
+        index += 1
+        started = time.perf_counter()
+        try:
+            response = await client.get(path)
+            if response.status_code >= 500:
+                failures.append(response.status_code)
+                continue
+        except httpx.HTTPError as e:
+            failures.append(type(e).__name__)
+            continue
+        latencies.append((time.perf_counter() - started) * 1000)
+
+
+async def run(base_url: str, paths: list[str], concurrency: int, duration: float):
+    limits = httpx.Limits(max_connections=concurrency)
+    latencies = []
+    failures = []
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=30
+    ) as client:
+        await client.get("/")
+        deadline = time.perf_counter() + duration
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(
+                worker(client, paths, deadline, latencies, failures)
+                for _ in range(concurrency)
+            )
+        )
+        elapsed = time.perf_counter() - started
+
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else []
+    print(f"requests:    {len(latencies)}")
+    print(f"failures:    {len(failures)}")
+    print(f"throughput:  {len(latencies) / elapsed:.1f} req/s")
+    if quantiles:
+        print(f"latency p50: {quantiles[49]:.1f} ms")
+        print(f"latency p95: {quantiles[94]:.1f} ms")
+        print(f"latency p99: {quantiles[98]:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--path", action="append", dest="paths")
+    args = parser.parse_args()
+    asyncio.run(
+        run(args.base_url, args.paths or DEFAULT_PATHS, args.concurrency, args.duration)
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Compare listing serialization of ORM entities with typed response models.
+
+Usage:
+    BENCHMARK_DATABASE_URL=postgresql://... python -m benchmarks.serialization
+"""
+import argparse
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session, selectinload
+
+from src.crud.experiment import get_experiments
+from src.crud.team import get_teams
+from src.models import Experiment, Team
+from src.pagination import keyset_order
+from src.schemas import ExperimentRead, TeamRead
+
+from .utils import get_engine, measure, seed
+
+
+def load_experiment_entities(db: Session, limit: int):
+    return (
+        db.query(Experiment)
+        .options(selectinload(Experiment.teams).load_only(Team.id, Team.name))
+        .order_by(*keyset_order(Experiment.description, Experiment.id))
+        .limit(limit)
+        .all()
+    )
+
+
+def load_team_entities(db: Session, limit: int):
+    return (
+        db.query(Team)
+        .options(
+            selectinload(Team.experiments).load_only(
+                Experiment.id, Experiment.description
+            )
+        )
+        .order_by(*keyset_order(Team.name, Team.id))
+        .limit(limit)
+        .all()
+    )
+
+
+def encode_entities(items) -> bytes:
+    return JSONResponse(jsonable_encoder(items)).body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--experiments", type=int, default=20_000)
+    parser.add_argument("--limit", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--no-seed", action="store_true")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    if not args.no_seed:
+        seed(engine, args.experiments)
+
+    scenarios = (
+        (
+            "experiments",
+            load_experiment_entities,
+            lambda db, limit: get_experiments(db, None, limit)[0],
+            TypeAdapter(list[ExperimentRead]),
+        ),
+        (
+            "teams",
+            load_team_entities,
+            lambda db, limit: get_teams(db, limit)[0],
+            TypeAdapter(list[TeamRead]),
+        ),
+    )
+
+    print(
+        f"{'listing':>11} {'path':>10} {'rows':>6} {'load ms':>8} "
+        f"{'encode ms':>9} {'bytes':>9}"
+    )
+    for name, load_entities, load_models, adapter in scenarios:
+        for label, load, encode in (
+            ("orm", load_entities, encode_entities),
+            ("projected", load_models, adapter.dump_json),
+        ):
+            with Session(engine) as db:
+                items = load(db, args.limit)
+                body = encode(items)
+
+                def load_page():
+                    db.expunge_all()
+                    load(db, args.limit)
+
+                load_ms = measure(load_page, args.repeat)
+                encode_ms = measure(lambda: encode(items), args.repeat)
+            print(
+                f"{name:>11} {label:>10} {len(items):>6} {load_ms:>8.1f} "
+                f"{encode_ms:>9.1f} {len(body):>9}"
+            )
+
+
+if __name__ == "__main__":
+    main()
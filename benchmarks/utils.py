@@ -0,0 +1,145 @@
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+BENCHMARK_DATABASE_URL = os.getenv("BENCHMARK_DATABASE_URL")
+
+if not BENCHMARK_DATABASE_URL:
+    sys.exit("Set BENCHMARK_DATABASE_URL to a disposable database before running.")
+
+os.environ["DATABASE_URL"] = BENCHMARK_DATABASE_URL
+
+from src.crud.team_closure import rebuild_team_closure  # noqa: E402
+from src.database import Base, is_memory_database  # noqa: E402
+from src.models import Experiment, Team, team_experiment_assignment  # noqa: E402
+
+SEED = 29
+TEAMS_PER_ROOT = 4
+ROOT_TEAMS = 250
+INSERT_CHUNK_SIZE = 5000
+
+if is_memory_database(make_url(BENCHMARK_DATABASE_URL)):
+    sys.exit("Benchmarks need a SQLite file, e.g. sqlite:////tmp/bench.db.")
+
+
+class QueryStats:
+    def __init__(self, engine):
+        self.statements = 0
+        self.rows = 0
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _after_cursor_execute(self, conn, cursor, statement, params, context, many):
+        self.statements += 1
+        # DBAPI rowcount is undefined for SELECT on most drivers (-1 on
+        # SQLite), so count the rows as the result fetches them instead.
+        if context is not None and cursor.description is not None:
+            context.cursor = _CountingCursor(cursor, self)
+
+    def reset(self):
+        self.statements = 0
+        self.rows = 0
+
+
+class _CountingCursor:
+    def __init__(self, cursor, stats: QueryStats):
+        self._cursor = cursor
+        self._stats = stats
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._stats.rows += 1
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._cursor.fetchmany(*args)
+        self._stats.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._stats.rows += len(rows)
+        return rows
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def get_engine():
+    return create_engine(BENCHMARK_DATABASE_URL)
+
+
+def _insert_chunked(connection, table, rows: list[dict]):
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        connection.execute(insert(table), rows[start : start + INSERT_CHUNK_SIZE])
+
+
+def seed(engine, experiments_count: int, depth: int = 2) -> list[dict]:
+    rng = random.Random(SEED)
+    teams = []
+    for root_index in range(ROOT_TEAMS):
+        level = [
+            {
+                "id": uuid.UUID(int=rng.getrandbits(128)),
+                "name": f"root-{root_index}",
+                "parent_team": None,
+            }
+        ]
+        teams.extend(level)
+        for _ in range(depth - 1):
+            parents = level
+            level = []
+            for child_index in range(TEAMS_PER_ROOT):
+                parent = rng.choice(parents)
+                level.append(
+                    {
+                        "id": uuid.UUID(int=rng.getrandbits(128)),
+                        "name": f"{parent['name']}-{child_index}",
+                        "parent_team": parent["id"],
+                    }
+                )
+            teams.extend(level)
+
+    experiments = []
+    assignments = []
+    for index in range(experiments_count):
+        experiment_id = uuid.UUID(int=rng.getrandbits(128))
+        assigned = rng.sample(teams, rng.randint(1, 2))
+        experiments.append(
+            {
+                "id": experiment_id,
+                "description": f"experiment-{index:07d}",
+                "sample_ratio": rng.random(),
+                "allowed_team_assignments": len(assigned),
+            }
+        )
+        assignments.extend(
+            {"team_id": team["id"], "experiment_id": experiment_id}
+            for team in assigned
+        )
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        _insert_chunked(connection, Team.__table__, teams)
+        _insert_chunked(connection, Experiment.__table__, experiments)
+        _insert_chunked(connection, team_experiment_assignment, assignments)
+        rebuild_team_closure(Session(bind=connection))
+
+    return teams
+
+
+def measure(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
@@ -0,0 +1,45 @@
+"""Initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 09:15:00
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "teams",
+        sa.Column("id", sa.UUID(), primary_key=True),
+        sa.Column("name", sa.String(), unique=True),
+        sa.Column("parent_team", sa.UUID(), sa.ForeignKey("teams.id")),
+    )
+    op.create_table(
+        "experiments",
+        sa.Column("id", sa.UUID(), primary_key=True),
+        sa.Column("description", sa.String()),
+        sa.Column("sample_ratio", sa.Float()),
+        sa.Column("allowed_team_assignments", sa.Integer()),
+    )
+    op.create_table(
+        "team_experiment_assignment",
+        sa.Column("team_id", sa.UUID(), sa.ForeignKey("teams.id"), primary_key=True),
+        sa.Column(
+            "experiment_id",
+            sa.UUID(),
+            sa.ForeignKey("experiments.id"),
+            primary_key=True,
+        ),
+    )
+
+
+def downgrade():
+    op.drop_table("team_experiment_assignment")
+    op.drop_table("experiments")
+    op.drop_table("teams")
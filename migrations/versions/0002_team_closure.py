@@ -0,0 +1,53 @@
+"""Team closure table
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:15:00
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases bootstrapped by create_all already have an empty closure table.
+    if not sa.inspect(op.get_bind()).has_table("team_closure"):
+        op.create_table(
+            "team_closure",
+            sa.Column(
+                "ancestor_id", sa.UUID(), sa.ForeignKey("teams.id"), primary_key=True
+            ),
+            sa.Column(
+                "descendant_id", sa.UUID(), sa.ForeignKey("teams.id"), primary_key=True
+            ),
+            sa.Column("depth", sa.Integer(), nullable=False),
+        )
+    op.create_index(
+        "ix_team_closure_descendant_id",
+        "team_closure",
+        ["descendant_id"],
+        if_not_exists=True,
+    )
+
+    op.execute("DELETE FROM team_closure")
+    op.execute(
+        """
+        INSERT INTO team_closure (ancestor_id, descendant_id, depth)
+        WITH RECURSIVE tree (ancestor_id, descendant_id, depth) AS (
+            SELECT id, id, 0 FROM teams
+            UNION ALL
+            SELECT tree.ancestor_id, teams.id, tree.depth + 1
+            FROM tree JOIN teams ON teams.parent_team = tree.descendant_id
+        )
+        SELECT ancestor_id, descendant_id, depth FROM tree
+        """
+    )
+
+
+def downgrade():
+    op.drop_index("ix_team_closure_descendant_id", table_name="team_closure")
+    op.drop_table("team_closure")
@@ -0,0 +1,39 @@
+"""Indexes for listing pagination, team hierarchy and assignment lookups
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 09:15:00
+"""
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_teams_name_id", "teams", ["name", "id"]),
+    ("ix_teams_parent_team", "teams", ["parent_team"]),
+    ("ix_experiments_description_id", "experiments", ["description", "id"]),
+    (
+        "ix_team_experiment_assignment_experiment_id",
+        "team_experiment_assignment",
+        ["experiment_id"],
+    ),
+]
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name, table, columns, postgresql_concurrently=True, if_not_exists=True
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _ in INDEXES:
+            op.drop_index(
+                name, table_name=table, postgresql_concurrently=True, if_exists=True
+            )
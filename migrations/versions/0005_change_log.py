@@ -0,0 +1,34 @@
+"""Append-only change log of team and assignment mutations
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 16:45:00
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "change_log",
+        sa.Column("seq", sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column(
+            "occurred_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+        sa.Column("entity", sa.String(), nullable=False),
+        sa.Column("entity_id", sa.UUID(), nullable=False),
+        sa.Column("operation", sa.String(), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table("change_log")
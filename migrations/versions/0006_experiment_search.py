@@ -0,0 +1,67 @@
+"""Indexes for searching experiment descriptions
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 18:30:00
+"""
+import logging
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+PREFIX_INDEX = "ix_experiments_description_prefix"
+TRIGRAM_INDEX = "ix_experiments_description_trgm"
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            PREFIX_INDEX,
+            "experiments",
+            [sa.text("lower(description) text_pattern_ops")],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+        connection = op.get_bind()
+        has_pg_trgm = connection.scalar(
+            sa.text(
+                "SELECT EXISTS (SELECT 1 FROM pg_available_extensions "
+                "WHERE name = 'pg_trgm')"
+            )
+        )
+        if not has_pg_trgm:
+            logger.warning(
+                "pg_trgm is not available, %s is not created and experiment "
+                "search falls back to an in-process index",
+                TRIGRAM_INDEX,
+            )
+            return
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.create_index(
+            TRIGRAM_INDEX,
+            "experiments",
+            ["description"],
+            postgresql_using="gin",
+            postgresql_ops={"description": "gin_trgm_ops"},
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name in (TRIGRAM_INDEX, PREFIX_INDEX):
+            op.drop_index(
+                name,
+                table_name="experiments",
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
@@ -0,0 +1,79 @@
+import numpy as np
+
+FNV_OFFSET_BASIS = 0xCBF29CE484222325
+FNV_PRIME = 0x100000001B3
+MASK_64 = 0xFFFFFFFFFFFFFFFF
+SEED_SEPARATOR = b"\x00"
+BLOCK_SIZE = 65536
+UNIT_INTERVAL_SCALE = 2.0**-53
+
+
+def _fnv1a(data: bytes, state: int = FNV_OFFSET_BASIS) -> int:
+    for byte in data:
+        state = ((state ^ byte) * FNV_PRIME) & MASK_64
+    return state
+
+
+def _fmix64(state: int) -> int:
+    state ^= state >> 33
+    state = (state * 0xFF51AFD7ED558CCD) & MASK_64
+    state ^= state >> 33
+    state = (state * 0xC4CEB9FE1A85EC53) & MASK_64
+    state ^= state >> 33
+    return state
+
+
+def experiment_seed(experiment_id) -> int:
+    return _fnv1a(str(experiment_id).lower().encode() + SEED_SEPARATOR)
+
+
+def hash_unit(experiment_id, unit_id: str) -> int:
+    return _fmix64(_fnv1a(unit_id.encode(), experiment_seed(experiment_id)))
+
+
+def is_unit_in_sample(experiment_id, unit_id: str, sample_ratio: float) -> bool:
+    return (hash_unit(experiment_id, unit_id) >> 11) * UNIT_INTERVAL_SCALE < sample_ratio
+
+
+def hash_units(experiment_id, unit_ids: list[str]) -> np.ndarray:
+    encoded = [unit_id.encode() for unit_id in unit_ids]
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+    width = int(lengths.max(initial=0))
+
+    hashes = np.full(len(encoded), experiment_seed(experiment_id), dtype=np.uint64)
+    if width:
+        matrix = (
+            np.array(encoded, dtype=f"S{width}")
+            .view(np.uint8)
+            .reshape(len(encoded), width)
+        )
+        prime = np.uint64(FNV_PRIME)
+        for start in range(0, len(encoded), BLOCK_SIZE):
+            block = hashes[start : start + BLOCK_SIZE]
+            for values in matrix[start : start + BLOCK_SIZE].T.copy():
+                block ^= values
+                block *= prime
+
+        # Short ids were zero padded; xor with a zero byte is a no-op, so each
+        # padding byte only multiplied the state by the (odd, invertible) prime.
+        inverse_powers = np.array(
+            [pow(FNV_PRIME, -padding, 2**64) for padding in range(width + 1)],
+            dtype=np.uint64,
+        )
+        hashes *= inverse_powers[width - lengths]
+
+    hashes ^= hashes >> np.uint64(33)
+    hashes *= np.uint64(0xFF51AFD7ED558CCD)
+    hashes ^= hashes >> np.uint64(33)
+    hashes *= np.uint64(0xC4CEB9FE1A85EC53)
+    hashes ^= hashes >> np.uint64(33)
+    return hashes
+
+
+def units_in_sample(
+    experiment_id, unit_ids: list[str], sample_ratio: float
+) -> np.ndarray:
+    positions = (hash_units(experiment_id, unit_ids) >> np.uint64(11)).astype(
+        np.float64
+    )
+    return positions * UNIT_INTERVAL_SCALE < sample_ratio
@@ -0,0 +1,146 @@
+import codecs
+import csv
+import json
+
+from fastapi import HTTPException, Request
+
+from .messages import INVALID_IMPORT_ROW_ERROR, UNSUPPORTED_IMPORT_FORMAT_ERROR
+
+CSV_CONTENT_TYPES = {"text/csv", "application/csv"}
+JSON_LINES_CONTENT_TYPES = {
+    "application/json",
+    "application/jsonl",
+    "application/json-lines",
+    "application/x-ndjson",
+}
+
+
+async def iter_lines(request: Request):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    async for chunk in request.stream():
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+def import_error(line: int, name: str | None, detail: str) -> dict:
+    return {"line": line, "name": name, "detail": detail}
+
+
+def parse_team_row(line: int, data) -> tuple[dict | None, dict | None]:
+    if not isinstance(data, dict):
+        return None, import_error(
+            line, None, INVALID_IMPORT_ROW_ERROR.format(error="expected an object")
+        )
+
+    name = data.get("name")
+    parent_team = data.get("parent_team") or None
+    if not isinstance(name, str) or not name:
+        return None, import_error(
+            line, None, INVALID_IMPORT_ROW_ERROR.format(error="name is required")
+        )
+    if parent_team is not None and not isinstance(parent_team, str):
+        return None, import_error(
+            line,
+            name,
+            INVALID_IMPORT_ROW_ERROR.format(error="parent_team must be a team name"),
+        )
+
+    return {"line": line, "name": name, "parent_team": parent_team}, None
+
+
+async def read_team_import(request: Request) -> tuple[list[dict], list[dict]]:
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    content_type = content_type.lower()
+    if content_type not in CSV_CONTENT_TYPES | JSON_LINES_CONTENT_TYPES:
+        raise HTTPException(status_code=415, detail=UNSUPPORTED_IMPORT_FORMAT_ERROR)
+
+    rows = []
+    errors = []
+    if content_type in CSV_CONTENT_TYPES:
+        parsed = _parse_csv(iter_lines(request), errors)
+    else:
+        parsed = _parse_json_lines(iter_lines(request), errors)
+
+    try:
+        async for line, data in parsed:
+            row, error = parse_team_row(line, data)
+            if error:
+                errors.append(error)
+            else:
+                rows.append(row)
+    except UnicodeDecodeError as e:
+        raise HTTPException(
+            status_code=400, detail=INVALID_IMPORT_ROW_ERROR.format(error=str(e))
+        )
+
+    return rows, errors
+
+
+class _IncompleteRecord(Exception):
+    pass
+
+
+def _record_lines(lines: list[str]):
+    yield from lines
+    raise _IncompleteRecord
+
+
+async def _parse_csv(lines, errors: list[dict]):
+    # Quoted values may span lines. csv.reader asks for another line only when
+    # the record is still open, so each record is re-read from its first line
+    # until the reader no longer runs out. Like csv.DictReader, the first
+    # record is the header and a row is numbered by the last line it ends on.
+    fieldnames = None
+    record = []
+    line = 0
+
+    def parse(record_lines):
+        try:
+            return next(csv.reader(record_lines), [])
+        except csv.Error as e:
+            errors.append(
+                import_error(line, None, INVALID_IMPORT_ROW_ERROR.format(error=str(e)))
+            )
+            return []
+
+    async for text in lines:
+        line += 1
+        record.append(text + "\n")
+        try:
+            values = parse(_record_lines(record))
+        except _IncompleteRecord:
+            continue
+        record = []
+        if not values:
+            continue
+        if fieldnames is None:
+            fieldnames = values
+        else:
+            yield line, dict(zip(fieldnames, values))
+
+    if record:
+        # The body ended inside a quoted value.
+        values = parse(record[:-1] + [record[-1].removesuffix("\n")])
+        if values and fieldnames is not None:
+            yield line, dict(zip(fieldnames, values))
+
+
+async def _parse_json_lines(lines, errors: list[dict]):
+    line = 0
+    async for text in lines:
+        line += 1
+        if not text.strip():
+            continue
+        try:
+            yield line, json.loads(text)
+        except ValueError as e:
+            errors.append(
+                import_error(line, None, INVALID_IMPORT_ROW_ERROR.format(error=str(e)))
+            )
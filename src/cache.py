@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import TypeAdapter
+
+from .config import NEXT_CURSOR_HEADER
+
+EXPERIMENTS_NAMESPACE = "experiments"
+TEAMS_NAMESPACE = "teams"
+NAMESPACES = (EXPERIMENTS_NAMESPACE, TEAMS_NAMESPACE)
+
+
+class NullCache:
+    blocking = False
+
+    def get(self, key: str) -> bytes | None:
+        return None
+
+    def set(self, key: str, value: bytes):
+        pass
+
+    def get_generation(self, namespace: str) -> int:
+        return 0
+
+    def bump_generation(self, namespace: str):
+        pass
+
+
+class LRUCache:
+    blocking = False
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_generation(self, namespace: str) -> int:
+        return self._generations.get(namespace, 0)
+
+    def bump_generation(self, namespace: str):
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+
+
+class RedisCache:
+    # Every call is a network round trip, which async code must not wait for
+    # on the event loop.
+    blocking = True
+
+    def __init__(self, client, ttl_seconds: float, prefix: str = "team-assignments:"):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, ttl_seconds: float):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis requires the redis package")
+        return cls(redis.Redis.from_url(url), ttl_seconds)
+
+    def get(self, key: str) -> bytes | None:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes):
+        self.client.set(self.prefix + key, value, ex=max(1, int(self.ttl_seconds)))
+
+    def get_generation(self, namespace: str) -> int:
+        return int(self.client.get(f"{self.prefix}generation:{namespace}") or 0)
+
+    def bump_generation(self, namespace: str):
+        self.client.incr(f"{self.prefix}generation:{namespace}")
+
+
+_cache = None
+
+
+def create_cache_from_env():
+    backend = os.getenv("CACHE_BACKEND", "memory").lower()
+    ttl_seconds = float(os.getenv("CACHE_TTL_SECONDS", "30"))
+    if backend == "none":
+        return NullCache()
+    if backend == "redis":
+        return RedisCache.from_url(os.getenv("REDIS_URL"), ttl_seconds)
+    return LRUCache(int(os.getenv("CACHE_MAX_ENTRIES", "1024")), ttl_seconds)
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = create_cache_from_env()
+    return _cache
+
+
+def set_cache(cache):
+    global _cache
+    _cache = cache
+
+
+def invalidate(*namespaces: str):
+    cache = get_cache()
+    for namespace in namespaces:
+        cache.bump_generation(namespace)
+
+
+def make_key(namespace: str, params: dict) -> str:
+    generation = get_cache().get_generation(namespace)
+    return f"{namespace}:{generation}:{json.dumps(params, sort_keys=True, default=str)}"
+
+
+def render_listing(
+    adapter: TypeAdapter, items: list, next_cursor: str | None
+) -> bytes:
+    if not items:
+        return json.dumps({"status_code": status.HTTP_204_NO_CONTENT}).encode()
+
+    body = adapter.dump_json(items)
+    etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+    headers = {"ETag": etag}
+    if next_cursor:
+        headers[NEXT_CURSOR_HEADER] = next_cursor
+    listing = {"status_code": status.HTTP_200_OK, "headers": headers}
+    return json.dumps(listing).encode() + b"\n" + body
+
+
+def _lookup(cache, namespace: str, params: dict) -> tuple[str, bytes | None]:
+    key = make_key(namespace, params)
+    return key, cache.get(key)
+
+
+async def _run_cache(cache, fn, *args):
+    if cache.blocking:
+        return await run_in_threadpool(fn, *args)
+    return fn(*args)
+
+
+async def cached_listing(
+    request: Request,
+    namespace: str,
+    params: dict,
+    load_listing,
+    adapter: TypeAdapter,
+) -> Response:
+    cache = get_cache()
+    key, entry = await _run_cache(cache, _lookup, cache, namespace, params)
+    if entry is None:
+        entry = render_listing(adapter, *await load_listing())
+        await _run_cache(cache, cache.set, key, entry)
+
+    listing, _, body = entry.partition(b"\n")
+    listing = json.loads(listing)
+    if listing["status_code"] == status.HTTP_204_NO_CONTENT:
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+    headers = listing["headers"]
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
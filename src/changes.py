@@ -0,0 +1,161 @@
+import asyncio
+import threading
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from .config import (
+    CHANGE_LOG_LOCK_ID,
+    CHANGES_KEEPALIVE_SECONDS,
+    CHANGES_POLL_INTERVAL_SECONDS,
+    MAX_CHANGES_LIMIT,
+)
+from .database import dialect_name
+from .models import ChangeLog
+from .schemas import ChangeRead
+
+EXPERIMENT_ENTITY = "experiment"
+TEAM_ENTITY = "team"
+
+ASSIGNMENTS_UPDATED = "assignments_updated"
+CREATED = "created"
+PARENT_UPDATED = "parent_updated"
+
+KEEPALIVE_EVENT = ": keepalive\n\n"
+
+
+def change_record(entity: str, entity_id, operation: str, payload: dict) -> dict:
+    return {
+        "entity": entity,
+        "entity_id": entity_id,
+        "operation": operation,
+        "payload": payload,
+    }
+
+
+def lock_change_log(db: Session):
+    # SQLite transactions already start with the database write lock held.
+    if dialect_name(db) == "postgresql":
+        db.execute(select(func.pg_advisory_xact_lock(CHANGE_LOG_LOCK_ID)))
+
+
+def record_changes(db: Session, changes: list[dict]):
+    if changes:
+        lock_change_log(db)
+        db.execute(insert(ChangeLog), changes)
+
+
+def get_changes(db: Session, since: int, limit: int) -> list[ChangeRead]:
+    rows = db.execute(
+        select(
+            ChangeLog.seq,
+            ChangeLog.occurred_at,
+            ChangeLog.entity,
+            ChangeLog.entity_id,
+            ChangeLog.operation,
+            ChangeLog.payload,
+        )
+        .where(ChangeLog.seq > since)
+        .order_by(ChangeLog.seq)
+        .limit(limit)
+    )
+    return [ChangeRead(**row._mapping) for row in rows]
+
+
+class ChangeNotifier:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = 0
+        self._waiters = set()
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def notify(self):
+        with self._lock:
+            self._version += 1
+            waiters, self._waiters = self._waiters, set()
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_wake, future)
+
+    async def wait(self, version: int, timeout: float):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = (loop, future)
+        with self._lock:
+            if self._version != version:
+                return
+            self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+change_notifier = ChangeNotifier()
+
+
+def notify_changes():
+    change_notifier.notify()
+
+
+async def read_changes(
+    session_factory, is_async: bool, since: int, limit: int
+) -> list[ChangeRead]:
+    if is_async:
+        async with session_factory() as db:
+            return await db.run_sync(get_changes, since, limit)
+
+    def read():
+        with session_factory() as db:
+            return get_changes(db, since, limit)
+
+    return await run_in_threadpool(read)
+
+
+async def wait_for_changes(
+    session_factory, is_async: bool, since: int, limit: int, wait: float
+) -> list[ChangeRead]:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    while True:
+        version = change_notifier.version
+        changes = await read_changes(session_factory, is_async, since, limit)
+        remaining = deadline - loop.time()
+        if changes or remaining <= 0:
+            return changes
+        await change_notifier.wait(
+            version, min(remaining, CHANGES_POLL_INTERVAL_SECONDS)
+        )
+
+
+def encode_event(change: ChangeRead) -> str:
+    return f"id: {change.seq}\nevent: change\ndata: {change.model_dump_json()}\n\n"
+
+
+async def stream_changes(
+    session_factory, is_async: bool, since: int, is_disconnected
+):
+    while not await is_disconnected():
+        changes = await wait_for_changes(
+            session_factory,
+            is_async,
+            since,
+            MAX_CHANGES_LIMIT,
+            CHANGES_KEEPALIVE_SECONDS,
+        )
+        if not changes:
+            yield KEEPALIVE_EVENT
+        for change in changes:
+            yield encode_event(change)
+            since = change.seq
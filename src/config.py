@@ -1,2 +1,19 @@
+BULK_INSERT_CHUNK_SIZE = 1000
+CHANGE_LOG_LOCK_ID = 7_341_209_118
+CHANGES_KEEPALIVE_SECONDS = 15
+CHANGES_MAX_WAIT_SECONDS = 30
+CHANGES_POLL_INTERVAL_SECONDS = 1
+EXPORT_BATCH_SIZE = 1000
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+IDEMPOTENCY_PURGE_INTERVAL_SECONDS = 300
 MAX_ALLOWED_TEAMS = 2
+MAX_BUCKET_UNIT_IDS = 100000
+MAX_CHANGES_LIMIT = 1000
+MAX_LOOKUP_TEAMS = 1000
+MAX_SEARCH_LIMIT = 100
+MAX_SEARCH_QUERY_LENGTH = 200
+MAX_UNIT_ID_LENGTH = 256
 MIN_ALLOWED_TEAMS = 1
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TEAM_HIERARCHY_LOCK_ID = 7_341_209_119
+WORD_SIMILARITY_THRESHOLD = 0.6
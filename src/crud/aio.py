@@ -0,0 +1,63 @@
+from .. import search, snapshot
+from ..database import AnySession, run_db
+from . import experiment, team
+
+
+async def get_experiments(db: AnySession, *args):
+    return await run_db(db, experiment.get_experiments, *args)
+
+
+async def get_experiments_by_teams(db: AnySession, *args):
+    return await run_db(db, experiment.get_experiments_by_teams, *args)
+
+
+async def search_experiments(db: AnySession, *args):
+    return await run_db(db, search.search_experiments, *args)
+
+
+async def create_experiment(db: AnySession, *args):
+    return await run_db(db, experiment.create_experiment, *args)
+
+
+async def create_experiments(db: AnySession, *args):
+    return await run_db(db, experiment.create_experiments, *args)
+
+
+async def update_assignments(db: AnySession, *args):
+    return await run_db(db, experiment.update_assignments, *args)
+
+
+async def update_assignments_bulk(db: AnySession, *args):
+    return await run_db(db, experiment.update_assignments_bulk, *args)
+
+
+async def count_experiments(db: AnySession):
+    return await run_db(db, experiment.count_experiments)
+
+
+async def get_sample_ratio(db: AnySession, *args):
+    return await run_db(db, experiment.get_sample_ratio, *args)
+
+
+async def get_snapshot(db: AnySession):
+    return await run_db(db, snapshot.get_snapshot)
+
+
+async def get_teams(db: AnySession, *args):
+    return await run_db(db, team.get_teams, *args)
+
+
+async def count_teams(db: AnySession):
+    return await run_db(db, team.count_teams)
+
+
+async def create_team(db: AnySession, *args):
+    return await run_db(db, team.create_team, *args)
+
+
+async def import_teams(db: AnySession, *args):
+    return await run_db(db, team.import_teams, *args)
+
+
+async def update_team_parent(db: AnySession, *args):
+    return await run_db(db, team.update_team_parent, *args)
@@ -1,43 +1,187 @@
 import uuid
+from collections import defaultdict
 
 from fastapi import HTTPException
-from sqlalchemy import asc, or_
+from sqlalchemy import and_, delete, exists, func, insert, or_, select, tuple_
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session, joinedload
-
+from sqlalchemy.orm import Session
+
+from ..cache import EXPERIMENTS_NAMESPACE, TEAMS_NAMESPACE, invalidate
+from ..changes import (
+    ASSIGNMENTS_UPDATED,
+    CREATED,
+    EXPERIMENT_ENTITY,
+    change_record,
+    notify_changes,
+    record_changes,
+)
 from ..config import MAX_ALLOWED_TEAMS, MIN_ALLOWED_TEAMS
+from ..database import dialect_insert
+from ..idempotency import record_response
 from ..messages import (
     ASSIGNMENTS_ALREADY_EXISTS_ERROR,
     ASSIGNMENTS_UPDATED_MSG,
     CANNOT_ASSIGN_CHILD_WITH_PARENT_TO_EXPERIMENT_ERROR,
     EXPERIMENT_CREATED_SUCCESSFULLY_MSG,
+    EXPERIMENT_DUPLICATED_IN_BATCH_ERROR,
     EXPERIMENT_NOT_FOUND_ERROR,
+    EXPERIMENTS_CREATED_SUCCESSFULLY_MSG,
     INVALID_ASSIGNMENTS_AMOUNT,
     TEAM_BY_NAME_NOT_FOUND_ERROR,
     TEAMS_NOT_FOUND,
     VALUE_OF_ALLOWED_TEAM_ASSIGNMNETS_RANGE_ERROR,
 )
-from ..models import Experiment, Team
+from ..metrics import count_failures
+from ..models import Experiment, Team, team_closure, team_experiment_assignment
+from ..pagination import keyset_order, keyset_page
+from ..schemas import (
+    AssignmentUpdate,
+    ExperimentCreate,
+    ExperimentRead,
+    ExperimentsByTeams,
+    TeamExperimentRead,
+    TeamSummary,
+)
+from ..search import mark_experiments_dirty
+from ..snapshot import mark_dirty
+from .team_closure import get_related_team_pairs, lock_team_hierarchy
 
 
-def get_experiments(db: Session, team_name: str | None, limit: int | None):
-    query = (
-        db.query(Experiment)
-        .join(Experiment.teams)
-        .options(joinedload(Experiment.teams).load_only(Team.id, Team.name))
-        .order_by(asc(Experiment.description))
+def get_experiments(
+    db: Session,
+    team_name: str | None,
+    limit: int,
+    cursor: str | None = None,
+    include_descendants: bool = False,
+):
+    query = db.query(
+        Experiment.id,
+        Experiment.description,
+        Experiment.sample_ratio,
+        Experiment.allowed_team_assignments,
     )
 
     if team_name:
-        filtered_team = db.query(Team).filter(Team.name == team_name).first()
+        filtered_team = db.query(Team.id).filter(Team.name == team_name).first()
         if not filtered_team:
             raise HTTPException(status_code=404, detail=TEAM_BY_NAME_NOT_FOUND_ERROR)
 
-        query = query.filter(
-            or_(Team.id == filtered_team.id, Team.parent_team == filtered_team.id)
+        if include_descendants:
+            query = query.filter(
+                exists().where(
+                    team_experiment_assignment.c.experiment_id == Experiment.id,
+                    team_experiment_assignment.c.team_id
+                    == team_closure.c.descendant_id,
+                    team_closure.c.ancestor_id == filtered_team.id,
+                )
+            )
+        else:
+            query = query.filter(
+                Experiment.teams.any(
+                    or_(
+                        Team.id == filtered_team.id,
+                        Team.parent_team == filtered_team.id,
+                    )
+                )
+            )
+
+    rows, next_cursor = keyset_page(
+        query, Experiment.description, Experiment.id, limit, cursor
+    )
+
+    teams = get_experiment_teams(db, [row.id for row in rows])
+    experiments = [
+        ExperimentRead(
+            id=row.id,
+            description=row.description,
+            sample_ratio=row.sample_ratio,
+            allowed_team_assignments=row.allowed_team_assignments,
+            teams=teams[row.id],
+        )
+        for row in rows
+    ]
+    return experiments, next_cursor
+
+
+def get_experiments_by_teams(
+    db: Session,
+    team_names: list[str],
+    team_ids: list[uuid.UUID],
+    include_descendants: bool = False,
+) -> ExperimentsByTeams:
+    team_names = list(dict.fromkeys(team_names))
+    team_ids = list(dict.fromkeys(team_ids))
+    experiments_by_team = {}
+    team_ids_by_name = {}
+    if team_names or team_ids:
+        hierarchy = team_closure.c.ancestor_id == Team.id
+        if not include_descendants:
+            hierarchy = and_(hierarchy, team_closure.c.depth <= 1)
+        rows = db.execute(
+            select(
+                Team.id.label("team_id"),
+                Team.name.label("team_name"),
+                Experiment.id,
+                Experiment.description,
+                Experiment.sample_ratio,
+                Experiment.allowed_team_assignments,
+            )
+            .distinct()
+            .select_from(Team)
+            .outerjoin(team_closure, hierarchy)
+            .outerjoin(
+                team_experiment_assignment,
+                team_experiment_assignment.c.team_id == team_closure.c.descendant_id,
+            )
+            .outerjoin(
+                Experiment, Experiment.id == team_experiment_assignment.c.experiment_id
+            )
+            .where(or_(Team.name.in_(team_names), Team.id.in_(team_ids)))
+            .order_by(Team.id, *keyset_order(Experiment.description, Experiment.id))
         )
+        for row in rows:
+            experiments = experiments_by_team.setdefault(row.team_id, [])
+            team_ids_by_name[row.team_name] = row.team_id
+            if row.id is not None:
+                experiments.append(
+                    TeamExperimentRead(
+                        id=row.id,
+                        description=row.description,
+                        sample_ratio=row.sample_ratio,
+                        allowed_team_assignments=row.allowed_team_assignments,
+                    )
+                )
+
+    teams = {}
+    for name in team_names:
+        if name in team_ids_by_name:
+            teams[name] = experiments_by_team[team_ids_by_name[name]]
+    for team_id in team_ids:
+        if team_id in experiments_by_team:
+            teams[str(team_id)] = experiments_by_team[team_id]
+    return ExperimentsByTeams(
+        teams=teams,
+        unresolved_names=[name for name in team_names if name not in team_ids_by_name],
+        unresolved_ids=[
+            team_id for team_id in team_ids if team_id not in experiments_by_team
+        ],
+    )
 
-    return query.limit(limit).all()
+
+def get_experiment_teams(
+    db: Session, experiment_ids: list[uuid.UUID]
+) -> dict[uuid.UUID, list[TeamSummary]]:
+    teams = defaultdict(list)
+    if experiment_ids:
+        rows = db.execute(
+            select(team_experiment_assignment.c.experiment_id, Team.id, Team.name)
+            .join(Team, Team.id == team_experiment_assignment.c.team_id)
+            .where(team_experiment_assignment.c.experiment_id.in_(experiment_ids))
+            .order_by(Team.name, Team.id)
+        )
+        for experiment_id, team_id, team_name in rows:
+            teams[experiment_id].append(TeamSummary(id=team_id, name=team_name))
+    return teams
 
 
 def create_experiment(
@@ -56,8 +200,9 @@ def create_experiment(
     existing_teams_ids_set = set({str(team.id) for team in existing_teams})
     check_if_teams_exist(team_ids_set, existing_teams_ids_set)
 
+    lock_team_hierarchy(db, shared=True)
     check_parent_child_relationship_in_assignment(
-        existing_teams, existing_teams_ids_set
+        get_related_team_pairs(db, existing_teams_ids_set), existing_teams_ids_set
     )
 
     db_experiment = Experiment(
@@ -71,6 +216,29 @@ def create_experiment(
     for team in existing_teams:
         db_experiment.teams.append(team)
 
+    record_changes(
+        db,
+        [
+            change_record(
+                EXPERIMENT_ENTITY,
+                uuid.UUID(db_experiment.id),
+                CREATED,
+                {
+                    "description": description,
+                    "sample_ratio": sample_ratio,
+                    "allowed_team_assignments": allowed_team_assignments,
+                    "team_ids": sorted(existing_teams_ids_set),
+                },
+            )
+        ],
+    )
+
+    result = {
+        "message": EXPERIMENT_CREATED_SUCCESSFULLY_MSG,
+        "experiment_id": str(db_experiment.id),
+    }
+    record_response(db, result)
+
     try:
         db.commit()
     except IntegrityError as e:
@@ -78,42 +246,199 @@ def create_experiment(
         error_info = str(e.orig)
         raise HTTPException(status_code=400, detail=f"IntegrityError occurred: {error_info}")
 
+    invalidate(EXPERIMENTS_NAMESPACE, TEAMS_NAMESPACE)
+    notify_changes()
+
     db.refresh(db_experiment)
+    mark_dirty(experiment_ids=[db_experiment.id])
+    mark_experiments_dirty([db_experiment.id])
 
-    return {
-        "message": EXPERIMENT_CREATED_SUCCESSFULLY_MSG,
-        "experiment_id": str(db_experiment.id),
-    }
+    return result
 
 
 def update_assignments(db: Session, experiment_id: str, team_ids: list[str]):
-    experiment = db.query(Experiment).filter(Experiment.id == experiment_id).first()
+    experiment = db.execute(
+        select(Experiment.id, Experiment.allowed_team_assignments)
+        .where(Experiment.id == experiment_id)
+        .with_for_update()
+    ).first()
     check_if_experiment_exists(experiment)
 
     team_ids_set = set(team_ids)
     check_team_assignments_amount(experiment.allowed_team_assignments, team_ids_set)
 
-    existing_teams = db.query(Team).filter(Team.id.in_(team_ids_set)).all()
-    existing_teams_ids_set = set({str(team.id) for team in existing_teams})
+    existing_teams_ids_set = get_existing_team_ids(db, team_ids_set)
     check_if_teams_exist(team_ids_set, existing_teams_ids_set)
 
-    current_assigned_teams = set({str(team.id) for team in experiment.teams})
+    experiment_id = str(experiment.id)
+    current_assigned_teams = get_current_assignments(db, {experiment.id})[
+        experiment_id
+    ]
     check_if_assignments_exist(current_assigned_teams, team_ids_set)
 
+    lock_team_hierarchy(db, shared=True)
     check_parent_child_relationship_in_assignment(
-        existing_teams, existing_teams_ids_set
+        get_related_team_pairs(db, existing_teams_ids_set), existing_teams_ids_set
+    )
+
+    delete_assignments(
+        db, {(experiment_id, team) for team in current_assigned_teams - team_ids_set}
+    )
+    insert_assignments(
+        db, {(experiment_id, team) for team in team_ids_set - current_assigned_teams}
+    )
+    record_changes(
+        db, [_assignments_change(experiment.id, team_ids_set, current_assigned_teams)]
     )
 
-    set_to_assign = set(team_ids) - current_assigned_teams
-    teams_to_assign = db.query(Team).filter(Team.id.in_(set_to_assign)).all()
-    set_to_unasign = current_assigned_teams - set(team_ids)
-    teams_to_unassign = db.query(Team).filter(Team.id.in_(set_to_unasign)).all()
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        error_info = str(e.orig)
+        raise HTTPException(status_code=400, detail=f"IntegrityError occurred: {error_info}")
+
+    invalidate(EXPERIMENTS_NAMESPACE, TEAMS_NAMESPACE)
+    notify_changes()
+    mark_dirty(experiment_ids=[experiment_id])
+
+    return {"message": ASSIGNMENTS_UPDATED_MSG}
+
+
+def create_experiments(db: Session, experiments: list[ExperimentCreate]):
+    team_ids_sets = [
+        {str(team_id) for team_id in experiment.team_ids} for experiment in experiments
+    ]
+    existing_teams_ids_set = get_existing_team_ids(db, set().union(*team_ids_sets))
+    lock_team_hierarchy(db, shared=True)
+    related_team_pairs = get_related_team_pairs(db, existing_teams_ids_set)
+
+    errors = []
+    for index, (experiment, team_ids_set) in enumerate(
+        zip(experiments, team_ids_sets)
+    ):
+        try:
+            check_allowed_team_assignment_value(experiment.allowed_team_assignments)
+            check_team_assignments_amount(
+                experiment.allowed_team_assignments, team_ids_set
+            )
+            check_if_teams_exist(team_ids_set, team_ids_set & existing_teams_ids_set)
+            check_parent_child_relationship_in_assignment(
+                related_team_pairs, team_ids_set
+            )
+        except HTTPException as e:
+            errors.append(batch_error(index, e))
+    check_batch_errors(errors)
+
+    experiment_rows = []
+    assignments = set()
+    changes = []
+    for experiment, team_ids_set in zip(experiments, team_ids_sets):
+        experiment_id = uuid.uuid4()
+        experiment_rows.append(
+            {
+                "id": experiment_id,
+                "description": experiment.description,
+                "sample_ratio": experiment.sample_ratio,
+                "allowed_team_assignments": experiment.allowed_team_assignments,
+            }
+        )
+        assignments.update((str(experiment_id), team_id) for team_id in team_ids_set)
+        changes.append(
+            change_record(
+                EXPERIMENT_ENTITY,
+                experiment_id,
+                CREATED,
+                {
+                    "description": experiment.description,
+                    "sample_ratio": experiment.sample_ratio,
+                    "allowed_team_assignments": experiment.allowed_team_assignments,
+                    "team_ids": sorted(team_ids_set),
+                },
+            )
+        )
+
+    if experiment_rows:
+        db.execute(insert(Experiment.__table__), experiment_rows)
+    insert_assignments(db, assignments)
+    record_changes(db, changes)
+
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        error_info = str(e.orig)
+        raise HTTPException(status_code=400, detail=f"IntegrityError occurred: {error_info}")
+
+    invalidate(EXPERIMENTS_NAMESPACE, TEAMS_NAMESPACE)
+    notify_changes()
+    mark_dirty(experiment_ids=[row["id"] for row in experiment_rows])
+    mark_experiments_dirty([row["id"] for row in experiment_rows])
+
+    return {
+        "message": EXPERIMENTS_CREATED_SUCCESSFULLY_MSG,
+        "experiment_ids": [str(row["id"]) for row in experiment_rows],
+    }
 
-    for team in teams_to_assign:
-        experiment.teams.append(team)
 
-    for team in teams_to_unassign:
-        experiment.teams.remove(team)
+def update_assignments_bulk(db: Session, updates: list[AssignmentUpdate]):
+    experiment_ids = {update.experiment_id for update in updates}
+    rows = db.execute(
+        select(Experiment.id, Experiment.allowed_team_assignments)
+        .where(Experiment.id.in_(experiment_ids))
+        .order_by(Experiment.id)
+        .with_for_update()
+    )
+    experiments = {str(row.id): row for row in rows}
+    current_assignments = get_current_assignments(db, experiment_ids)
+    team_ids_sets = [
+        {str(team_id) for team_id in update.team_ids} for update in updates
+    ]
+    existing_teams_ids_set = get_existing_team_ids(db, set().union(*team_ids_sets))
+    lock_team_hierarchy(db, shared=True)
+    related_team_pairs = get_related_team_pairs(db, existing_teams_ids_set)
+
+    errors = []
+    seen_experiment_ids = set()
+    for index, (update, team_ids_set) in enumerate(zip(updates, team_ids_sets)):
+        experiment_id = str(update.experiment_id)
+        try:
+            check_if_experiment_exists(experiments.get(experiment_id))
+            check_if_experiment_is_unique_in_batch(experiment_id, seen_experiment_ids)
+            check_team_assignments_amount(
+                experiments[experiment_id].allowed_team_assignments, team_ids_set
+            )
+            check_if_teams_exist(team_ids_set, team_ids_set & existing_teams_ids_set)
+            check_if_assignments_exist(
+                current_assignments[experiment_id], team_ids_set
+            )
+            check_parent_child_relationship_in_assignment(
+                related_team_pairs, team_ids_set
+            )
+        except HTTPException as e:
+            errors.append(batch_error(index, e))
+        seen_experiment_ids.add(experiment_id)
+    check_batch_errors(errors)
+
+    assignments_to_insert = set()
+    assignments_to_delete = set()
+    changes = []
+    for update, team_ids_set in zip(updates, team_ids_sets):
+        experiment_id = str(update.experiment_id)
+        current_team_ids = current_assignments[experiment_id]
+        changes.append(
+            _assignments_change(update.experiment_id, team_ids_set, current_team_ids)
+        )
+        assignments_to_insert.update(
+            (experiment_id, team_id) for team_id in team_ids_set - current_team_ids
+        )
+        assignments_to_delete.update(
+            (experiment_id, team_id) for team_id in current_team_ids - team_ids_set
+        )
+
+    delete_assignments(db, assignments_to_delete)
+    insert_assignments(db, assignments_to_insert)
+    record_changes(db, changes)
 
     try:
         db.commit()
@@ -122,9 +447,100 @@ def update_assignments(db: Session, experiment_id: str, team_ids: list[str]):
         error_info = str(e.orig)
         raise HTTPException(status_code=400, detail=f"IntegrityError occurred: {error_info}")
 
-    return {"message": ASSIGNMENTS_UPDATED_MSG}
+    invalidate(EXPERIMENTS_NAMESPACE, TEAMS_NAMESPACE)
+    notify_changes()
+    mark_dirty(experiment_ids=experiment_ids)
+
+    return {"message": ASSIGNMENTS_UPDATED_MSG, "updated": len(updates)}
+
+
+def _assignments_change(
+    experiment_id: uuid.UUID, team_ids: set[str], previous_team_ids: set[str]
+) -> dict:
+    return change_record(
+        EXPERIMENT_ENTITY,
+        experiment_id,
+        ASSIGNMENTS_UPDATED,
+        {"team_ids": sorted(team_ids), "previous_team_ids": sorted(previous_team_ids)},
+    )
+
+
+def count_experiments(db: Session) -> int:
+    return db.scalar(select(func.count()).select_from(Experiment))
+
+
+def get_sample_ratio(db: Session, experiment_id: uuid.UUID) -> float:
+    experiment = db.execute(
+        select(Experiment.sample_ratio).where(Experiment.id == experiment_id)
+    ).first()
+    check_if_experiment_exists(experiment)
+    return experiment.sample_ratio
+
+
+def get_existing_team_ids(db: Session, team_ids: set[str]) -> set[str]:
+    if not team_ids:
+        return set()
+    rows = db.execute(select(Team.id).where(Team.id.in_(team_ids)))
+    return {str(team_id) for team_id in rows.scalars()}
+
+
+def get_current_assignments(
+    db: Session, experiment_ids: set[uuid.UUID]
+) -> dict[str, set[str]]:
+    current_assignments = defaultdict(set)
+    rows = db.execute(
+        select(
+            team_experiment_assignment.c.experiment_id,
+            team_experiment_assignment.c.team_id,
+        ).where(team_experiment_assignment.c.experiment_id.in_(experiment_ids))
+    )
+    for experiment_id, team_id in rows:
+        current_assignments[str(experiment_id)].add(str(team_id))
+    return current_assignments
+
+
+def insert_assignments(db: Session, assignments: set[tuple[str, str]]):
+    if assignments:
+        db.execute(
+            dialect_insert(db, team_experiment_assignment).on_conflict_do_nothing(),
+            [
+                {
+                    "experiment_id": uuid.UUID(experiment_id),
+                    "team_id": uuid.UUID(team_id),
+                }
+                for experiment_id, team_id in assignments
+            ],
+        )
 
 
+def delete_assignments(db: Session, assignments: set[tuple[str, str]]):
+    if assignments:
+        db.execute(
+            delete(team_experiment_assignment).where(
+                tuple_(
+                    team_experiment_assignment.c.experiment_id,
+                    team_experiment_assignment.c.team_id,
+                ).in_(
+                    [
+                        (uuid.UUID(experiment_id), uuid.UUID(team_id))
+                        for experiment_id, team_id in assignments
+                    ]
+                )
+            )
+        )
+
+
+def batch_error(index: int, e: HTTPException) -> dict:
+    return {"index": index, "status_code": e.status_code, "detail": e.detail}
+
+
+@count_failures
+def check_batch_errors(errors: list[dict]):
+    if errors:
+        raise HTTPException(status_code=400, detail=errors)
+
+
+@count_failures
 def check_allowed_team_assignment_value(allowed_team_assignments: int):
     if not (MIN_ALLOWED_TEAMS <= allowed_team_assignments <= MAX_ALLOWED_TEAMS):
         raise HTTPException(
@@ -135,6 +551,7 @@ def check_allowed_team_assignment_value(allowed_team_assignments: int):
         )
 
 
+@count_failures
 def check_team_assignments_amount(allowed_team_assignments: int, team_ids: set):
     if allowed_team_assignments != len(team_ids):
         raise HTTPException(
@@ -145,6 +562,7 @@ def check_team_assignments_amount(allowed_team_assignments: int, team_ids: set):
         )
 
 
+@count_failures
 def check_if_teams_exist(passed_team_ids: set[str], existing_teams_ids: set[str]):
     if len(existing_teams_ids) != len(passed_team_ids):
         not_found_teams_ids = passed_team_ids - existing_teams_ids
@@ -153,22 +571,35 @@ def check_if_teams_exist(passed_team_ids: set[str], existing_teams_ids: set[str]
         )
 
 
+@count_failures
 def check_parent_child_relationship_in_assignment(
-    teams: list[Team], teams_ids: set[str]
+    related_team_pairs: set[tuple[str, str]], teams_ids: set[str]
 ):
-    for team in teams:
-        if str(team.parent_team) in teams_ids:
+    for ancestor_id, descendant_id in related_team_pairs:
+        if ancestor_id in teams_ids and descendant_id in teams_ids:
             raise HTTPException(
                 status_code=400,
                 detail=CANNOT_ASSIGN_CHILD_WITH_PARENT_TO_EXPERIMENT_ERROR,
             )
 
 
+@count_failures
 def check_if_experiment_exists(experiment: Experiment):
     if not experiment:
         raise HTTPException(status_code=404, detail=EXPERIMENT_NOT_FOUND_ERROR)
 
 
+@count_failures
 def check_if_assignments_exist(current_assigned_teams: set[str], team_ids: set[str]):
     if current_assigned_teams == team_ids:
         raise HTTPException(status_code=400, detail=ASSIGNMENTS_ALREADY_EXISTS_ERROR)
+
+
+@count_failures
+def check_if_experiment_is_unique_in_batch(
+    experiment_id: str, seen_experiment_ids: set[str]
+):
+    if experiment_id in seen_experiment_ids:
+        raise HTTPException(
+            status_code=400, detail=EXPERIMENT_DUPLICATED_IN_BATCH_ERROR
+        )
@@ -1,55 +1,418 @@
 import uuid
+from collections import defaultdict
 
 from fastapi import HTTPException
-from sqlalchemy import asc
+from sqlalchemy import String, Uuid, exists, func, insert, literal, select, true
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm import Session
 
+from ..bulk_import import import_error
+from ..cache import EXPERIMENTS_NAMESPACE, TEAMS_NAMESPACE, invalidate
+from ..changes import (
+    CREATED,
+    PARENT_UPDATED,
+    TEAM_ENTITY,
+    change_record,
+    notify_changes,
+    record_changes,
+)
+from ..config import BULK_INSERT_CHUNK_SIZE
+from ..database import dialect_insert, dialect_name
+from ..idempotency import record_response
 from ..messages import (
+    CANNOT_ASSIGN_CHILD_WITH_PARENT_TO_EXPERIMENT_ERROR,
+    CANNOT_MOVE_TEAM_UNDER_ITS_DESCENDANT_ERROR,
     PARENT_TEAM_NOT_FOUND_ERROR,
+    PARENT_TEAM_NOT_IMPORTED_ERROR,
+    TEAM_ALREADY_EXISTS_MSG,
     TEAM_CREATED_SUCCESFULLY_MSG,
+    TEAM_EXISTS_WITH_DIFFERENT_PARENT_ERROR,
+    TEAM_NAME_DUPLICATED_IN_IMPORT_ERROR,
+    TEAM_NOT_FOUND_ERROR,
+    TEAM_PARENT_CYCLE_IN_IMPORT_ERROR,
+    TEAM_PARENT_UPDATED_MSG,
     TEAM_WITH_NAME_EXISTS,
+    TEAMS_IMPORTED_MSG,
+)
+from ..models import Experiment, Team, team_closure, team_experiment_assignment
+from ..pagination import keyset_page
+from ..schemas import ExperimentSummary, TeamRead
+from ..snapshot import mark_dirty
+from .team_closure import (
+    get_ancestry,
+    is_in_subtree,
+    lock_team_hierarchy,
+    move_team_in_closure,
+    subtrees_share_experiment,
+    team_closure_insert,
 )
-from ..models import Experiment, Team
 
 
-def get_teams(db: Session, limit: int):
-    query = (
-        db.query(Team)
-        .options(
-            selectinload(Team.experiments).load_only(
-                Experiment.id, Experiment.description
+def get_teams(db: Session, limit: int, cursor: str | None = None):
+    query = db.query(Team.id, Team.name, Team.parent_team)
+    rows, next_cursor = keyset_page(query, Team.name, Team.id, limit, cursor)
+
+    experiments = get_team_experiments(db, [row.id for row in rows])
+    teams = [
+        TeamRead(
+            id=row.id,
+            name=row.name,
+            parent_team=row.parent_team,
+            experiments=experiments[row.id],
+        )
+        for row in rows
+    ]
+    return teams, next_cursor
+
+
+def get_team_experiments(
+    db: Session, team_ids: list[uuid.UUID]
+) -> dict[uuid.UUID, list[ExperimentSummary]]:
+    experiments = defaultdict(list)
+    if team_ids:
+        rows = db.execute(
+            select(
+                team_experiment_assignment.c.team_id,
+                Experiment.id,
+                Experiment.description,
             )
+            .join(
+                Experiment,
+                Experiment.id == team_experiment_assignment.c.experiment_id,
+            )
+            .where(team_experiment_assignment.c.team_id.in_(team_ids))
+            .order_by(Experiment.description, Experiment.id)
         )
-        .order_by(asc(Team.name))
-        .limit(limit)
-        .all()
+        for team_id, experiment_id, description in rows:
+            experiments[team_id].append(
+                ExperimentSummary(id=experiment_id, description=description)
+            )
+    return experiments
+
+
+def create_team(
+    db: Session,
+    name: str,
+    parent_team_id: str | uuid.UUID | None,
+    create_or_get: bool = False,
+):
+    team_id = uuid.uuid4()
+    parent_team_id = uuid.UUID(str(parent_team_id)) if parent_team_id else None
+    if parent_team_id:
+        lock_team_hierarchy(db, shared=True)
+    if dialect_name(db) == "postgresql":
+        row = db.execute(
+            _create_team_statement(db, team_id, name, parent_team_id)
+        ).one()
+        inserted_id = row.team_id
+        existing = row if row.existing_id is not None else None
+    else:
+        inserted_id = _create_team_in_steps(db, team_id, name, parent_team_id)
+        existing = None
+
+    if inserted_id is None:
+        existing = existing or _get_team_by_name(db, name)
+        if existing is None:
+            raise HTTPException(status_code=404, detail=PARENT_TEAM_NOT_FOUND_ERROR)
+        if not create_or_get:
+            raise HTTPException(status_code=400, detail=TEAM_WITH_NAME_EXISTS)
+        if existing.existing_parent_id != parent_team_id:
+            raise HTTPException(
+                status_code=409, detail=TEAM_EXISTS_WITH_DIFFERENT_PARENT_ERROR
+            )
+        return {
+            "message": TEAM_ALREADY_EXISTS_MSG,
+            "team_id": str(existing.existing_id),
+            "created": False,
+        }
+
+    record_changes(db, [_team_created_change(team_id, name, parent_team_id)])
+    result = {
+        "message": TEAM_CREATED_SUCCESFULLY_MSG,
+        "team_id": str(team_id),
+        "created": True,
+    }
+    record_response(db, result)
+    db.commit()
+    invalidate(TEAMS_NAMESPACE)
+    notify_changes()
+    mark_dirty(team_ids=[team_id])
+
+    return result
+
+
+def _insert_team_statement(
+    db: Session, team_id: uuid.UUID, name: str, parent_team_id: uuid.UUID | None
+):
+    parent_exists = (
+        exists().where(Team.id == parent_team_id) if parent_team_id else true()
+    )
+    new_team = select(
+        literal(team_id, Uuid), literal(name, String), literal(parent_team_id, Uuid)
+    ).where(parent_exists)
+    return (
+        dialect_insert(db, Team)
+        .from_select(["id", "name", "parent_team"], new_team)
+        .on_conflict_do_nothing(index_elements=[Team.name])
+        .returning(Team.id, Team.parent_team)
     )
 
-    return query
 
+def _create_team_statement(
+    db: Session, team_id: uuid.UUID, name: str, parent_team_id: uuid.UUID | None
+):
+    inserted = _insert_team_statement(db, team_id, name, parent_team_id).cte(
+        "inserted_team"
+    )
+    inserted_closure = team_closure_insert(
+        inserted.c.id, inserted.c.parent_team
+    ).cte("inserted_closure")
+
+    return select(
+        select(inserted.c.id).scalar_subquery().label("team_id"),
+        *_existing_team_columns(name),
+    ).add_cte(inserted_closure)
+
+
+def _create_team_in_steps(
+    db: Session, team_id: uuid.UUID, name: str, parent_team_id: uuid.UUID | None
+) -> uuid.UUID | None:
+    # Backends without data-modifying CTEs, such as SQLite, insert the team and
+    # its closure rows in separate statements.
+    inserted_id = db.scalar(_insert_team_statement(db, team_id, name, parent_team_id))
+    if inserted_id is not None:
+        db.execute(
+            team_closure_insert(literal(team_id, Uuid), literal(parent_team_id, Uuid))
+        )
+    return inserted_id
+
+
+def _existing_team_columns(name: str):
+    existing = select(Team.id, Team.parent_team).where(Team.name == name)
+    return (
+        existing.with_only_columns(Team.id).scalar_subquery().label("existing_id"),
+        existing.with_only_columns(Team.parent_team)
+        .scalar_subquery()
+        .label("existing_parent_id"),
+    )
+
+
+def _team_created_change(
+    team_id: uuid.UUID, name: str, parent_team_id: uuid.UUID | None
+) -> dict:
+    return change_record(
+        TEAM_ENTITY,
+        team_id,
+        CREATED,
+        {"name": name, "parent_team_id": _optional_str(parent_team_id)},
+    )
 
-def create_team(db: Session, name: str, parent_team_id: str | None):
-    db_team = Team(id=str(uuid.uuid4()), name=name, parent_team=parent_team_id)
-    db.add(db_team)
+
+def _optional_str(value) -> str | None:
+    return str(value) if value is not None else None
+
+
+def _get_team_by_name(db: Session, name: str):
+    return db.execute(
+        select(
+            Team.id.label("existing_id"), Team.parent_team.label("existing_parent_id")
+        ).where(Team.name == name)
+    ).first()
+
+
+def update_team_parent(
+    db: Session, team_id: uuid.UUID, parent_team_id: uuid.UUID | None
+):
+    lock_team_hierarchy(db)
+    team = db.query(Team).filter(Team.id == team_id).with_for_update().first()
+    if not team:
+        raise HTTPException(status_code=404, detail=TEAM_NOT_FOUND_ERROR)
+
+    if parent_team_id:
+        parent_team = db.query(Team).filter(Team.id == parent_team_id).first()
+        if not parent_team:
+            raise HTTPException(status_code=404, detail=PARENT_TEAM_NOT_FOUND_ERROR)
+        if is_in_subtree(db, parent_team_id, team_id):
+            raise HTTPException(
+                status_code=400, detail=CANNOT_MOVE_TEAM_UNDER_ITS_DESCENDANT_ERROR
+            )
+        if subtrees_share_experiment(db, team_id, parent_team_id):
+            raise HTTPException(
+                status_code=400,
+                detail=CANNOT_ASSIGN_CHILD_WITH_PARENT_TO_EXPERIMENT_ERROR,
+            )
+
+    record_changes(
+        db,
+        [
+            change_record(
+                TEAM_ENTITY,
+                team_id,
+                PARENT_UPDATED,
+                {
+                    "parent_team_id": _optional_str(parent_team_id),
+                    "previous_parent_team_id": _optional_str(team.parent_team),
+                },
+            )
+        ],
+    )
+    team.parent_team = parent_team_id
+    move_team_in_closure(db, team_id, parent_team_id)
 
     try:
         db.commit()
     except IntegrityError as e:
         db.rollback()
         error_info = str(e.orig)
-        if 'violates unique constraint "teams_name_key"' in error_info:
-            raise HTTPException(status_code=400, detail=TEAM_WITH_NAME_EXISTS)
-        elif 'violates foreign key constraint "teams_parent_team_fkey' in error_info:
-            raise HTTPException(status_code=404, detail=PARENT_TEAM_NOT_FOUND_ERROR)
+        raise HTTPException(status_code=400, detail=f"IntegrityError occurred: {error_info}")
+
+    invalidate(EXPERIMENTS_NAMESPACE, TEAMS_NAMESPACE)
+    notify_changes()
+    mark_dirty(team_ids=[team_id])
+
+    return {"message": TEAM_PARENT_UPDATED_MSG, "team_id": str(team_id)}
+
+
+def import_teams(db: Session, rows: list[dict]):
+    errors = []
+    rows_by_name = {}
+    for row in rows:
+        if row["name"] in rows_by_name:
+            errors.append(_import_row_error(row, TEAM_NAME_DUPLICATED_IN_IMPORT_ERROR))
         else:
-            raise HTTPException(
-                status_code=400, detail='IntegrityError occurred: {error_info}'
+            rows_by_name[row["name"]] = row
+
+    referenced_names = set(rows_by_name) | {
+        row["parent_team"] for row in rows_by_name.values() if row["parent_team"]
+    }
+    team_ids = get_team_ids_by_name(db, referenced_names)
+    for name in set(rows_by_name) & set(team_ids):
+        errors.append(_import_row_error(rows_by_name.pop(name), TEAM_WITH_NAME_EXISTS))
+
+    level = []
+    orphans = []
+    children = defaultdict(list)
+    for row in rows_by_name.values():
+        parent_name = row["parent_team"]
+        if parent_name in rows_by_name:
+            children[parent_name].append(row)
+        elif parent_name is None or parent_name in team_ids:
+            level.append(row)
+        else:
+            orphans.append(row)
+    for row in orphans:
+        errors.append(_import_row_error(row, PARENT_TEAM_NOT_FOUND_ERROR))
+        _reject_imported_descendants(
+            row["name"], children, errors, PARENT_TEAM_NOT_IMPORTED_ERROR
+        )
+
+    parent_ids = {team_ids[row["parent_team"]] for row in level if row["parent_team"]}
+    if parent_ids:
+        lock_team_hierarchy(db, shared=True)
+    ancestry = get_ancestry(db, parent_ids)
+    closure_rows = []
+    changes = []
+    while level:
+        inserted_ids = _insert_teams(db, level, team_ids)
+        next_level = []
+        for row in level:
+            team_id = inserted_ids.get(row["name"])
+            if team_id is None:
+                errors.append(_import_row_error(row, TEAM_WITH_NAME_EXISTS))
+                _reject_imported_descendants(
+                    row["name"], children, errors, PARENT_TEAM_NOT_IMPORTED_ERROR
+                )
+                continue
+
+            team_ids[row["name"]] = team_id
+            parent_id = team_ids.get(row["parent_team"])
+            changes.append(_team_created_change(team_id, row["name"], parent_id))
+            ancestry[team_id] = [(team_id, 0)] + [
+                (ancestor_id, depth + 1)
+                for ancestor_id, depth in ancestry.get(parent_id, [])
+            ]
+            closure_rows.extend(
+                {"ancestor_id": ancestor_id, "descendant_id": team_id, "depth": depth}
+                for ancestor_id, depth in ancestry[team_id]
             )
+            next_level.extend(children.pop(row["name"], []))
+        level = next_level
+
+    for name in list(children):
+        _reject_imported_descendants(
+            name, children, errors, TEAM_PARENT_CYCLE_IN_IMPORT_ERROR
+        )
+
+    if closure_rows:
+        db.execute(insert(team_closure), closure_rows)
+    record_changes(db, changes)
 
-    db.refresh(db_team)
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        error_info = str(e.orig)
+        raise HTTPException(status_code=400, detail=f"IntegrityError occurred: {error_info}")
+
+    invalidate(TEAMS_NAMESPACE)
+    notify_changes()
+    mark_dirty(
+        team_ids=[row["descendant_id"] for row in closure_rows if row["depth"] == 0]
+    )
 
     return {
-        "message": TEAM_CREATED_SUCCESFULLY_MSG,
-        "team_id": str(db_team.id),
+        "message": TEAMS_IMPORTED_MSG,
+        "created": len(rows) - len(errors),
+        "errors": errors,
     }
+
+
+def get_team_ids_by_name(db: Session, names: set[str]) -> dict[str, uuid.UUID]:
+    team_ids = {}
+    for chunk in _chunks(list(names)):
+        rows = db.execute(select(Team.name, Team.id).where(Team.name.in_(chunk)))
+        team_ids.update(rows.all())
+    return team_ids
+
+
+def count_teams(db: Session) -> int:
+    return db.scalar(select(func.count()).select_from(Team))
+
+
+def _insert_teams(
+    db: Session, rows: list[dict], team_ids: dict[str, uuid.UUID]
+) -> dict[str, uuid.UUID]:
+    values = [
+        {
+            "id": uuid.uuid4(),
+            "name": row["name"],
+            "parent_team": team_ids.get(row["parent_team"]),
+        }
+        for row in rows
+    ]
+    result = db.execute(
+        dialect_insert(db, Team.__table__)
+        .on_conflict_do_nothing(index_elements=[Team.name])
+        .returning(Team.name, Team.id),
+        values,
+    )
+    return dict(result.all())
+
+
+def _reject_imported_descendants(
+    name: str, children: dict[str, list[dict]], errors: list[dict], detail: str
+):
+    pending = children.pop(name, [])
+    while pending:
+        row = pending.pop()
+        errors.append(_import_row_error(row, detail))
+        pending.extend(children.pop(row["name"], []))
+
+
+def _import_row_error(row: dict, detail: str) -> dict:
+    return import_error(row["line"], row["name"], detail)
+
+
+def _chunks(items: list):
+    for start in range(0, len(items), BULK_INSERT_CHUNK_SIZE):
+        yield items[start : start + BULK_INSERT_CHUNK_SIZE]
@@ -0,0 +1,143 @@
+import uuid
+
+from sqlalchemy import delete, exists, func, insert, literal, select, true
+from sqlalchemy.orm import Session
+
+from ..config import TEAM_HIERARCHY_LOCK_ID
+from ..database import dialect_name
+from ..models import Team, team_closure, team_experiment_assignment
+
+CLOSURE_COLUMNS = ["ancestor_id", "descendant_id", "depth"]
+
+
+def lock_team_hierarchy(db: Session, shared: bool = False):
+    # Moves take the lock exclusively. Assignment writes and new teams that
+    # copy their parent's closure rows share it, so neither can act on a
+    # hierarchy that a concurrent move is rewriting. SQLite transactions
+    # already start with the database write lock held.
+    if dialect_name(db) == "postgresql":
+        lock = (
+            func.pg_advisory_xact_lock_shared if shared else func.pg_advisory_xact_lock
+        )
+        db.execute(select(lock(TEAM_HIERARCHY_LOCK_ID)))
+
+
+def subtree_ids(team_id: uuid.UUID):
+    return select(team_closure.c.descendant_id).where(
+        team_closure.c.ancestor_id == team_id
+    )
+
+
+def ancestor_ids(team_id: uuid.UUID):
+    return select(team_closure.c.ancestor_id).where(
+        team_closure.c.descendant_id == team_id
+    )
+
+
+def team_closure_insert(team_id, parent_team_id):
+    rows = select(team_id, team_id, literal(0)).union_all(
+        select(
+            team_closure.c.ancestor_id,
+            team_id,
+            team_closure.c.depth + 1,
+        ).where(team_closure.c.descendant_id == parent_team_id)
+    )
+    return insert(team_closure).from_select(CLOSURE_COLUMNS, rows)
+
+
+def move_team_in_closure(
+    db: Session, team_id: uuid.UUID, parent_team_id: uuid.UUID | None
+):
+    subtree = subtree_ids(team_id)
+    db.execute(
+        delete(team_closure).where(
+            team_closure.c.descendant_id.in_(subtree),
+            team_closure.c.ancestor_id.not_in(subtree),
+        )
+    )
+
+    if parent_team_id:
+        supertree = team_closure.alias("supertree")
+        subtree_rows = team_closure.alias("subtree")
+        rows = (
+            select(
+                supertree.c.ancestor_id,
+                subtree_rows.c.descendant_id,
+                supertree.c.depth + subtree_rows.c.depth + 1,
+            )
+            .select_from(supertree.join(subtree_rows, true()))
+            .where(
+                supertree.c.descendant_id == parent_team_id,
+                subtree_rows.c.ancestor_id == team_id,
+            )
+        )
+        db.execute(insert(team_closure).from_select(CLOSURE_COLUMNS, rows))
+
+
+def rebuild_team_closure(db: Session):
+    tree = select(
+        Team.id.label("ancestor_id"),
+        Team.id.label("descendant_id"),
+        literal(0).label("depth"),
+    ).cte("tree", recursive=True)
+    tree = tree.union_all(
+        select(tree.c.ancestor_id, Team.id, tree.c.depth + 1).join(
+            Team, Team.parent_team == tree.c.descendant_id
+        )
+    )
+
+    db.execute(delete(team_closure))
+    db.execute(insert(team_closure).from_select(CLOSURE_COLUMNS, select(tree)))
+
+
+def get_related_team_pairs(
+    db: Session, team_ids: set[str]
+) -> set[tuple[str, str]]:
+    rows = db.execute(
+        select(team_closure.c.ancestor_id, team_closure.c.descendant_id).where(
+            team_closure.c.ancestor_id.in_(team_ids),
+            team_closure.c.descendant_id.in_(team_ids),
+            team_closure.c.depth > 0,
+        )
+    )
+    return {(str(ancestor_id), str(descendant_id)) for ancestor_id, descendant_id in rows}
+
+
+def get_ancestry(
+    db: Session, team_ids: set[uuid.UUID]
+) -> dict[uuid.UUID, list[tuple[uuid.UUID, int]]]:
+    ancestry = {team_id: [] for team_id in team_ids}
+    if team_ids:
+        rows = db.execute(
+            select(
+                team_closure.c.descendant_id,
+                team_closure.c.ancestor_id,
+                team_closure.c.depth,
+            ).where(team_closure.c.descendant_id.in_(team_ids))
+        )
+        for descendant_id, ancestor_id, depth in rows:
+            ancestry[descendant_id].append((ancestor_id, depth))
+    return ancestry
+
+
+def is_in_subtree(db: Session, team_id: uuid.UUID, root_team_id: uuid.UUID) -> bool:
+    return db.query(
+        exists().where(
+            team_closure.c.ancestor_id == root_team_id,
+            team_closure.c.descendant_id == team_id,
+        )
+    ).scalar()
+
+
+def subtrees_share_experiment(
+    db: Session, team_id: uuid.UUID, parent_team_id: uuid.UUID
+) -> bool:
+    ancestor_assignment = team_experiment_assignment.alias("ancestor_assignment")
+    subtree_assignment = team_experiment_assignment.alias("subtree_assignment")
+    return db.query(
+        exists().where(
+            ancestor_assignment.c.experiment_id == subtree_assignment.c.experiment_id,
+            ancestor_assignment.c.team_id.in_(ancestor_ids(parent_team_id)),
+            subtree_assignment.c.team_id.in_(subtree_ids(team_id)),
+        )
+    ).scalar()
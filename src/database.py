@@ -1,15 +1,151 @@
 import os
+import uuid
 
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+
+from .instrumentation import instrument_engine
+from .pool_metrics import (
+    InstrumentedAsyncAdaptedQueuePool,
+    InstrumentedNullPool,
+    InstrumentedQueuePool,
+    InstrumentedStaticPool,
+)
 
 load_dotenv()
 
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
+DATABASE_ASYNC = os.getenv("DATABASE_ASYNC", "false").lower() == "true"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() == "true"
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
+
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def is_memory_database(url: URL) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def get_engine_options(url: URL, is_async: bool) -> dict:
+    if is_memory_database(url):
+        options = {"poolclass": InstrumentedStaticPool}
+    elif DB_PGBOUNCER:
+        options = {"poolclass": InstrumentedNullPool}
+        if is_async:
+            options["connect_args"] = {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+            }
+    else:
+        options = {
+            "poolclass": (
+                InstrumentedAsyncAdaptedQueuePool if is_async else InstrumentedQueuePool
+            ),
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+        }
+    if url.get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+    options["pool_pre_ping"] = DB_POOL_PRE_PING
+    return options
+
+
+def configure_engine(engine):
+    instrument_engine(engine)
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _configure_sqlite_connection)
+        event.listen(engine, "begin", _begin_sqlite_transaction)
+
+
+def _configure_sqlite_connection(dbapi_connection, connection_record):
+    # Let SQLAlchemy emit BEGIN itself, otherwise pysqlite defers it until the
+    # first write and savepoints do not work.
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys = ON")
+    cursor.close()
+
+
+def _begin_sqlite_transaction(connection):
+    # IMMEDIATE takes the write lock up front, which serializes writers the
+    # way the PostgreSQL row and advisory locks do.
+    connection.connection.cursor().execute("BEGIN IMMEDIATE")
+
+
+def dialect_name(db: Session) -> str:
+    return db.get_bind().dialect.name
+
+
+def dialect_insert(db: Session, table):
+    if dialect_name(db) == "sqlite":
+        return sqlite_insert(table)
+    return pg_insert(table)
+
+
+engine = None
+async_engine = None
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+
+
+def init_engines():
+    global engine, async_engine
+    url = make_url(SQLALCHEMY_DATABASE_URL)
+    if engine is None:
+        engine = create_engine(url, **get_engine_options(url, is_async=False))
+        configure_engine(engine)
+        SessionLocal.configure(bind=engine)
+    if DATABASE_ASYNC and async_engine is None:
+        async_url = make_url(
+            os.getenv("ASYNC_DATABASE_URL")
+            or url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()])
+        )
+        async_engine = create_async_engine(
+            async_url, **get_engine_options(async_url, is_async=True)
+        )
+        configure_engine(async_engine.sync_engine)
+        AsyncSessionLocal.configure(bind=async_engine)
+
+
+async def dispose_engines():
+    global engine, async_engine
+    if async_engine is not None:
+        await async_engine.dispose()
+        async_engine = None
+    if engine is not None:
+        engine.dispose()
+        engine = None
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
+
+AnySession = Session | AsyncSession
+
+
+async def run_db(db: AnySession, fn, *args):
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args)
+    return await run_in_threadpool(fn, db, *args)
+
+
+def get_pool_metrics() -> dict:
+    engines = {}
+    if engine is not None:
+        engines["sync"] = engine
+    if async_engine is not None:
+        engines["async"] = async_engine.sync_engine
+    return {name: engine.pool.get_metrics() for name, engine in engines.items()}
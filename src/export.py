@@ -0,0 +1,132 @@
+import csv
+import io
+import json
+from typing import Literal
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+
+from .config import EXPORT_BATCH_SIZE
+from .models import Experiment, Team, team_experiment_assignment
+
+ExportFormat = Literal["ndjson", "csv"]
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+EXPERIMENT_EXPORT_COLUMNS = (
+    "id",
+    "description",
+    "sample_ratio",
+    "allowed_team_assignments",
+    "team_ids",
+)
+TEAM_EXPORT_COLUMNS = ("id", "name", "parent_team_id")
+
+
+class ExperimentRecords:
+    columns = EXPERIMENT_EXPORT_COLUMNS
+    query = (
+        select(
+            Experiment.id,
+            Experiment.description,
+            Experiment.sample_ratio,
+            Experiment.allowed_team_assignments,
+            team_experiment_assignment.c.team_id,
+        )
+        .outerjoin(
+            team_experiment_assignment,
+            team_experiment_assignment.c.experiment_id == Experiment.id,
+        )
+        .order_by(Experiment.id, team_experiment_assignment.c.team_id)
+    )
+
+    def __init__(self):
+        self.current = None
+
+    def feed(self, rows) -> list[tuple]:
+        records = []
+        for experiment_id, description, sample_ratio, allowed, team_id in rows:
+            if self.current is None or self.current[0] != experiment_id:
+                if self.current is not None:
+                    records.append(self.current)
+                self.current = (experiment_id, description, sample_ratio, allowed, [])
+            if team_id is not None:
+                self.current[4].append(team_id)
+        return records
+
+    def flush(self) -> list[tuple]:
+        return [self.current] if self.current is not None else []
+
+
+class TeamRecords:
+    columns = TEAM_EXPORT_COLUMNS
+    query = select(Team.id, Team.name, Team.parent_team).order_by(Team.id)
+
+    def feed(self, rows) -> list[tuple]:
+        return rows
+
+    def flush(self) -> list[tuple]:
+        return []
+
+
+def encode_ndjson(columns: tuple[str, ...], records) -> str:
+    return "".join(
+        json.dumps(dict(zip(columns, record)), default=str) + "\n"
+        for record in records
+    )
+
+
+def encode_csv(columns: tuple[str, ...], records) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(
+        [
+            ";".join(map(str, value)) if isinstance(value, list) else value
+            for value in record
+        ]
+        for record in records
+    )
+    return buffer.getvalue()
+
+
+def _encoder(export_format: ExportFormat):
+    return encode_csv if export_format == "csv" else encode_ndjson
+
+
+def stream_export(session_factory, records, export_format: ExportFormat):
+    encode = _encoder(export_format)
+    if export_format == "csv":
+        yield encode(records.columns, [records.columns])
+
+    with session_factory() as db:
+        result = db.execute(
+            records.query.execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        for partition in result.partitions():
+            yield encode(records.columns, records.feed(partition))
+        yield encode(records.columns, records.flush())
+
+
+async def stream_export_async(session_factory, records, export_format: ExportFormat):
+    encode = _encoder(export_format)
+    if export_format == "csv":
+        yield encode(records.columns, [records.columns])
+
+    async with session_factory() as db:
+        result = await db.stream(
+            records.query.execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        async for partition in result.partitions():
+            yield encode(records.columns, records.feed(partition))
+        yield encode(records.columns, records.flush())
+
+
+def export_response(
+    session_factory, records, export_format: ExportFormat, is_async: bool, name: str
+) -> StreamingResponse:
+    stream = stream_export_async if is_async else stream_export
+    return StreamingResponse(
+        stream(session_factory, records, export_format),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{name}.{export_format}"'
+        },
+    )
@@ -0,0 +1,162 @@
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from .config import IDEMPOTENCY_PURGE_INTERVAL_SECONDS
+from .database import AnySession, dialect_insert, run_db
+from .messages import IDEMPOTENCY_KEY_IN_PROGRESS_ERROR, IDEMPOTENCY_KEY_REUSED_ERROR
+from .models import IdempotencyKey
+
+IDEMPOTENCY_KEY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_LOCK_SECONDS = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60"))
+REPLAYED_HEADER = "Idempotent-Replayed"
+RESPONSE_RECORDER_INFO_KEY = "idempotent_response_recorder"
+
+_last_purge = float("-inf")
+
+
+def request_fingerprint(method: str, query: str, body: bytes) -> str:
+    digest = hashlib.sha256()
+    for part in (method.encode(), query.encode(), body):
+        digest.update(len(part).to_bytes(8, "little"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def _key_filter(key: str, endpoint: str):
+    return IdempotencyKey.key == key, IdempotencyKey.endpoint == endpoint
+
+
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def purge_expired_keys(db: Session):
+    db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < _utc_now()))
+
+
+def claim_key(db: Session, key: str, endpoint: str, request_hash: str):
+    global _last_purge
+    if time.monotonic() - _last_purge > IDEMPOTENCY_PURGE_INTERVAL_SECONDS:
+        _last_purge = time.monotonic()
+        purge_expired_keys(db)
+
+    now = _utc_now()
+    statement = dialect_insert(db, IdempotencyKey).values(
+        key=key,
+        endpoint=endpoint,
+        request_hash=request_hash,
+        expires_at=now + timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS),
+    )
+    claimed = db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[IdempotencyKey.key, IdempotencyKey.endpoint],
+            set_={
+                "request_hash": statement.excluded.request_hash,
+                "status_code": None,
+                "response_body": None,
+                "expires_at": statement.excluded.expires_at,
+            },
+            where=IdempotencyKey.expires_at < now,
+        ).returning(IdempotencyKey.key)
+    ).first()
+    db.commit()
+    if claimed:
+        return None
+
+    stored = db.execute(
+        select(
+            IdempotencyKey.request_hash,
+            IdempotencyKey.status_code,
+            IdempotencyKey.response_body,
+        ).where(*_key_filter(key, endpoint))
+    ).first()
+    if stored is not None and stored.request_hash != request_hash:
+        raise HTTPException(status_code=422, detail=IDEMPOTENCY_KEY_REUSED_ERROR)
+    if stored is None or stored.status_code is None:
+        raise HTTPException(status_code=409, detail=IDEMPOTENCY_KEY_IN_PROGRESS_ERROR)
+    return stored
+
+
+def _write_response(
+    db: Session, key: str, endpoint: str, status_code: int, response_body: bytes
+):
+    db.execute(
+        update(IdempotencyKey)
+        .where(*_key_filter(key, endpoint))
+        .values(
+            status_code=status_code,
+            response_body=response_body,
+            expires_at=_utc_now() + timedelta(seconds=IDEMPOTENCY_KEY_TTL_SECONDS),
+        )
+    )
+
+
+def store_response(
+    db: Session, key: str, endpoint: str, status_code: int, response_body: bytes
+):
+    _write_response(db, key, endpoint, status_code, response_body)
+    db.commit()
+
+
+def record_response(db: Session, result):
+    # Called by create functions right before they commit, so the response
+    # is stored in the same transaction as the rows it describes.
+    recorder = db.info.pop(RESPONSE_RECORDER_INFO_KEY, None)
+    if recorder is not None:
+        recorder(db, result)
+
+
+def release_key(db: Session, key: str, endpoint: str):
+    if not db.is_active:
+        db.rollback()
+    db.execute(delete(IdempotencyKey).where(*_key_filter(key, endpoint)))
+    db.commit()
+
+
+async def idempotent_response(
+    request: Request, db: AnySession, key: str | None, create, respond
+) -> Response:
+    if key is None:
+        return respond(await create())
+
+    endpoint = request.url.path
+    request_hash = request_fingerprint(
+        request.method, request.url.query, await request.body()
+    )
+    stored = await run_db(db, claim_key, key, endpoint, request_hash)
+    if stored is not None:
+        return Response(
+            stored.response_body,
+            status_code=stored.status_code,
+            media_type="application/json",
+            headers={REPLAYED_HEADER: "true"},
+        )
+
+    response = None
+
+    def recorder(db: Session, result):
+        nonlocal response
+        response = respond(result)
+        _write_response(db, key, endpoint, response.status_code, response.body)
+
+    db.info[RESPONSE_RECORDER_INFO_KEY] = recorder
+    try:
+        result = await create()
+    except BaseException:
+        db.info.pop(RESPONSE_RECORDER_INFO_KEY, None)
+        await run_db(db, release_key, key, endpoint)
+        raise
+
+    if db.info.pop(RESPONSE_RECORDER_INFO_KEY, None) is not None:
+        # Nothing was committed, e.g. create_or_get found an existing team.
+        response = respond(result)
+        await run_db(
+            db, store_response, key, endpoint, response.status_code, response.body
+        )
+    return response
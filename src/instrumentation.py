@@ -0,0 +1,127 @@
+import logging
+import os
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200"))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "false").lower() == "true"
+
+EXPLAIN_SAVEPOINT = "slow_query_explain"
+EXPLAINABLE_STATEMENTS = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+QUERY_STARTS_KEY = "instrumentation_query_starts"
+
+
+class RequestStats:
+    __slots__ = ("statements", "db_seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+
+    def record(self, seconds: float):
+        self.statements += 1
+        self.db_seconds += seconds
+
+
+_request_stats: ContextVar[RequestStats | None] = ContextVar(
+    "request_stats", default=None
+)
+
+
+def get_request_stats() -> RequestStats | None:
+    return _request_stats.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault(QUERY_STARTS_KEY, []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info[QUERY_STARTS_KEY].pop()
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.record(seconds)
+    if seconds * 1000 >= SLOW_QUERY_THRESHOLD_MS:
+        log_slow_query(conn, statement, parameters, executemany, seconds)
+
+
+def _handle_error(context):
+    if context.connection is not None:
+        context.connection.info.pop(QUERY_STARTS_KEY, None)
+
+
+def log_slow_query(conn, statement: str, parameters, executemany: bool, seconds):
+    plan = None
+    if (
+        SLOW_QUERY_EXPLAIN
+        and not executemany
+        and statement.lstrip().upper().startswith(EXPLAINABLE_STATEMENTS)
+    ):
+        plan = explain(conn, statement, parameters)
+    logger.warning(
+        "Slow query (%.1f ms): %s\nParameters: %r%s",
+        seconds * 1000,
+        statement,
+        parameters,
+        f"\nPlan:\n{plan}" if plan else "",
+    )
+
+
+def explain(conn, statement: str, parameters) -> str | None:
+    cursor = conn.connection.cursor()
+    cursor.execute(f"SAVEPOINT {EXPLAIN_SAVEPOINT}")
+    try:
+        cursor.execute(f"EXPLAIN {statement}", parameters)
+        return "\n".join(str(row[0]) for row in cursor.fetchall())
+    except Exception:
+        logger.exception("Could not explain slow query")
+        cursor.execute(f"ROLLBACK TO SAVEPOINT {EXPLAIN_SAVEPOINT}")
+        return None
+    finally:
+        cursor.execute(f"RELEASE SAVEPOINT {EXPLAIN_SAVEPOINT}")
+        cursor.close()
+
+
+def instrument_engine(engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+def format_server_timing(stats: RequestStats, total_seconds: float) -> str:
+    return (
+        f'db;desc="{stats.statements} statements";dur={stats.db_seconds * 1000:.3f}, '
+        f"total;dur={total_seconds * 1000:.3f}"
+    )
+
+
+class QueryStatsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+
+        async def send_with_server_timing(message):
+            if message["type"] == "http.response.start":
+                header = format_server_timing(stats, time.perf_counter() - started)
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"server-timing", header.encode("latin-1")),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_server_timing)
+        finally:
+            _request_stats.reset(token)
@@ -1,87 +1,394 @@
+from contextlib import asynccontextmanager
 from typing import Annotated, List
 from uuid import UUID
 
-from fastapi import Body, Depends, FastAPI, Query, Response, status
-from sqlalchemy.orm import Session
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    FastAPI,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
+from pydantic import TypeAdapter
 
-from . import crud, models
-from .crud.experiment import create_experiment, get_experiments, update_assignments
-from .crud.team import create_team, get_teams
-from .database import SessionLocal, engine
+from .bulk_import import read_team_import
+from .cache import EXPERIMENTS_NAMESPACE, TEAMS_NAMESPACE, cached_listing
+from .changes import stream_changes, wait_for_changes
+from .config import (
+    CHANGES_MAX_WAIT_SECONDS,
+    IDEMPOTENCY_KEY_MAX_LENGTH,
+    MAX_CHANGES_LIMIT,
+    MAX_SEARCH_LIMIT,
+    MAX_SEARCH_QUERY_LENGTH,
+)
+from .crud import aio
+from .database import (
+    DATABASE_ASYNC,
+    AnySession,
+    AsyncSessionLocal,
+    SessionLocal,
+    dispose_engines,
+    get_pool_metrics,
+    init_engines,
+)
+from .export import ExperimentRecords, ExportFormat, TeamRecords, export_response
+from .idempotency import idempotent_response
+from .instrumentation import QueryStatsMiddleware
+from .messages import TEAM_NOT_FOUND_ERROR
+from .metrics import (
+    METRICS_CONTENT_TYPE,
+    RequestMetricsMiddleware,
+    mark_process_dead,
+    render_metrics,
+    update_entity_gauges,
+)
+from .schemas import (
+    AssignmentUpdate,
+    BucketRequest,
+    ChangesPage,
+    ExperimentCreate,
+    ExperimentRead,
+    ExperimentSearchResult,
+    ExperimentsByTeams,
+    ExperimentsByTeamsRequest,
+    TeamRead,
+)
+from .snapshot import get_current_snapshot
 
-models.Base.metadata.create_all(bind=engine)
+try:
+    import orjson  # noqa: F401
+except ImportError:
+    DefaultResponse = JSONResponse
+else:
+    DefaultResponse = ORJSONResponse
 
-app = FastAPI()
 
-
-def get_db():
-    db = SessionLocal()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_engines()
     try:
-        yield db
+        yield
     finally:
-        db.close()
+        await dispose_engines()
+        mark_process_dead()
 
 
-@app.get("/experiments/")
-def read_experiments(
-    response: Response,
+router = APIRouter()
+
+EXPERIMENT_LIST_ADAPTER = TypeAdapter(list[ExperimentRead])
+TEAM_LIST_ADAPTER = TypeAdapter(list[TeamRead])
+
+
+if DATABASE_ASYNC:
+
+    async def get_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    def get_session_factory():
+        return AsyncSessionLocal
+
+else:
+
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def get_session_factory():
+        return SessionLocal
+
+
+@router.get("/experiments/", response_model=list[ExperimentRead])
+async def read_experiments(
+    request: Request,
     team_name: str | None = None,
-    limit: int = 100,
-    db: Session = Depends(get_db),
+    limit: int = Query(100, ge=1),
+    cursor: str | None = None,
+    include_descendants: bool = False,
+    db: AnySession = Depends(get_db),
 ):
-    experiments = crud.experiment.get_experiments(db, team_name, limit)
-    if not experiments:
-        response.status_code = status.HTTP_204_NO_CONTENT
-        return []
-    return experiments
+    params = {
+        "team_name": team_name,
+        "limit": limit,
+        "cursor": cursor,
+        "include_descendants": include_descendants,
+    }
+    return await cached_listing(
+        request,
+        EXPERIMENTS_NAMESPACE,
+        params,
+        lambda: aio.get_experiments(
+            db, team_name, limit, cursor, include_descendants
+        ),
+        EXPERIMENT_LIST_ADAPTER,
+    )
 
 
-@app.post("/experiments/")
-def create_experiment(
-    response: Response,
+@router.get("/experiments/search", response_model=list[ExperimentSearchResult])
+async def search_experiments(
+    q: str = Query(..., min_length=1, max_length=MAX_SEARCH_QUERY_LENGTH),
+    limit: int = Query(20, ge=1, le=MAX_SEARCH_LIMIT),
+    prefix: bool = False,
+    db: AnySession = Depends(get_db),
+):
+    return await aio.search_experiments(db, q, limit, prefix)
+
+
+@router.post("/experiments/")
+async def create_experiment(
+    request: Request,
     description: str = Body(...),
     sample_ratio: float = Body(...),
     allowed_team_assignments: int = Body(...),
     team_ids: List[UUID] = Body(...),
-    db: Session = Depends(get_db),
+    idempotency_key: str | None = Header(None, max_length=IDEMPOTENCY_KEY_MAX_LENGTH),
+    db: AnySession = Depends(get_db),
 ):
-    experiment = crud.experiment.create_experiment(
-        db, description, sample_ratio, allowed_team_assignments, team_ids
+    def create():
+        return aio.create_experiment(
+            db, description, sample_ratio, allowed_team_assignments, team_ids
+        )
+
+    def respond(experiment):
+        return DefaultResponse(experiment, status_code=status.HTTP_201_CREATED)
+
+    return await idempotent_response(request, db, idempotency_key, create, respond)
+
+
+@router.post("/experiments/by-teams", response_model=ExperimentsByTeams)
+async def read_experiments_by_teams(
+    lookup: ExperimentsByTeamsRequest, db: AnySession = Depends(get_db)
+):
+    return await aio.get_experiments_by_teams(
+        db, lookup.team_names, lookup.team_ids, lookup.include_descendants
     )
+
+
+@router.post("/experiments/bulk")
+async def create_experiments(
+    response: Response,
+    experiments: List[ExperimentCreate] = Body(...),
+    db: AnySession = Depends(get_db),
+):
+    result = await aio.create_experiments(db, experiments)
     response.status_code = status.HTTP_201_CREATED
-    return experiment
+    return result
+
 
+@router.put("/experiments/assignments/bulk")
+async def update_assignments_bulk(
+    updates: List[AssignmentUpdate] = Body(...), db: AnySession = Depends(get_db)
+):
+    return await aio.update_assignments_bulk(db, updates)
 
-@app.put("/experiments/{experiment_id}/teams")
-def update_assignments(
+
+@router.put("/experiments/{experiment_id}/teams")
+async def update_assignments(
     experiment_id: str,
     team_ids: Annotated[list[str], Query()],
-    db: Session = Depends(get_db),
+    db: AnySession = Depends(get_db),
 ):
-    return crud.experiment.update_assignments(db, experiment_id, team_ids)
+    return await aio.update_assignments(db, experiment_id, team_ids)
 
 
-@app.get("/teams/")
-def read_teams(response: Response, limit: int = 100, db: Session = Depends(get_db)):
-    teams = crud.team.get_teams(db, limit)
-    if not teams:
-        response.status_code = status.HTTP_204_NO_CONTENT
-        return []
-    return teams
+@router.post("/experiments/{experiment_id}/bucket")
+async def bucket_units(
+    experiment_id: UUID,
+    bucket_request: BucketRequest,
+    db: AnySession = Depends(get_db),
+):
+    from .bucketing import units_in_sample
 
+    sample_ratio = await aio.get_sample_ratio(db, experiment_id)
+    in_sample = await run_in_threadpool(
+        units_in_sample, experiment_id, bucket_request.unit_ids, sample_ratio
+    )
+    return {
+        "experiment_id": str(experiment_id),
+        "sample_ratio": sample_ratio,
+        "in_sample": in_sample.tolist(),
+    }
 
-@app.post("/teams/")
-def create_team(
-    response: Response,
+
+@router.get("/teams/", response_model=list[TeamRead])
+async def read_teams(
+    request: Request,
+    limit: int = Query(100, ge=1),
+    cursor: str | None = None,
+    db: AnySession = Depends(get_db),
+):
+    return await cached_listing(
+        request,
+        TEAMS_NAMESPACE,
+        {"limit": limit, "cursor": cursor},
+        lambda: aio.get_teams(db, limit, cursor),
+        TEAM_LIST_ADAPTER,
+    )
+
+
+@router.post("/teams/")
+async def create_team(
+    request: Request,
     name: str = Body(...),
     parent_team_id: UUID | None = Body(None),
-    db: Session = Depends(get_db),
+    create_or_get: bool = False,
+    idempotency_key: str | None = Header(None, max_length=IDEMPOTENCY_KEY_MAX_LENGTH),
+    db: AnySession = Depends(get_db),
+):
+    def create():
+        return aio.create_team(db, name, parent_team_id, create_or_get)
+
+    def respond(team):
+        return DefaultResponse(
+            team,
+            status_code=(
+                status.HTTP_201_CREATED if team["created"] else status.HTTP_200_OK
+            ),
+        )
+
+    return await idempotent_response(request, db, idempotency_key, create, respond)
+
+
+@router.post("/teams/bulk")
+async def import_teams(
+    request: Request, response: Response, db: AnySession = Depends(get_db)
 ):
-    team = crud.team.create_team(db, name, parent_team_id)
+    rows, parse_errors = await read_team_import(request)
+    result = await aio.import_teams(db, rows)
+    result["errors"] = sorted(
+        parse_errors + result["errors"], key=lambda error: error["line"]
+    )
     response.status_code = status.HTTP_201_CREATED
-    return team
+    return result
+
+
+@router.put("/teams/{team_id}/parent")
+async def update_team_parent(
+    team_id: UUID,
+    parent_team_id: UUID | None = Body(None, embed=True),
+    db: AnySession = Depends(get_db),
+):
+    return await aio.update_team_parent(db, team_id, parent_team_id)
+
+
+@router.get("/snapshot/teams/{team_id}/experiments")
+async def read_snapshot_team_experiments(
+    team_id: UUID, db: AnySession = Depends(get_db)
+):
+    snapshot = get_current_snapshot() or await aio.get_snapshot(db)
+    experiments = snapshot.get_team_experiments(team_id)
+    if experiments is None:
+        raise HTTPException(status_code=404, detail=TEAM_NOT_FOUND_ERROR)
+    return {
+        "team_id": str(team_id),
+        "snapshot_version": snapshot.version,
+        "experiments": [
+            {
+                "id": str(experiment_id),
+                "sample_ratio": sample_ratio,
+                "assigned_team_id": str(assigned_team_id),
+            }
+            for experiment_id, sample_ratio, assigned_team_id in experiments
+        ],
+    }
 
 
-@app.get("/")
+@router.get("/snapshot/export")
+async def export_snapshot(db: AnySession = Depends(get_db)):
+    snapshot = get_current_snapshot() or await aio.get_snapshot(db)
+    return Response(
+        snapshot.to_bytes(),
+        media_type="application/octet-stream",
+        headers={"X-Snapshot-Version": str(snapshot.version)},
+    )
+
+
+@router.get("/export/experiments")
+async def export_experiments(
+    format: ExportFormat = "ndjson", session_factory=Depends(get_session_factory)
+):
+    return export_response(
+        session_factory, ExperimentRecords(), format, DATABASE_ASYNC, "experiments"
+    )
+
+
+@router.get("/export/teams")
+async def export_teams(
+    format: ExportFormat = "ndjson", session_factory=Depends(get_session_factory)
+):
+    return export_response(
+        session_factory, TeamRecords(), format, DATABASE_ASYNC, "teams"
+    )
+
+
+@router.get("/metrics")
+async def read_metrics(db: AnySession = Depends(get_db)):
+    update_entity_gauges(
+        await aio.count_teams(db), await aio.count_experiments(db)
+    )
+    return Response(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
+@router.get("/changes", response_model=ChangesPage)
+async def read_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_CHANGES_LIMIT),
+    wait: float = Query(0, ge=0, le=CHANGES_MAX_WAIT_SECONDS),
+    session_factory=Depends(get_session_factory),
+):
+    changes = await wait_for_changes(
+        session_factory, DATABASE_ASYNC, since, limit, wait
+    )
+    return ChangesPage(
+        changes=changes, next_since=changes[-1].seq if changes else since
+    )
+
+
+@router.get("/changes/stream")
+async def stream_change_events(
+    request: Request,
+    since: int = Query(0, ge=0),
+    last_event_id: int | None = Header(None, ge=0),
+    session_factory=Depends(get_session_factory),
+):
+    return StreamingResponse(
+        stream_changes(
+            session_factory,
+            DATABASE_ASYNC,
+            since if last_event_id is None else last_event_id,
+            request.is_disconnected,
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/health/db-pool")
+async def read_pool_metrics():
+    return get_pool_metrics()
+
+
+@router.get("/")
 async def read_main():
     return {"message": "Team assignments app"}
+
+
+def create_app() -> FastAPI:
+    app = FastAPI(default_response_class=DefaultResponse, lifespan=lifespan)
+    app.add_middleware(RequestMetricsMiddleware)
+    app.add_middleware(QueryStatsMiddleware)
+    app.include_router(router)
+    return app
+
+
+app = create_app()
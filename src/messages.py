@@ -3,16 +3,40 @@ ASSIGNMENTS_UPDATED_MSG = "Assignment(s) updated successfully"
 CANNOT_ASSIGN_CHILD_WITH_PARENT_TO_EXPERIMENT_ERROR = (
     "Cannot assign a child of the team to the same experiment"
 )
+CANNOT_MOVE_TEAM_UNDER_ITS_DESCENDANT_ERROR = (
+    "Cannot move a team under itself or one of its descendants"
+)
 EXPERIMENT_CREATED_SUCCESSFULLY_MSG = "Experiment created successfully"
+EXPERIMENT_DUPLICATED_IN_BATCH_ERROR = "Experiment is duplicated in the batch"
 EXPERIMENT_NOT_FOUND_ERROR = "Experiment not found"
+EXPERIMENTS_CREATED_SUCCESSFULLY_MSG = "Experiments created successfully"
+IDEMPOTENCY_KEY_IN_PROGRESS_ERROR = (
+    "A request with this Idempotency-Key is still being processed"
+)
+IDEMPOTENCY_KEY_REUSED_ERROR = (
+    "This Idempotency-Key was already used for a different request"
+)
 INVALID_ASSIGNMENTS_AMOUNT = (
     "That experiment requires {allowed_assignments} team(s) to assign"
 )
+INVALID_CURSOR_ERROR = "Invalid pagination cursor"
+INVALID_IMPORT_ROW_ERROR = "Invalid row: {error}"
 PARENT_TEAM_NOT_FOUND_ERROR = "Parent team not found"
+PARENT_TEAM_NOT_IMPORTED_ERROR = "Parent team could not be imported"
+TEAM_ALREADY_EXISTS_MSG = "Team already exists"
 TEAM_BY_NAME_NOT_FOUND_ERROR = "Team with this name not found"
 TEAM_CREATED_SUCCESFULLY_MSG = "Team created successfully"
+TEAM_EXISTS_WITH_DIFFERENT_PARENT_ERROR = (
+    "Team with the same name already exists under a different parent"
+)
+TEAM_NAME_DUPLICATED_IN_IMPORT_ERROR = "Team name is duplicated in the import"
+TEAM_NOT_FOUND_ERROR = "Team not found"
+TEAM_PARENT_CYCLE_IN_IMPORT_ERROR = "Team parents form a cycle in the import"
+TEAM_PARENT_UPDATED_MSG = "Team parent updated successfully"
+TEAMS_IMPORTED_MSG = "Teams imported"
 TEAMS_NOT_FOUND = "Team(s) not found: {ids}"
 TEAM_WITH_NAME_EXISTS = "Team with the same name already exists"
+UNSUPPORTED_IMPORT_FORMAT_ERROR = "Unsupported import format, send CSV or JSON lines"
 VALUE_OF_ALLOWED_TEAM_ASSIGNMNETS_RANGE_ERROR = (
     "Value of allowed team assignments has to be between {min} and {max}."
 )
@@ -0,0 +1,130 @@
+import functools
+import os
+import time
+
+from fastapi import HTTPException
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from .instrumentation import get_request_stats
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+UNMATCHED_ROUTE = "unmatched"
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling a request, including streaming the response body",
+    ["method", "route", "status"],
+)
+REQUEST_DB_DURATION = Histogram(
+    "http_request_db_duration_seconds",
+    "Time spent executing SQL statements for a request",
+    ["method", "route"],
+)
+REQUEST_DB_STATEMENTS = Counter(
+    "http_request_db_statements",
+    "SQL statements executed while handling requests",
+    ["method", "route"],
+)
+VALIDATION_FAILURES = Counter(
+    "assignment_validation_failures",
+    "Assignment validations rejected by each check",
+    ["check"],
+)
+TEAMS = Gauge("teams", "Number of teams", multiprocess_mode="mostrecent")
+EXPERIMENTS = Gauge(
+    "experiments", "Number of experiments", multiprocess_mode="mostrecent"
+)
+POOL_CHECKOUT_DURATION = Histogram(
+    "db_pool_checkout_duration_seconds",
+    "Time spent waiting for a pooled database connection",
+    ["pool"],
+)
+POOL_WAITS = Counter(
+    "db_pool_waits",
+    "Checkouts that had to wait for a connection to be returned",
+    ["pool"],
+)
+POOL_IN_USE = Gauge(
+    "db_pool_connections_in_use",
+    "Connections currently checked out of the pool",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+
+
+def is_multiprocess() -> bool:
+    return "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+
+def count_failures(check):
+    failures = VALIDATION_FAILURES.labels(check=check.__name__)
+
+    @functools.wraps(check)
+    def wrapper(*args, **kwargs):
+        try:
+            return check(*args, **kwargs)
+        except HTTPException:
+            failures.inc()
+            raise
+
+    return wrapper
+
+
+def update_entity_gauges(teams: int, experiments: int):
+    TEAMS.set(teams)
+    EXPERIMENTS.set(experiments)
+
+
+def render_metrics() -> bytes:
+    if not is_multiprocess():
+        return generate_latest(REGISTRY)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+
+def mark_process_dead():
+    if is_multiprocess():
+        multiprocess.mark_process_dead(os.getpid())
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            method = scope["method"]
+            path = route.path if route is not None else UNMATCHED_ROUTE
+            REQUEST_DURATION.labels(method, path, status).observe(
+                time.perf_counter() - started
+            )
+            stats = get_request_stats()
+            if stats is not None:
+                REQUEST_DB_DURATION.labels(method, path).observe(stats.db_seconds)
+                REQUEST_DB_STATEMENTS.labels(method, path).inc(stats.statements)
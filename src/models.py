@@ -1,27 +1,71 @@
-from sqlalchemy import UUID, Column, Float, ForeignKey, Integer, String, Table
+import uuid
+
+from sqlalchemy import (
+    JSON,
+    UUID,
+    BigInteger,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Table,
+    TypeDecorator,
+    func,
+)
 from sqlalchemy.orm import relationship
 
+from .config import IDEMPOTENCY_KEY_MAX_LENGTH
 from .database import Base
 
+
+class UUIDType(TypeDecorator):
+    impl = UUID
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, uuid.UUID):
+            return value
+        return uuid.UUID(str(value))
+
+
 team_experiment_assignment = Table(
     'team_experiment_assignment',
     Base.metadata,
-    Column('team_id', UUID(as_uuid=True), ForeignKey('teams.id'), primary_key=True),
+    Column('team_id', UUIDType(), ForeignKey('teams.id'), primary_key=True),
     Column(
         'experiment_id',
-        UUID(as_uuid=True),
+        UUIDType(),
         ForeignKey('experiments.id'),
         primary_key=True,
     ),
+    Index('ix_team_experiment_assignment_experiment_id', 'experiment_id'),
+)
+
+team_closure = Table(
+    'team_closure',
+    Base.metadata,
+    Column(
+        'ancestor_id', UUIDType(), ForeignKey('teams.id'), primary_key=True
+    ),
+    Column(
+        'descendant_id', UUIDType(), ForeignKey('teams.id'), primary_key=True
+    ),
+    Column('depth', Integer, nullable=False),
+    Index('ix_team_closure_descendant_id', 'descendant_id'),
 )
 
 
 class Team(Base):
     __tablename__ = "teams"
+    __table_args__ = (Index("ix_teams_name_id", "name", "id"),)
 
-    id = Column(UUID(as_uuid=True), primary_key=True)
+    id = Column(UUIDType(), primary_key=True)
     name = Column(String, unique=True)
-    parent_team = Column(UUID, ForeignKey("teams.id"))
+    parent_team = Column(UUIDType(), ForeignKey("teams.id"), index=True)
 
     experiments = relationship(
         "Experiment", secondary=team_experiment_assignment, back_populates="teams"
@@ -30,8 +74,11 @@ class Team(Base):
 
 class Experiment(Base):
     __tablename__ = "experiments"
+    __table_args__ = (
+        Index("ix_experiments_description_id", "description", "id"),
+    )
 
-    id = Column(UUID(as_uuid=True), primary_key=True)
+    id = Column(UUIDType(), primary_key=True)
     description = Column(String)
     sample_ratio = Column(Float)
     allowed_team_assignments = Column(Integer)
@@ -39,3 +86,46 @@ class Experiment(Base):
     teams = relationship(
         "Team", secondary=team_experiment_assignment, back_populates="experiments"
     )
+
+
+Index(
+    "ix_experiments_description_prefix",
+    func.lower(Experiment.description).label("description_lower"),
+    postgresql_ops={"description_lower": "text_pattern_ops"},
+)
+
+# Only created by the migrations, where pg_trgm is available.
+TRIGRAM_INDEX = "ix_experiments_description_trgm"
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    return not (type_ == "index" and reflected and name == TRIGRAM_INDEX)
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (Index("ix_idempotency_keys_expires_at", "expires_at"),)
+
+    key = Column(String(IDEMPOTENCY_KEY_MAX_LENGTH), primary_key=True)
+    endpoint = Column(String, primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    status_code = Column(Integer)
+    response_body = Column(LargeBinary)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class ChangeLog(Base):
+    __tablename__ = "change_log"
+
+    seq = Column(
+        BigInteger().with_variant(Integer, "sqlite"),
+        primary_key=True,
+        autoincrement=True,
+    )
+    occurred_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+    entity = Column(String, nullable=False)
+    entity_id = Column(UUIDType(), nullable=False)
+    operation = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
@@ -0,0 +1,61 @@
+import base64
+import binascii
+import json
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import asc, tuple_
+
+from .messages import INVALID_CURSOR_ERROR
+
+
+def encode_cursor(sort_value: str | None, row_id: UUID) -> str:
+    payload = json.dumps([sort_value, str(row_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str | None, UUID]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        if sort_value is not None and not isinstance(sort_value, str):
+            raise ValueError(sort_value)
+        return sort_value, UUID(row_id)
+    except (binascii.Error, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=INVALID_CURSOR_ERROR)
+
+
+def keyset_order(sort_column, id_column):
+    return asc(sort_column).nulls_last(), asc(id_column)
+
+
+def keyset_page(query, sort_column, id_column, limit: int, cursor: str | None):
+    # Rows without a sort value come last. They are read in a second phase so
+    # that each phase is a plain range scan over the (sort, id) index.
+    sort_value, row_id = decode_cursor(cursor) if cursor else (None, None)
+    rows = []
+    if row_id is None or sort_value is not None:
+        sorted_rows = query.filter(sort_column.is_not(None))
+        if row_id is not None:
+            sorted_rows = sorted_rows.filter(
+                tuple_(sort_column, id_column) > tuple_(sort_value, row_id)
+            )
+        rows = (
+            sorted_rows.order_by(asc(sort_column), asc(id_column))
+            .limit(limit + 1)
+            .all()
+        )
+    if len(rows) <= limit:
+        unsorted_rows = query.filter(sort_column.is_(None))
+        if row_id is not None and sort_value is None:
+            unsorted_rows = unsorted_rows.filter(id_column > row_id)
+        rows += (
+            unsorted_rows.order_by(asc(id_column)).limit(limit + 1 - len(rows)).all()
+        )
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), last.id)
+    return rows, next_cursor
@@ -0,0 +1,104 @@
+import threading
+import time
+
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool, StaticPool
+
+from .metrics import POOL_CHECKOUT_DURATION, POOL_IN_USE, POOL_WAITS
+
+
+class PoolMetrics:
+    def __init__(self, pool_name: str):
+        self._lock = threading.Lock()
+        self._checkout_duration = POOL_CHECKOUT_DURATION.labels(pool_name)
+        self._waits = POOL_WAITS.labels(pool_name)
+        self._in_use = POOL_IN_USE.labels(pool_name)
+        self.checkouts = 0
+        self.waits = 0
+        self.in_use = 0
+        self.checkout_seconds_total = 0.0
+        self.checkout_seconds_max = 0.0
+
+    def record_checkout(self, seconds: float, waited: bool):
+        with self._lock:
+            self.checkouts += 1
+            self.waits += waited
+            self.in_use += 1
+            self.checkout_seconds_total += seconds
+            self.checkout_seconds_max = max(self.checkout_seconds_max, seconds)
+        self._checkout_duration.observe(seconds)
+        self._in_use.inc()
+        if waited:
+            self._waits.inc()
+
+    def record_checkin(self):
+        with self._lock:
+            self.in_use -= 1
+        self._in_use.dec()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "in_use": self.in_use,
+                "checkout_seconds_total": self.checkout_seconds_total,
+                "checkout_seconds_max": self.checkout_seconds_max,
+            }
+
+
+class InstrumentedPoolMixin:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics(type(self).__name__)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def will_wait(self) -> bool:
+        return False
+
+    def _do_get(self):
+        waited = self.will_wait()
+        started = time.perf_counter()
+        connection = super()._do_get()
+        self.metrics.record_checkout(time.perf_counter() - started, waited)
+        return connection
+
+    def _do_return_conn(self, record):
+        self.metrics.record_checkin()
+        super()._do_return_conn(record)
+
+    def get_metrics(self) -> dict:
+        metrics = {"pool_class": type(self).__name__, **self.metrics.snapshot()}
+        if isinstance(self, QueuePool):
+            metrics.update(
+                size=self.size(),
+                checked_in=self.checkedin(),
+                overflow=self.overflow(),
+            )
+        return metrics
+
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, QueuePool):
+    def will_wait(self) -> bool:
+        return (
+            self.checkedin() == 0
+            and self._max_overflow > -1
+            and self.overflow() >= self._max_overflow
+        )
+
+
+class InstrumentedAsyncAdaptedQueuePool(
+    InstrumentedPoolMixin, AsyncAdaptedQueuePool
+):
+    will_wait = InstrumentedQueuePool.will_wait
+
+
+class InstrumentedNullPool(InstrumentedPoolMixin, NullPool):
+    pass
+
+
+class InstrumentedStaticPool(InstrumentedPoolMixin, StaticPool):
+    pass
@@ -0,0 +1,93 @@
+from datetime import datetime
+from typing import Annotated
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+from .config import MAX_BUCKET_UNIT_IDS, MAX_LOOKUP_TEAMS, MAX_UNIT_ID_LENGTH
+
+
+class TeamSummary(BaseModel):
+    id: UUID
+    name: str | None
+
+
+class ExperimentSummary(BaseModel):
+    id: UUID
+    description: str | None
+
+
+class TeamRead(BaseModel):
+    id: UUID
+    name: str | None
+    parent_team: UUID | None
+    experiments: list[ExperimentSummary]
+
+
+class ExperimentRead(BaseModel):
+    id: UUID
+    description: str | None
+    sample_ratio: float | None
+    allowed_team_assignments: int | None
+    teams: list[TeamSummary]
+
+
+class ExperimentCreate(BaseModel):
+    description: str
+    sample_ratio: float
+    allowed_team_assignments: int
+    team_ids: list[UUID]
+
+
+class AssignmentUpdate(BaseModel):
+    experiment_id: UUID
+    team_ids: list[UUID]
+
+
+class ExperimentsByTeamsRequest(BaseModel):
+    team_names: list[str] = Field([], max_length=MAX_LOOKUP_TEAMS)
+    team_ids: list[UUID] = Field([], max_length=MAX_LOOKUP_TEAMS)
+    include_descendants: bool = False
+
+
+class TeamExperimentRead(BaseModel):
+    id: UUID
+    description: str | None
+    sample_ratio: float | None
+    allowed_team_assignments: int | None
+
+
+class ExperimentSearchResult(BaseModel):
+    id: UUID
+    description: str | None
+    sample_ratio: float | None
+    allowed_team_assignments: int | None
+    score: float
+
+
+class ExperimentsByTeams(BaseModel):
+    teams: dict[str, list[TeamExperimentRead]]
+    unresolved_names: list[str]
+    unresolved_ids: list[UUID]
+
+
+class BucketRequest(BaseModel):
+    # The ids are hashed as one zero-padded matrix, so its size grows with the
+    # longest id as well as with their number.
+    unit_ids: list[Annotated[str, Field(max_length=MAX_UNIT_ID_LENGTH)]] = Field(
+        max_length=MAX_BUCKET_UNIT_IDS
+    )
+
+
+class ChangeRead(BaseModel):
+    seq: int
+    occurred_at: datetime
+    entity: str
+    entity_id: UUID
+    operation: str
+    payload: dict
+
+
+class ChangesPage(BaseModel):
+    changes: list[ChangeRead]
+    next_since: int
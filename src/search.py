@@ -0,0 +1,320 @@
+import bisect
+import heapq
+import os
+import re
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+
+from sqlalchemy import Float, func, literal, or_, select, text
+from sqlalchemy.orm import Session
+
+from .config import WORD_SIMILARITY_THRESHOLD
+from .database import dialect_name
+from .models import Experiment
+from .schemas import ExperimentSearchResult
+
+PG_TRGM_INFO_KEY = "has_pg_trgm"
+
+# pg_trgm splits text into words on anything that is not alphanumeric.
+_WORDS = re.compile(r"[^\W_]+")
+# SQLite has no default LIKE escape character, so queries name it explicitly.
+_LIKE_ESCAPE = "\\"
+_LIKE_SPECIAL = re.compile(r"([\\%_])")
+
+_SEARCH_COLUMNS = (
+    Experiment.id,
+    Experiment.description,
+    Experiment.sample_ratio,
+    Experiment.allowed_team_assignments,
+)
+
+
+def trigrams(value: str) -> set[str]:
+    result = set()
+    for word in _WORDS.findall(value.lower()):
+        padded = f"  {word} "
+        result.update(padded[index : index + 3] for index in range(len(padded) - 2))
+    return result
+
+
+class DescriptionIndex:
+    # Postings hold positions in _rows rather than experiment ids, and the
+    # lowercase descriptions are kept in a plain list, because scoring touches
+    # every candidate and ints and lists are much cheaper than UUIDs and rows.
+    def __init__(self):
+        self._rows = []
+        self._lowered = []
+        self._slots = {}
+        self._keys = []
+        self._postings = defaultdict(set)
+
+    def add(self, rows):
+        for row in rows:
+            slot = self._slots.get(row.id)
+            if slot is None:
+                slot = self._slots[row.id] = len(self._rows)
+                self._rows.append(row)
+                self._lowered.append(None)
+            else:
+                self._remove(slot)
+                self._rows[slot] = row
+            if row.description is None:
+                continue
+            self._lowered[slot] = row.description.lower()
+            bisect.insort(self._keys, (self._lowered[slot], slot))
+            for trigram in trigrams(row.description):
+                self._postings[trigram].add(slot)
+
+    def _remove(self, slot: int):
+        description = self._rows[slot].description
+        if description is None:
+            return
+        key = (self._lowered[slot], slot)
+        self._lowered[slot] = None
+        index = bisect.bisect_left(self._keys, key)
+        if index < len(self._keys) and self._keys[index] == key:
+            del self._keys[index]
+        for trigram in trigrams(description):
+            self._postings[trigram].discard(slot)
+
+    def search_prefix(self, q: str, limit: int) -> list[ExperimentSearchResult]:
+        prefix = q.lower()
+        start = bisect.bisect_left(self._keys, (prefix,))
+        results = []
+        for description, slot in self._keys[start : start + limit]:
+            if not description.startswith(prefix):
+                break
+            results.append(_to_result(self._rows[slot], 1.0))
+        return results
+
+    def search(self, q: str, limit: int) -> list[ExperimentSearchResult]:
+        # The score is the share of the query's trigrams found anywhere in the
+        # description. It is not pg_trgm's word_similarity, which compares the
+        # query with the best matching run of words, so scores differ.
+        query_trigrams = trigrams(q)
+        hits = Counter()
+        for trigram in query_trigrams:
+            hits.update(self._postings.get(trigram, ()))
+
+        needle = q.lower()
+        lowered = self._lowered
+        if not any(len(word) >= 3 for word in _WORDS.findall(needle)):
+            # Words shorter than three characters only have space-padded
+            # trigrams, which a match inside a longer word does not share.
+            for slot, description in enumerate(lowered):
+                if description is not None and needle in description:
+                    hits[slot] += 0
+
+        candidates = []
+        for slot, count in hits.items():
+            description = lowered[slot]
+            score = count / len(query_trigrams) if query_trigrams else 0.0
+            if score < WORD_SIMILARITY_THRESHOLD and needle not in description:
+                continue
+            candidates.append(
+                (not description.startswith(needle), -score, description, slot)
+            )
+        return [
+            _to_result(self._rows[slot], -score)
+            for _, score, _, slot in heapq.nsmallest(limit, candidates)
+        ]
+
+
+class SearchIndexStore:
+    def __init__(self, max_age_seconds: float):
+        self.max_age_seconds = max_age_seconds
+        self.index = None
+        self.built_at = 0.0
+        self._dirty_ids = set()
+        self._lock = threading.Lock()
+        self._index_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def mark_dirty(self, experiment_ids):
+        with self._lock:
+            self._dirty_ids.update(uuid.UUID(str(value)) for value in experiment_ids)
+
+    def clear(self):
+        with self._index_lock, self._lock:
+            self.index = None
+            self._dirty_ids.clear()
+
+    def search(
+        self, db: Session, q: str, limit: int, prefix: bool
+    ) -> list[ExperimentSearchResult]:
+        index = self.get(db)
+        if index is None:
+            # Another request is building the first index; answer from the
+            # database rather than have every waiting request build its own.
+            if prefix:
+                return _search_prefix_in_database(db, q, limit)
+            return _search_substring_in_database(db, q, limit)
+        # Held only around in-memory work: in async mode this runs on the event
+        # loop thread, where blocking across a query would stall every request.
+        with self._index_lock:
+            if prefix:
+                return index.search_prefix(q, limit)
+            return index.search(q, limit)
+
+    def get(self, db: Session) -> DescriptionIndex | None:
+        index = self.index
+        is_expired = time.monotonic() - self.built_at > self.max_age_seconds
+        if index is not None and not is_expired and not self._dirty_ids:
+            return index
+        if not self._refresh_lock.acquire(blocking=False):
+            return index
+
+        try:
+            with self._lock:
+                experiment_ids, self._dirty_ids = self._dirty_ids, set()
+            try:
+                if index is None or is_expired:
+                    built_at = time.monotonic()
+                    index = build_index(db)
+                    self.index = index
+                    self.built_at = built_at
+                elif experiment_ids:
+                    rows = db.execute(
+                        select(*_SEARCH_COLUMNS).where(
+                            Experiment.id.in_(experiment_ids)
+                        )
+                    ).all()
+                    with self._index_lock:
+                        index.add(rows)
+            except Exception:
+                self.mark_dirty(experiment_ids)
+                raise
+            return index
+        finally:
+            self._refresh_lock.release()
+
+
+def build_index(db: Session) -> DescriptionIndex:
+    index = DescriptionIndex()
+    index.add(db.execute(select(*_SEARCH_COLUMNS)).all())
+    return index
+
+
+search_index_store = SearchIndexStore(
+    float(os.getenv("SEARCH_INDEX_MAX_AGE_SECONDS", "60"))
+)
+
+
+def mark_experiments_dirty(experiment_ids):
+    search_index_store.mark_dirty(experiment_ids)
+
+
+def has_pg_trgm(db: Session) -> bool:
+    info = db.connection().info
+    if PG_TRGM_INFO_KEY not in info:
+        info[PG_TRGM_INFO_KEY] = bool(
+            db.scalar(
+                text(
+                    "SELECT EXISTS "
+                    "(SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')"
+                )
+            )
+        )
+    return info[PG_TRGM_INFO_KEY]
+
+
+def search_experiments(
+    db: Session, q: str, limit: int, prefix: bool = False
+) -> list[ExperimentSearchResult]:
+    q = q.strip()
+    if not q:
+        return []
+    if dialect_name(db) == "postgresql":
+        if prefix:
+            return _search_prefix_in_database(db, q, limit)
+        if has_pg_trgm(db):
+            return _search_trigrams_in_database(db, q, limit)
+    return search_index_store.search(db, q, limit, prefix)
+
+
+def _search_prefix_in_database(
+    db: Session, q: str, limit: int
+) -> list[ExperimentSearchResult]:
+    description_lower = func.lower(Experiment.description)
+    rows = db.execute(
+        select(*_SEARCH_COLUMNS)
+        .where(
+            description_lower.like(_escape_like(q.lower()) + "%", escape=_LIKE_ESCAPE)
+        )
+        .order_by(description_lower, Experiment.id)
+        .limit(limit)
+    )
+    return [_to_result(row, 1.0) for row in rows]
+
+
+def _search_substring_in_database(
+    db: Session, q: str, limit: int
+) -> list[ExperimentSearchResult]:
+    # Only exact substring matches; typo tolerance needs the index.
+    query_trigrams = trigrams(q)
+    needle = q.lower()
+    pattern = _escape_like(needle)
+    description_lower = func.lower(Experiment.description)
+    rows = db.execute(
+        select(*_SEARCH_COLUMNS)
+        .where(description_lower.like(f"%{pattern}%", escape=_LIKE_ESCAPE))
+        .order_by(
+            description_lower.like(pattern + "%", escape=_LIKE_ESCAPE).desc(),
+            description_lower,
+            Experiment.id,
+        )
+        .limit(limit)
+    )
+    scored = [(_trigram_share(query_trigrams, row.description), row) for row in rows]
+    scored.sort(
+        key=lambda item: (
+            not item[1].description.lower().startswith(needle),
+            -item[0],
+            item[1].description.lower(),
+        )
+    )
+    return [_to_result(row, score) for score, row in scored]
+
+
+def _search_trigrams_in_database(
+    db: Session, q: str, limit: int
+) -> list[ExperimentSearchResult]:
+    pattern = _escape_like(q)
+    score = func.word_similarity(q, Experiment.description, type_=Float)
+    is_prefix = Experiment.description.ilike(pattern + "%")
+    rows = db.execute(
+        select(*_SEARCH_COLUMNS, score.label("score"))
+        .where(
+            or_(
+                Experiment.description.ilike(f"%{pattern}%"),
+                literal(q).op("<%", is_comparison=True)(Experiment.description),
+            )
+        )
+        .order_by(
+            is_prefix.desc(), score.desc(), Experiment.description, Experiment.id
+        )
+        .limit(limit)
+    )
+    return [_to_result(row, row.score) for row in rows]
+
+
+def _trigram_share(query_trigrams: set[str], description: str) -> float:
+    if not query_trigrams:
+        return 0.0
+    return len(query_trigrams & trigrams(description)) / len(query_trigrams)
+
+
+def _escape_like(value: str) -> str:
+    return _LIKE_SPECIAL.sub(r"\\\1", value)
+
+
+def _to_result(row, score: float) -> ExperimentSearchResult:
+    return ExperimentSearchResult(
+        id=row.id,
+        description=row.description,
+        sample_ratio=row.sample_ratio,
+        allowed_team_assignments=row.allowed_team_assignments,
+        score=score,
+    )
@@ -0,0 +1,426 @@
+import itertools
+import os
+import struct
+import sys
+import threading
+import time
+import uuid
+from array import array
+from collections import defaultdict
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from .models import Experiment, Team, team_experiment_assignment
+
+SNAPSHOT_MAGIC = b"TEAMSNAP"
+SNAPSHOT_FORMAT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct("<8sIIQIIII")
+NO_PARENT = -1
+
+_versions = itertools.count(1)
+
+
+class AssignmentSnapshot:
+    __slots__ = (
+        "version",
+        "team_ids",
+        "team_index",
+        "parents",
+        "team_experiments",
+        "experiment_ids",
+        "experiment_index",
+        "sample_ratios",
+        "experiment_teams",
+        "_blob",
+    )
+
+    def __init__(
+        self,
+        team_ids: tuple[uuid.UUID, ...],
+        parents: array,
+        team_experiments: tuple[tuple[int, ...], ...],
+        experiment_ids: tuple[uuid.UUID, ...],
+        sample_ratios: array,
+        experiment_teams: tuple[tuple[int, ...], ...] | None = None,
+        version: int | None = None,
+    ):
+        self.version = next(_versions) if version is None else version
+        self.team_ids = team_ids
+        self.team_index = {team_id: index for index, team_id in enumerate(team_ids)}
+        self.parents = parents
+        self.team_experiments = team_experiments
+        self.experiment_ids = experiment_ids
+        self.experiment_index = {
+            experiment_id: index for index, experiment_id in enumerate(experiment_ids)
+        }
+        self.sample_ratios = sample_ratios
+        if experiment_teams is None:
+            experiment_teams = _invert(team_experiments, len(experiment_ids))
+        self.experiment_teams = experiment_teams
+        self._blob = None
+
+    def get_team_experiments(
+        self, team_id: uuid.UUID
+    ) -> list[tuple[uuid.UUID, float, uuid.UUID]] | None:
+        index = self.team_index.get(team_id)
+        if index is None:
+            return None
+
+        experiments = []
+        while index != NO_PARENT:
+            for experiment in self.team_experiments[index]:
+                experiments.append(
+                    (
+                        self.experiment_ids[experiment],
+                        self.sample_ratios[experiment],
+                        self.team_ids[index],
+                    )
+                )
+            index = self.parents[index]
+        return experiments
+
+    def to_bytes(self) -> bytes:
+        if self._blob is None:
+            self._blob = self._serialize()
+        return self._blob
+
+    def _serialize(self) -> bytes:
+        offsets = array("I", [0])
+        assigned = array("I")
+        for experiments in self.team_experiments:
+            assigned.extend(experiments)
+            offsets.append(len(assigned))
+
+        sections = [
+            SNAPSHOT_HEADER.pack(
+                SNAPSHOT_MAGIC,
+                SNAPSHOT_FORMAT_VERSION,
+                0,
+                self.version,
+                len(self.team_ids),
+                len(self.experiment_ids),
+                len(assigned),
+                0,
+            ),
+            b"".join(team_id.bytes for team_id in self.team_ids),
+            _little_endian(self.parents),
+            b"".join(experiment_id.bytes for experiment_id in self.experiment_ids),
+            _little_endian(self.sample_ratios),
+            _little_endian(offsets),
+            _little_endian(assigned),
+        ]
+        return b"".join(_pad(section) for section in sections)
+
+
+def load_snapshot(buffer) -> AssignmentSnapshot:
+    view = memoryview(buffer)
+    if len(view) < SNAPSHOT_HEADER.size:
+        raise ValueError("Snapshot is truncated")
+    (
+        magic,
+        format_version,
+        _,
+        version,
+        team_count,
+        experiment_count,
+        assignment_count,
+        _,
+    ) = SNAPSHOT_HEADER.unpack_from(view)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError("Not an assignment snapshot")
+    if format_version != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format version {format_version}")
+
+    position = SNAPSHOT_HEADER.size
+
+    def read(size: int) -> memoryview:
+        nonlocal position
+        if position + size > len(view):
+            raise ValueError("Snapshot is truncated")
+        section = view[position : position + size]
+        position += _padded_size(size)
+        return section
+
+    def read_array(typecode: str, count: int) -> array:
+        values = array(typecode)
+        values.frombytes(read(values.itemsize * count))
+        if sys.byteorder == "big":
+            values.byteswap()
+        return values
+
+    team_bytes = read(16 * team_count)
+    team_ids = tuple(
+        uuid.UUID(bytes=bytes(team_bytes[offset : offset + 16]))
+        for offset in range(0, len(team_bytes), 16)
+    )
+    parents = read_array("i", team_count)
+    experiment_bytes = read(16 * experiment_count)
+    experiment_ids = tuple(
+        uuid.UUID(bytes=bytes(experiment_bytes[offset : offset + 16]))
+        for offset in range(0, len(experiment_bytes), 16)
+    )
+    sample_ratios = read_array("d", experiment_count)
+    offsets = read_array("I", team_count + 1)
+    assigned = read_array("I", assignment_count)
+    team_experiments = tuple(
+        tuple(assigned[offsets[index] : offsets[index + 1]])
+        for index in range(team_count)
+    )
+
+    return AssignmentSnapshot(
+        team_ids,
+        parents,
+        team_experiments,
+        experiment_ids,
+        sample_ratios,
+        version=version,
+    )
+
+
+def build_snapshot(db: Session) -> AssignmentSnapshot:
+    team_rows = db.execute(select(Team.id, Team.parent_team)).all()
+    experiment_rows = db.execute(
+        select(Experiment.id, Experiment.sample_ratio)
+    ).all()
+    assignment_rows = db.execute(
+        select(
+            team_experiment_assignment.c.team_id,
+            team_experiment_assignment.c.experiment_id,
+        )
+    ).all()
+
+    team_ids = tuple(team_id for team_id, _ in team_rows)
+    team_index = {team_id: index for index, team_id in enumerate(team_ids)}
+    parents = array(
+        "i",
+        (team_index[parent] if parent else NO_PARENT for _, parent in team_rows),
+    )
+    experiment_ids = tuple(experiment_id for experiment_id, _ in experiment_rows)
+    experiment_index = {
+        experiment_id: index for index, experiment_id in enumerate(experiment_ids)
+    }
+    sample_ratios = array("d", (ratio or 0.0 for _, ratio in experiment_rows))
+
+    assignments = defaultdict(list)
+    for team_id, experiment_id in assignment_rows:
+        if team_id in team_index and experiment_id in experiment_index:
+            assignments[team_index[team_id]].append(experiment_index[experiment_id])
+    team_experiments = tuple(
+        tuple(sorted(assignments.get(index, ()))) for index in range(len(team_ids))
+    )
+
+    return AssignmentSnapshot(
+        team_ids, parents, team_experiments, experiment_ids, sample_ratios
+    )
+
+
+def refresh_snapshot(
+    db: Session,
+    snapshot: AssignmentSnapshot,
+    team_ids: set[uuid.UUID],
+    experiment_ids: set[uuid.UUID],
+) -> AssignmentSnapshot | None:
+    team_rows = (
+        db.execute(select(Team.id, Team.parent_team).where(Team.id.in_(team_ids))).all()
+        if team_ids
+        else []
+    )
+    experiment_rows = (
+        db.execute(
+            select(Experiment.id, Experiment.sample_ratio).where(
+                Experiment.id.in_(experiment_ids)
+            )
+        ).all()
+        if experiment_ids
+        else []
+    )
+    assignment_rows = db.execute(
+        select(
+            team_experiment_assignment.c.team_id,
+            team_experiment_assignment.c.experiment_id,
+        ).where(
+            or_(
+                team_experiment_assignment.c.team_id.in_(team_ids),
+                team_experiment_assignment.c.experiment_id.in_(experiment_ids),
+            )
+        )
+    ).all()
+
+    all_team_ids = list(snapshot.team_ids)
+    team_index = dict(snapshot.team_index)
+    parents = array("i", snapshot.parents)
+    team_experiments = list(snapshot.team_experiments)
+    for team_id, _ in team_rows:
+        if team_id not in team_index:
+            team_index[team_id] = len(all_team_ids)
+            all_team_ids.append(team_id)
+            parents.append(NO_PARENT)
+            team_experiments.append(())
+    for team_id, parent in team_rows:
+        if parent and parent not in team_index:
+            return None
+        parents[team_index[team_id]] = team_index[parent] if parent else NO_PARENT
+
+    all_experiment_ids = list(snapshot.experiment_ids)
+    experiment_index = dict(snapshot.experiment_index)
+    sample_ratios = array("d", snapshot.sample_ratios)
+    experiment_teams = list(snapshot.experiment_teams)
+    for experiment_id, sample_ratio in experiment_rows:
+        if experiment_id not in experiment_index:
+            experiment_index[experiment_id] = len(all_experiment_ids)
+            all_experiment_ids.append(experiment_id)
+            sample_ratios.append(0.0)
+            experiment_teams.append(())
+        sample_ratios[experiment_index[experiment_id]] = sample_ratio or 0.0
+
+    dirty_teams = {team_index[team_id] for team_id in team_ids if team_id in team_index}
+    dirty_experiments = {
+        experiment_index[experiment_id]
+        for experiment_id in experiment_ids
+        if experiment_id in experiment_index
+    }
+    changed = {}
+    for team in dirty_teams.union(
+        *(experiment_teams[experiment] for experiment in dirty_experiments)
+    ):
+        changed[team] = {
+            experiment
+            for experiment in team_experiments[team]
+            if team not in dirty_teams and experiment not in dirty_experiments
+        }
+    for team_id, experiment_id in assignment_rows:
+        if team_id not in team_index or experiment_id not in experiment_index:
+            return None
+        team = team_index[team_id]
+        changed.setdefault(team, set(team_experiments[team])).add(
+            experiment_index[experiment_id]
+        )
+
+    reassigned = defaultdict(dict)
+    for team, experiments in changed.items():
+        previous = set(team_experiments[team])
+        for experiment in previous - experiments:
+            reassigned[experiment][team] = False
+        for experiment in experiments - previous:
+            reassigned[experiment][team] = True
+        team_experiments[team] = tuple(sorted(experiments))
+    for experiment, teams in reassigned.items():
+        assigned = set(experiment_teams[experiment])
+        assigned.difference_update(team for team, added in teams.items() if not added)
+        assigned.update(team for team, added in teams.items() if added)
+        experiment_teams[experiment] = tuple(sorted(assigned))
+
+    return AssignmentSnapshot(
+        tuple(all_team_ids),
+        parents,
+        tuple(team_experiments),
+        tuple(all_experiment_ids),
+        sample_ratios,
+        tuple(experiment_teams),
+    )
+
+
+class SnapshotStore:
+    def __init__(self, max_age_seconds: float):
+        self.max_age_seconds = max_age_seconds
+        self.snapshot = None
+        self.built_at = 0.0
+        self._dirty_team_ids = set()
+        self._dirty_experiment_ids = set()
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def mark_dirty(self, team_ids=(), experiment_ids=()):
+        with self._lock:
+            self._dirty_team_ids.update(uuid.UUID(str(value)) for value in team_ids)
+            self._dirty_experiment_ids.update(
+                uuid.UUID(str(value)) for value in experiment_ids
+            )
+
+    def clear(self):
+        with self._lock:
+            self.snapshot = None
+            self._dirty_team_ids.clear()
+            self._dirty_experiment_ids.clear()
+
+    def current(self) -> AssignmentSnapshot | None:
+        is_expired = time.monotonic() - self.built_at > self.max_age_seconds
+        if is_expired or self._has_dirty_ids():
+            return None
+        return self.snapshot
+
+    def get(self, db: Session) -> AssignmentSnapshot:
+        snapshot = self.snapshot
+        is_expired = time.monotonic() - self.built_at > self.max_age_seconds
+        if snapshot and not is_expired and not self._has_dirty_ids():
+            return snapshot
+        if not self._refresh_lock.acquire(blocking=False):
+            return snapshot or build_snapshot(db)
+
+        try:
+            with self._lock:
+                team_ids, self._dirty_team_ids = self._dirty_team_ids, set()
+                experiment_ids, self._dirty_experiment_ids = (
+                    self._dirty_experiment_ids,
+                    set(),
+                )
+            try:
+                if snapshot and not is_expired:
+                    snapshot = refresh_snapshot(db, snapshot, team_ids, experiment_ids)
+                else:
+                    snapshot = None
+                if snapshot is None:
+                    built_at = time.monotonic()
+                    snapshot = build_snapshot(db)
+                    self.built_at = built_at
+            except Exception:
+                self.mark_dirty(team_ids, experiment_ids)
+                raise
+            self.snapshot = snapshot
+            return snapshot
+        finally:
+            self._refresh_lock.release()
+
+    def _has_dirty_ids(self) -> bool:
+        return bool(self._dirty_team_ids or self._dirty_experiment_ids)
+
+
+snapshot_store = SnapshotStore(float(os.getenv("SNAPSHOT_MAX_AGE_SECONDS", "60")))
+
+
+def mark_dirty(team_ids=(), experiment_ids=()):
+    snapshot_store.mark_dirty(team_ids, experiment_ids)
+
+
+def get_current_snapshot() -> AssignmentSnapshot | None:
+    return snapshot_store.current()
+
+
+def get_snapshot(db: Session) -> AssignmentSnapshot:
+    return snapshot_store.get(db)
+
+
+def _invert(
+    team_experiments: tuple[tuple[int, ...], ...], experiment_count: int
+) -> tuple[tuple[int, ...], ...]:
+    experiment_teams = [[] for _ in range(experiment_count)]
+    for team, experiments in enumerate(team_experiments):
+        for experiment in experiments:
+            experiment_teams[experiment].append(team)
+    return tuple(tuple(teams) for teams in experiment_teams)
+
+
+def _little_endian(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _padded_size(size: int) -> int:
+    return (size + 7) // 8 * 8
+
+
+def _pad(section: bytes) -> bytes:
+    return section + b"\x00" * (_padded_size(len(section)) - len(section))
@@ -5,10 +5,15 @@ from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
 
-from src.database import Base
-from src.main import app, get_db
+from src.cache import LRUCache, set_cache
+from src.crud.team_closure import rebuild_team_closure
+from src.database import Base, configure_engine, get_engine_options
+from src.main import app, get_db, get_session_factory
+from src.search import search_index_store
+from src.snapshot import snapshot_store
 from src.models import Experiment, Team
 
 from .utils import (
@@ -20,9 +25,20 @@ from .utils import (
 
 load_dotenv()
 
-TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+TEST_DATABASE_URL = make_url(os.getenv("TEST_DATABASE_URL"))
 
-engine = create_engine(TEST_DATABASE_URL)
+engine = create_engine(
+    TEST_DATABASE_URL,
+    **(
+        get_engine_options(TEST_DATABASE_URL, is_async=False)
+        if TEST_DATABASE_URL.get_backend_name() == "sqlite"
+        else {}
+    ),
+)
+configure_engine(engine)
+
+IS_POSTGRESQL = engine.dialect.name == "postgresql"
+requires_postgresql = pytest.mark.skipif(not IS_POSTGRESQL, reason="needs PostgreSQL")
 
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -52,6 +68,10 @@ def test_client(db_session):
             db_session.close()
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_session_factory] = lambda: lambda: db_session
+    set_cache(LRUCache(max_entries=128, ttl_seconds=60))
+    snapshot_store.clear()
+    search_index_store.clear()
     with TestClient(app) as test_client:
         yield test_client
 
@@ -67,6 +87,8 @@ def create_basic_records(db_session):
     db_session.add(team_parent)
     db_session.add(team_child)
     db_session.add(team_without_parent)
+    db_session.flush()
+    rebuild_team_closure(db_session)
     db_session.commit()
     db_session.refresh(team_parent)
     db_session.refresh(team_child)
@@ -95,5 +117,8 @@ def create_basic_records(db_session):
     db_session.commit()
     db_session.refresh(experiment1)
     db_session.refresh(experiment2)
+    db_session.refresh(team_parent)
+    db_session.refresh(team_child)
+    db_session.refresh(team_without_parent)
 
     yield team_parent, team_child, team_without_parent, experiment1, experiment2
@@ -0,0 +1,89 @@
+import asyncio
+import os
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from src.crud import aio
+from src.export import ExperimentRecords, stream_export_async
+from src.messages import TEAM_CREATED_SUCCESFULLY_MSG
+
+from .conftest import requires_postgresql
+from .utils import TEST_EXPERIMENT_DESCRIPTION, TEST_TEAM_CHILD_NAME, TEST_TEAM_NAME
+
+pytestmark = requires_postgresql
+
+
+def run_in_rolled_back_session(test):
+    async def run():
+        url = make_url(os.getenv("TEST_DATABASE_URL"))
+        engine = create_async_engine(url.set(drivername="postgresql+asyncpg"))
+        try:
+            async with engine.connect() as connection:
+                transaction = await connection.begin()
+                session = AsyncSession(bind=connection, expire_on_commit=False)
+                try:
+                    await test(session)
+                finally:
+                    await session.close()
+                    await transaction.rollback()
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_async_create_and_get_teams():
+    async def test(session):
+        parent = await aio.create_team(session, TEST_TEAM_NAME, None)
+        assert parent["message"] == TEAM_CREATED_SUCCESFULLY_MSG
+        await aio.create_team(session, TEST_TEAM_CHILD_NAME, parent["team_id"])
+
+        teams, next_cursor = await aio.get_teams(session, 10)
+        assert [team.name for team in teams] == [TEST_TEAM_CHILD_NAME, TEST_TEAM_NAME]
+        assert str(teams[0].parent_team) == parent["team_id"]
+        assert next_cursor is None
+
+    run_in_rolled_back_session(test)
+
+
+def test_async_create_experiment_and_update_assignments():
+    async def test(session):
+        first = await aio.create_team(session, TEST_TEAM_NAME, None)
+        second = await aio.create_team(session, TEST_TEAM_CHILD_NAME, None)
+        created = await aio.create_experiment(
+            session, TEST_EXPERIMENT_DESCRIPTION, 0.5, 1, [first["team_id"]]
+        )
+
+        await aio.update_assignments(
+            session, created["experiment_id"], [second["team_id"]]
+        )
+
+        experiments, _ = await aio.get_experiments(session, TEST_TEAM_CHILD_NAME, 10)
+        assert [str(experiment.id) for experiment in experiments] == [
+            created["experiment_id"]
+        ]
+        assert [team.name for team in experiments[0].teams] == [TEST_TEAM_CHILD_NAME]
+
+    run_in_rolled_back_session(test)
+
+
+def test_async_stream_export():
+    async def test(session):
+        team = await aio.create_team(session, TEST_TEAM_NAME, None)
+        created = await aio.create_experiment(
+            session, TEST_EXPERIMENT_DESCRIPTION, 0.5, 1, [team["team_id"]]
+        )
+
+        chunks = [
+            chunk
+            async for chunk in stream_export_async(
+                lambda: session, ExperimentRecords(), "csv"
+            )
+        ]
+        assert "".join(chunks).splitlines()[1:] == [
+            f"{created['experiment_id']},{TEST_EXPERIMENT_DESCRIPTION},0.5,1,"
+            f"{team['team_id']}"
+        ]
+
+    run_in_rolled_back_session(test)
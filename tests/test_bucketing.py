@@ -0,0 +1,76 @@
+import uuid
+
+from src.bucketing import hash_unit, hash_units, is_unit_in_sample, units_in_sample
+from src.config import MAX_UNIT_ID_LENGTH
+from src.messages import EXPERIMENT_NOT_FOUND_ERROR
+
+from .utils import get_random_id
+
+UNIT_IDS = ["", "a", "ü", "user\x00", "user-1", "x" * 100] + [
+    f"user-{number}" for number in range(1000)
+]
+
+
+def test_hash_is_stable():
+    experiment_id = uuid.UUID("00000000-0000-0000-0000-000000000001")
+    assert hash_unit(experiment_id, "user-1") == 0x79B03D61AD2BD147
+
+
+def test_vectorized_hash_matches_scalar_hash():
+    experiment_id = get_random_id()
+    hashes = hash_units(experiment_id, UNIT_IDS)
+    assert [int(value) for value in hashes] == [
+        hash_unit(experiment_id, unit_id) for unit_id in UNIT_IDS
+    ]
+    assert units_in_sample(experiment_id, UNIT_IDS, 0.3).tolist() == [
+        is_unit_in_sample(experiment_id, unit_id, 0.3) for unit_id in UNIT_IDS
+    ]
+    assert len(hash_units(experiment_id, [])) == 0
+
+
+def test_units_in_sample_follows_sample_ratio():
+    unit_ids = [str(get_random_id()) for _ in range(20000)]
+    experiment_id = get_random_id()
+
+    assert not units_in_sample(experiment_id, unit_ids, 0.0).any()
+    assert units_in_sample(experiment_id, unit_ids, 1.0).all()
+    assert abs(units_in_sample(experiment_id, unit_ids, 0.25).mean() - 0.25) < 0.02
+
+    smaller = units_in_sample(experiment_id, unit_ids, 0.1)
+    larger = units_in_sample(experiment_id, unit_ids, 0.5)
+    assert not (smaller & ~larger).any()
+
+
+def test_bucket_units(test_client, create_basic_records):
+    experiment1 = create_basic_records[3]
+    experiment_id = experiment1.id
+    unit_ids = [f"user-{number}" for number in range(100)]
+
+    response = test_client.post(
+        f"/experiments/{experiment_id}/bucket", json={"unit_ids": unit_ids}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["sample_ratio"] == 0.5
+    assert data["in_sample"] == [
+        is_unit_in_sample(experiment_id, unit_id, 0.5) for unit_id in unit_ids
+    ]
+
+
+def test_bucket_units_for_not_existing_experiment(test_client):
+    response = test_client.post(
+        f"/experiments/{get_random_id()}/bucket", json={"unit_ids": ["user-1"]}
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"] == EXPERIMENT_NOT_FOUND_ERROR
+
+
+def test_bucket_units_rejects_overlong_unit_ids(test_client, create_basic_records):
+    experiment_id = create_basic_records[3].id
+    unit_ids = ["user-1", "x" * (MAX_UNIT_ID_LENGTH + 1)]
+
+    response = test_client.post(
+        f"/experiments/{experiment_id}/bucket", json={"unit_ids": unit_ids}
+    )
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "unit_ids", 1]
@@ -0,0 +1,143 @@
+import asyncio
+
+from src.cache import LRUCache, RedisCache, set_cache
+from src.config import NEXT_CURSOR_HEADER
+
+from .utils import TEST_TEAM_NAME, FakeRedis, count_queries
+
+
+def test_read_teams_is_served_from_cache(test_client, db_session, create_basic_records):
+    first = test_client.get("/teams/")
+    with count_queries(db_session.connection()) as statements:
+        second = test_client.get("/teams/")
+
+    assert second.status_code == 200
+    assert second.content == first.content
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert statements == []
+
+
+def test_read_teams_returns_not_modified_for_matching_etag(
+    test_client, create_basic_records
+):
+    response = test_client.get("/teams/", params={"limit": 1})
+    etag = response.headers["ETag"]
+
+    response = test_client.get(
+        "/teams/", params={"limit": 1}, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+    assert NEXT_CURSOR_HEADER in response.headers
+
+
+def test_create_team_invalidates_teams_cache(test_client, create_basic_records):
+    response = test_client.get("/teams/")
+    etag = response.headers["ETag"]
+
+    test_client.post("/teams/", json={"name": TEST_TEAM_NAME})
+
+    response = test_client.get("/teams/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert TEST_TEAM_NAME in [team["name"] for team in response.json()]
+
+
+def test_update_assignments_invalidates_experiments_cache(
+    test_client, create_basic_records
+):
+    team_parent, _, _, experiment1, _ = create_basic_records
+    experiment_id = str(experiment1.id)
+    team_parent_id = str(team_parent.id)
+
+    response = test_client.get("/experiments/")
+    assert len(response.json()[0]["teams"]) == 1
+
+    test_client.put(
+        f"/experiments/{experiment_id}/teams", params={"team_ids": [team_parent_id]}
+    )
+
+    response = test_client.get("/experiments/")
+    experiment = next(e for e in response.json() if e["id"] == experiment_id)
+    assert [team["id"] for team in experiment["teams"]] == [team_parent_id]
+
+
+def test_create_experiment_invalidates_teams_cache(test_client, create_basic_records):
+    team_parent = create_basic_records[0]
+    team_parent_id = str(team_parent.id)
+
+    response = test_client.get("/teams/")
+    team = next(t for t in response.json() if t["id"] == team_parent_id)
+    assert team["experiments"] == []
+
+    test_client.post(
+        "/experiments/",
+        json={
+            "description": "Cached experiment",
+            "sample_ratio": 0.5,
+            "allowed_team_assignments": 1,
+            "team_ids": [team_parent_id],
+        },
+    )
+
+    response = test_client.get("/teams/")
+    team = next(t for t in response.json() if t["id"] == team_parent_id)
+    assert [e["description"] for e in team["experiments"]] == ["Cached experiment"]
+
+
+def test_redis_cache_backend(test_client, create_basic_records):
+    redis = FakeRedis()
+    set_cache(RedisCache(redis, ttl_seconds=60))
+
+    first = test_client.get("/teams/")
+    assert any(key.startswith("team-assignments:teams:0:") for key in redis.values)
+
+    test_client.post("/teams/", json={"name": TEST_TEAM_NAME})
+    assert redis.values["team-assignments:generation:teams"] == 1
+
+    second = test_client.get("/teams/")
+    assert second.headers["ETag"] != first.headers["ETag"]
+
+
+def test_redis_cache_is_not_called_on_the_event_loop(test_client, create_basic_records):
+    class LoopCheckingRedis(FakeRedis):
+        def __init__(self):
+            super().__init__()
+            self.calls_on_loop = []
+
+        def get(self, key):
+            self.calls_on_loop.append(running_on_event_loop())
+            return super().get(key)
+
+        def set(self, key, value, ex=None):
+            self.calls_on_loop.append(running_on_event_loop())
+            super().set(key, value, ex)
+
+    redis = LoopCheckingRedis()
+    set_cache(RedisCache(redis, ttl_seconds=60))
+
+    assert test_client.get("/teams/").status_code == 200
+    assert test_client.get("/teams/").status_code == 200
+    assert redis.calls_on_loop == [False] * 5
+
+
+def running_on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def test_lru_cache_evicts_least_recently_used_and_expired_entries():
+    cache = LRUCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    cache.get("a")
+    cache.set("c", b"3")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1"
+
+    cache = LRUCache(max_entries=2, ttl_seconds=-1)
+    cache.set("a", b"1")
+    assert cache.get("a") is None
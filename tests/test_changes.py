@@ -0,0 +1,140 @@
+import asyncio
+import threading
+
+from src.changes import (
+    ASSIGNMENTS_UPDATED,
+    CREATED,
+    EXPERIMENT_ENTITY,
+    KEEPALIVE_EVENT,
+    TEAM_ENTITY,
+    ChangeNotifier,
+    stream_changes,
+)
+
+from .utils import TEST_EXPERIMENT_DESCRIPTION, TEST_TEAM_CHILD_NAME, TEST_TEAM_NAME
+
+
+def create_changes(test_client) -> tuple[str, str, str]:
+    first = test_client.post("/teams/", json={"name": TEST_TEAM_NAME}).json()
+    second = test_client.post("/teams/", json={"name": TEST_TEAM_CHILD_NAME}).json()
+    experiment = test_client.post(
+        "/experiments/",
+        json={
+            "description": TEST_EXPERIMENT_DESCRIPTION,
+            "sample_ratio": 0.5,
+            "allowed_team_assignments": 1,
+            "team_ids": [first["team_id"]],
+        },
+    ).json()
+    test_client.put(
+        f"/experiments/{experiment['experiment_id']}/teams",
+        params={"team_ids": [second["team_id"]]},
+    )
+    return first["team_id"], second["team_id"], experiment["experiment_id"]
+
+
+def test_mutations_are_recorded_in_order(test_client):
+    first_id, second_id, experiment_id = create_changes(test_client)
+
+    response = test_client.get("/changes")
+    assert response.status_code == 200
+    page = response.json()
+    changes = page["changes"]
+
+    assert [
+        (change["entity"], change["entity_id"], change["operation"])
+        for change in changes
+    ] == [
+        (TEAM_ENTITY, first_id, CREATED),
+        (TEAM_ENTITY, second_id, CREATED),
+        (EXPERIMENT_ENTITY, experiment_id, CREATED),
+        (EXPERIMENT_ENTITY, experiment_id, ASSIGNMENTS_UPDATED),
+    ]
+    assert changes[0]["payload"] == {"name": TEST_TEAM_NAME, "parent_team_id": None}
+    assert changes[2]["payload"]["team_ids"] == [first_id]
+    assert changes[3]["payload"] == {
+        "team_ids": [second_id],
+        "previous_team_ids": [first_id],
+    }
+    seqs = [change["seq"] for change in changes]
+    assert seqs == sorted(seqs)
+    assert page["next_since"] == seqs[-1]
+
+
+def test_changes_are_read_incrementally(test_client):
+    create_changes(test_client)
+    first_page = test_client.get("/changes", params={"limit": 3}).json()
+    assert len(first_page["changes"]) == 3
+
+    second_page = test_client.get(
+        "/changes", params={"since": first_page["next_since"]}
+    ).json()
+    assert len(second_page["changes"]) == 1
+
+    last_page = test_client.get(
+        "/changes", params={"since": second_page["next_since"], "wait": 0.05}
+    ).json()
+    assert last_page == {"changes": [], "next_since": second_page["next_since"]}
+
+
+def test_failed_mutations_are_not_recorded(test_client):
+    test_client.post("/teams/", json={"name": TEST_TEAM_NAME})
+    test_client.post("/teams/", json={"name": TEST_TEAM_NAME})
+
+    changes = test_client.get("/changes").json()["changes"]
+    assert len(changes) == 1
+
+
+def test_notifier_wakes_waiters_from_other_threads():
+    notifier = ChangeNotifier()
+
+    async def wait():
+        version = notifier.version
+        threading.Timer(0.05, notifier.notify).start()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await notifier.wait(version, timeout=5)
+        return loop.time() - started
+
+    assert asyncio.run(wait()) < 1
+
+
+def test_notifier_returns_immediately_after_missed_notification():
+    notifier = ChangeNotifier()
+    version = notifier.version
+    notifier.notify()
+
+    asyncio.run(asyncio.wait_for(notifier.wait(version, timeout=5), 1))
+
+
+def test_stream_changes_sends_server_sent_events(test_client, db_session):
+    create_changes(test_client)
+    changes = test_client.get("/changes").json()["changes"]
+
+    async def read_events():
+        events = []
+        stream = stream_changes(
+            lambda: db_session, False, changes[1]["seq"], disconnected_after(1)
+        )
+        async for event in stream:
+            events.append(event)
+        return events
+
+    events = asyncio.run(read_events())
+    assert [event.split("\n")[:2] for event in events] == [
+        [f"id: {changes[2]['seq']}", "event: change"],
+        [f"id: {changes[3]['seq']}", "event: change"],
+    ]
+    assert all(event.endswith("\n\n") for event in events)
+    assert KEEPALIVE_EVENT not in events
+
+
+def disconnected_after(polls: int):
+    calls = 0
+
+    async def is_disconnected():
+        nonlocal calls
+        calls += 1
+        return calls > polls
+
+    return is_disconnected
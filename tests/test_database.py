@@ -0,0 +1,50 @@
+import pytest
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+
+from src.database import Base, configure_engine, get_engine_options
+from src.models import Team
+from src.pool_metrics import InstrumentedQueuePool, InstrumentedStaticPool
+
+from .utils import TEST_TEAM_NAME, get_random_id
+
+
+def test_in_memory_sqlite_shares_one_connection():
+    options = get_engine_options(make_url("sqlite://"), is_async=False)
+    assert options["poolclass"] is InstrumentedStaticPool
+    assert options["connect_args"] == {"check_same_thread": False}
+
+
+def test_sqlite_file_uses_a_queue_pool(tmp_path):
+    options = get_engine_options(
+        make_url(f"sqlite:///{tmp_path / 'app.db'}"), is_async=False
+    )
+    assert options["poolclass"] is InstrumentedQueuePool
+
+
+def test_sqlite_engine_enforces_foreign_keys_and_supports_savepoints(tmp_path):
+    url = make_url(f"sqlite:///{tmp_path / 'app.db'}")
+    engine = create_engine(url, **get_engine_options(url, is_async=False))
+    configure_engine(engine)
+    Base.metadata.create_all(bind=engine)
+    try:
+        with engine.connect() as connection:
+            with pytest.raises(IntegrityError):
+                with connection.begin_nested():
+                    connection.execute(
+                        insert(Team).values(
+                            id=get_random_id(),
+                            name=TEST_TEAM_NAME,
+                            parent_team=get_random_id(),
+                        )
+                    )
+
+            team_id = get_random_id()
+            connection.execute(
+                insert(Team).values(id=str(team_id), name=TEST_TEAM_NAME)
+            )
+            assert connection.scalar(select(Team.id)) == team_id
+            connection.rollback()
+    finally:
+        engine.dispose()
@@ -1,19 +1,32 @@
-from src.config import MAX_ALLOWED_TEAMS, MIN_ALLOWED_TEAMS
+from src.config import (
+    MAX_ALLOWED_TEAMS,
+    MAX_LOOKUP_TEAMS,
+    MIN_ALLOWED_TEAMS,
+    NEXT_CURSOR_HEADER,
+)
 from src.main import app
 from src.messages import (
     ASSIGNMENTS_UPDATED_MSG,
     CANNOT_ASSIGN_CHILD_WITH_PARENT_TO_EXPERIMENT_ERROR,
     EXPERIMENT_CREATED_SUCCESSFULLY_MSG,
+    EXPERIMENT_DUPLICATED_IN_BATCH_ERROR,
     EXPERIMENT_NOT_FOUND_ERROR,
+    EXPERIMENTS_CREATED_SUCCESSFULLY_MSG,
     INVALID_ASSIGNMENTS_AMOUNT,
+    INVALID_CURSOR_ERROR,
     TEAMS_NOT_FOUND,
     VALUE_OF_ALLOWED_TEAM_ASSIGNMNETS_RANGE_ERROR,
 )
+from src.models import Experiment
 
+from .conftest import IS_POSTGRESQL
 from .utils import (
     TEST_EXPERIMENT_DESCRIPTION,
     TEST_TEAM_CHILD_NAME,
+    TEST_TEAM_NAME,
+    TEST_TEAM_PARENT_NAME,
     TEST_TEAM_WITHOUT_PARENT_NAME,
+    count_queries,
     get_random_id,
 )
 
@@ -177,7 +190,9 @@ def test_get_teams_with_filter(test_client, create_basic_records):
     assert len(data[0]["teams"]) == 1
     assert data[0]["teams"][0]["name"] == TEST_TEAM_WITHOUT_PARENT_NAME
     assert len(data[1]["teams"]) == 2
-    assert data[1]["teams"][0]["name"] == TEST_TEAM_WITHOUT_PARENT_NAME
+    assert TEST_TEAM_WITHOUT_PARENT_NAME in [
+        team["name"] for team in data[1]["teams"]
+    ]
 
 
 def test_get_teams_with_filter_child_name(test_client, create_basic_records):
@@ -188,7 +203,9 @@ def test_get_teams_with_filter_child_name(test_client, create_basic_records):
     data = response.json()
     assert len(data) == 1
     assert len(data[0]["teams"]) == 2
-    assert data[0]["teams"][0]["name"] == TEST_TEAM_WITHOUT_PARENT_NAME
+    assert TEST_TEAM_WITHOUT_PARENT_NAME in [
+        team["name"] for team in data[0]["teams"]
+    ]
 
 
 def test_get_teams_with_filter_not_existing_name(test_client, create_basic_records):
@@ -228,3 +245,383 @@ def test_update_assignments_with_not_existing_experiment(
     data = response.json()
     assert response.status_code == 404
     assert data["detail"] == EXPERIMENT_NOT_FOUND_ERROR
+
+
+def test_get_experiments_pagination(test_client, create_basic_records):
+    *_, experiment1, experiment2 = create_basic_records
+    response = test_client.get("/experiments/", params={"limit": 1})
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data) == 1
+    assert data[0]["description"] == experiment1.description
+    next_cursor = response.headers[NEXT_CURSOR_HEADER]
+
+    response = test_client.get(
+        "/experiments/", params={"limit": 1, "cursor": next_cursor}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data) == 1
+    assert data[0]["description"] == experiment2.description
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+
+def test_get_experiments_pagination_reaches_experiments_without_description(
+    test_client, db_session, create_basic_records
+):
+    untitled_ids = sorted(get_random_id() for _ in range(3))
+    db_session.add_all(
+        Experiment(id=experiment_id, sample_ratio=0.5, allowed_team_assignments=1)
+        for experiment_id in untitled_ids
+    )
+    db_session.commit()
+
+    pages = []
+    params = {"limit": 2}
+    while True:
+        response = test_client.get("/experiments/", params=params)
+        assert response.status_code == 200
+        pages.append([experiment["id"] for experiment in response.json()])
+        if NEXT_CURSOR_HEADER not in response.headers:
+            break
+        params["cursor"] = response.headers[NEXT_CURSOR_HEADER]
+
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [experiment_id for page in pages for experiment_id in page][2:] == [
+        str(experiment_id) for experiment_id in untitled_ids
+    ]
+
+
+def test_get_experiments_with_invalid_cursor(test_client, create_basic_records):
+    response = test_client.get("/experiments/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == INVALID_CURSOR_ERROR
+
+
+def test_get_experiments_limit_counts_experiments_not_team_rows(
+    test_client, create_basic_records
+):
+    team_parent, team_child, team_without_parent, experiment1, _ = create_basic_records
+    experiment1_description = experiment1.description
+    team_ids = [str(team_parent.id), str(team_without_parent.id)]
+    multi_team_descriptions = ["A multi-team experiment", "B multi-team experiment"]
+    for description in multi_team_descriptions:
+        response_data = {
+            "description": description,
+            "sample_ratio": 0.5,
+            "allowed_team_assignments": 2,
+            "team_ids": team_ids,
+        }
+        response = test_client.post("/experiments/", json=response_data)
+        assert response.status_code == 201
+
+    response = test_client.get("/experiments/", params={"limit": 3})
+    assert response.status_code == 200
+    data = response.json()
+    assert [experiment["description"] for experiment in data] == [
+        *multi_team_descriptions,
+        experiment1_description,
+    ]
+    assert all(len(experiment["teams"]) == 2 for experiment in data[:2])
+    assert NEXT_CURSOR_HEADER in response.headers
+
+
+def test_get_experiments_with_filter_including_descendants(
+    test_client, create_basic_records
+):
+    team_parent, team_child, *_ = create_basic_records
+    team_child_id = str(team_child.id)
+
+    response = test_client.post(
+        "/teams/", json={"name": TEST_TEAM_NAME, "parent_team_id": team_child_id}
+    )
+    grandchild_id = response.json()["team_id"]
+    response_data = {
+        "description": TEST_EXPERIMENT_DESCRIPTION,
+        "sample_ratio": 0.5,
+        "allowed_team_assignments": 1,
+        "team_ids": [grandchild_id],
+    }
+    test_client.post("/experiments/", json=response_data)
+
+    response = test_client.get(
+        "/experiments/", params={"team_name": TEST_TEAM_PARENT_NAME}
+    )
+    assert [experiment["description"] for experiment in response.json()] == [
+        "Experiment 2"
+    ]
+
+    response = test_client.get(
+        "/experiments/",
+        params={"team_name": TEST_TEAM_PARENT_NAME, "include_descendants": True},
+    )
+    assert response.status_code == 200
+    assert [experiment["description"] for experiment in response.json()] == [
+        "Experiment 2",
+        TEST_EXPERIMENT_DESCRIPTION,
+    ]
+
+
+def test_get_experiments_by_teams(test_client, db_session, create_basic_records):
+    team_parent, team_child, team_without_parent, *_ = create_basic_records
+    missing_id = str(get_random_id())
+
+    with count_queries(db_session.get_bind()) as statements:
+        response = test_client.post(
+            "/experiments/by-teams",
+            json={
+                "team_names": [
+                    TEST_TEAM_PARENT_NAME,
+                    TEST_TEAM_WITHOUT_PARENT_NAME,
+                    "Missing team",
+                ],
+                "team_ids": [str(team_child.id), missing_id],
+            },
+        )
+    assert response.status_code == 200
+    assert len(statements) == 1
+
+    data = response.json()
+    assert {
+        team: [experiment["description"] for experiment in experiments]
+        for team, experiments in data["teams"].items()
+    } == {
+        TEST_TEAM_PARENT_NAME: ["Experiment 2"],
+        TEST_TEAM_WITHOUT_PARENT_NAME: ["Experiment 1", "Experiment 2"],
+        str(team_child.id): ["Experiment 2"],
+    }
+    assert data["teams"][TEST_TEAM_WITHOUT_PARENT_NAME][0] == {
+        "id": str(create_basic_records[3].id),
+        "description": "Experiment 1",
+        "sample_ratio": 0.5,
+        "allowed_team_assignments": 1,
+    }
+    assert data["unresolved_names"] == ["Missing team"]
+    assert data["unresolved_ids"] == [missing_id]
+
+
+def test_get_experiments_by_teams_including_descendants(
+    test_client, create_basic_records
+):
+    team_parent, team_child, *_ = create_basic_records
+    team_parent_id = str(team_parent.id)
+    response = test_client.post(
+        "/teams/",
+        json={"name": TEST_TEAM_NAME, "parent_team_id": str(team_child.id)},
+    )
+    test_client.post(
+        "/experiments/",
+        json={
+            "description": TEST_EXPERIMENT_DESCRIPTION,
+            "sample_ratio": 0.5,
+            "allowed_team_assignments": 1,
+            "team_ids": [response.json()["team_id"]],
+        },
+    )
+
+    def lookup(include_descendants: bool) -> list[str]:
+        response = test_client.post(
+            "/experiments/by-teams",
+            json={
+                "team_ids": [team_parent_id],
+                "include_descendants": include_descendants,
+            },
+        )
+        return [
+            experiment["description"]
+            for experiment in response.json()["teams"][team_parent_id]
+        ]
+
+    assert lookup(False) == ["Experiment 2"]
+    assert lookup(True) == ["Experiment 2", TEST_EXPERIMENT_DESCRIPTION]
+
+
+def test_get_experiments_by_teams_limits_the_lookup(test_client):
+    response = test_client.post(
+        "/experiments/by-teams",
+        json={"team_names": [str(index) for index in range(MAX_LOOKUP_TEAMS + 1)]},
+    )
+    assert response.status_code == 422
+
+
+def test_create_experiment_validation_of_assigning_team_and_its_grandchild(
+    test_client, create_basic_records
+):
+    team_parent, team_child, *_ = create_basic_records
+    team_parent_id = str(team_parent.id)
+    team_child_id = str(team_child.id)
+
+    response = test_client.post(
+        "/teams/", json={"name": TEST_TEAM_NAME, "parent_team_id": team_child_id}
+    )
+    grandchild_id = response.json()["team_id"]
+
+    response_data = {
+        "description": TEST_EXPERIMENT_DESCRIPTION,
+        "sample_ratio": 0.5,
+        "allowed_team_assignments": 2,
+        "team_ids": [grandchild_id, team_parent_id],
+    }
+    response = test_client.post("/experiments/", json=response_data)
+    assert response.status_code == 400
+    assert response.json()["detail"] == CANNOT_ASSIGN_CHILD_WITH_PARENT_TO_EXPERIMENT_ERROR
+
+
+def test_create_experiments_bulk(test_client, create_basic_records):
+    team_parent, team_child, team_without_parent, *_ = create_basic_records
+    response_data = [
+        {
+            "description": "Bulk experiment 1",
+            "sample_ratio": 0.1,
+            "allowed_team_assignments": 1,
+            "team_ids": [str(team_parent.id)],
+        },
+        {
+            "description": "Bulk experiment 2",
+            "sample_ratio": 0.2,
+            "allowed_team_assignments": 2,
+            "team_ids": [str(team_child.id), str(team_without_parent.id)],
+        },
+    ]
+    response = test_client.post("/experiments/bulk", json=response_data)
+    assert response.status_code == 201
+    data = response.json()
+    assert data["message"] == EXPERIMENTS_CREATED_SUCCESSFULLY_MSG
+    assert len(data["experiment_ids"]) == 2
+
+    response = test_client.get("/experiments/")
+    teams_by_description = {
+        experiment["description"]: len(experiment["teams"])
+        for experiment in response.json()
+    }
+    assert teams_by_description["Bulk experiment 1"] == 1
+    assert teams_by_description["Bulk experiment 2"] == 2
+
+
+def test_create_experiments_bulk_is_rejected_as_a_whole(
+    test_client, create_basic_records
+):
+    team_parent, team_child, *_ = create_basic_records
+    not_existing_team_id = str(get_random_id())
+    response_data = [
+        {
+            "description": "Valid experiment",
+            "sample_ratio": 0.1,
+            "allowed_team_assignments": 1,
+            "team_ids": [str(team_parent.id)],
+        },
+        {
+            "description": "Parent and child",
+            "sample_ratio": 0.2,
+            "allowed_team_assignments": 2,
+            "team_ids": [str(team_parent.id), str(team_child.id)],
+        },
+        {
+            "description": "Not existing team",
+            "sample_ratio": 0.3,
+            "allowed_team_assignments": 1,
+            "team_ids": [not_existing_team_id],
+        },
+    ]
+    response = test_client.post("/experiments/bulk", json=response_data)
+    assert response.status_code == 400
+    assert response.json()["detail"] == [
+        {
+            "index": 1,
+            "status_code": 400,
+            "detail": CANNOT_ASSIGN_CHILD_WITH_PARENT_TO_EXPERIMENT_ERROR,
+        },
+        {
+            "index": 2,
+            "status_code": 404,
+            "detail": TEAMS_NOT_FOUND.format(ids={not_existing_team_id}),
+        },
+    ]
+
+    response = test_client.get("/experiments/")
+    assert len(response.json()) == 2
+
+
+def test_update_assignments_bulk(test_client, create_basic_records):
+    (
+        team_parent,
+        team_child,
+        team_without_parent,
+        experiment1,
+        experiment2,
+    ) = create_basic_records
+    experiment1_id = str(experiment1.id)
+    experiment2_id = str(experiment2.id)
+    team_parent_id = str(team_parent.id)
+    team_without_parent_id = str(team_without_parent.id)
+
+    response_data = [
+        {"experiment_id": experiment1_id, "team_ids": [team_parent_id]},
+        {
+            "experiment_id": experiment2_id,
+            "team_ids": [team_parent_id, team_without_parent_id],
+        },
+    ]
+    response = test_client.put("/experiments/assignments/bulk", json=response_data)
+    assert response.status_code == 200
+    assert response.json()["message"] == ASSIGNMENTS_UPDATED_MSG
+
+    response = test_client.get("/experiments/")
+    team_ids_by_experiment = {
+        experiment["id"]: {team["id"] for team in experiment["teams"]}
+        for experiment in response.json()
+    }
+    assert team_ids_by_experiment == {
+        experiment1_id: {team_parent_id},
+        experiment2_id: {team_parent_id, team_without_parent_id},
+    }
+
+
+def test_update_assignments_bulk_validation(test_client, create_basic_records):
+    team_parent, *_, experiment1, experiment2 = create_basic_records
+    experiment1_id = str(experiment1.id)
+    team_parent_id = str(team_parent.id)
+
+    response_data = [
+        {"experiment_id": experiment1_id, "team_ids": [team_parent_id]},
+        {"experiment_id": experiment1_id, "team_ids": [team_parent_id]},
+        {"experiment_id": str(get_random_id()), "team_ids": [team_parent_id]},
+    ]
+    response = test_client.put("/experiments/assignments/bulk", json=response_data)
+    assert response.status_code == 400
+    assert [
+        (error["index"], error["detail"]) for error in response.json()["detail"]
+    ] == [
+        (1, EXPERIMENT_DUPLICATED_IN_BATCH_ERROR),
+        (2, EXPERIMENT_NOT_FOUND_ERROR),
+    ]
+
+
+def test_update_assignments_query_count_is_constant(
+    test_client, db_session, create_basic_records
+):
+    (
+        team_parent,
+        team_child,
+        team_without_parent,
+        experiment1,
+        experiment2,
+    ) = create_basic_records
+    single_team_update = (str(experiment1.id), [str(team_parent.id)])
+    two_teams_update = (
+        str(experiment2.id),
+        [str(team_parent.id), str(team_without_parent.id)],
+    )
+
+    query_counts = []
+    for experiment_id, team_ids in (single_team_update, two_teams_update):
+        with count_queries(db_session.get_bind()) as statements:
+            response = test_client.put(
+                f"/experiments/{experiment_id}/teams", params={"team_ids": team_ids}
+            )
+        assert response.status_code == 200
+        query_counts.append(len(statements))
+
+    # PostgreSQL also takes the team hierarchy and change log advisory locks.
+    expected = 9 if IS_POSTGRESQL else 7
+    assert query_counts == [expected, expected]
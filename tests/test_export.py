@@ -0,0 +1,63 @@
+import csv
+import io
+import json
+
+from src import export
+
+from .utils import TEST_TEAM_CHILD_NAME
+
+
+def test_export_experiments_as_ndjson(test_client, create_basic_records):
+    _, team_child, team_without_parent, experiment1, experiment2 = (
+        create_basic_records
+    )
+    expected = {
+        str(experiment1.id): [str(team_without_parent.id)],
+        str(experiment2.id): sorted([str(team_child.id), str(team_without_parent.id)]),
+    }
+
+    response = test_client.get("/export/experiments")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert {row["id"]: row["team_ids"] for row in rows} == expected
+    assert set(rows[0]) == set(export.EXPERIMENT_EXPORT_COLUMNS)
+
+
+def test_export_experiments_groups_teams_across_batches(
+    test_client, create_basic_records, monkeypatch
+):
+    experiment2 = create_basic_records[4]
+    experiment2_id = str(experiment2.id)
+    monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 1)
+
+    response = test_client.get("/export/experiments")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == 2
+    assert len(next(row for row in rows if row["id"] == experiment2_id)["team_ids"]) == 2
+
+
+def test_export_teams_as_csv(test_client, create_basic_records):
+    team_parent, team_child = create_basic_records[:2]
+    team_parent_id = str(team_parent.id)
+    team_child_id = str(team_child.id)
+
+    response = test_client.get("/export/teams", params={"format": "csv"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert 'filename="teams.csv"' in response.headers["content-disposition"]
+
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 3
+    child = next(row for row in rows if row["id"] == team_child_id)
+    assert child == {
+        "id": team_child_id,
+        "name": TEST_TEAM_CHILD_NAME,
+        "parent_team_id": team_parent_id,
+    }
+
+
+def test_export_with_unsupported_format(test_client):
+    response = test_client.get("/export/teams", params={"format": "xml"})
+    assert response.status_code == 422
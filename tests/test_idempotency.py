@@ -0,0 +1,204 @@
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException
+from sqlalchemy import delete, func, select
+
+from src import idempotency
+from src.idempotency import REPLAYED_HEADER, claim_key, request_fingerprint
+from src.messages import (
+    IDEMPOTENCY_KEY_IN_PROGRESS_ERROR,
+    IDEMPOTENCY_KEY_REUSED_ERROR,
+    PARENT_TEAM_NOT_FOUND_ERROR,
+)
+from src.models import Experiment, IdempotencyKey
+
+from .conftest import TestingSessionLocal, requires_postgresql
+from .utils import (
+    TEST_EXPERIMENT_DESCRIPTION,
+    TEST_TEAM_NAME,
+    TEST_TEAM_PARENT_NAME,
+    get_random_id,
+)
+
+
+def experiment_payload(team_id) -> dict:
+    return {
+        "description": TEST_EXPERIMENT_DESCRIPTION,
+        "sample_ratio": 0.5,
+        "allowed_team_assignments": 1,
+        "team_ids": [str(team_id)],
+    }
+
+
+def test_retried_create_experiment_is_replayed(
+    test_client, db_session, create_basic_records
+):
+    _, _, team_without_parent, *_ = create_basic_records
+    payload = experiment_payload(team_without_parent.id)
+    headers = {"Idempotency-Key": "create-experiment-1"}
+
+    first = test_client.post("/experiments/", json=payload, headers=headers)
+    second = test_client.post("/experiments/", json=payload, headers=headers)
+
+    assert first.status_code == second.status_code == 201
+    assert second.content == first.content
+    assert REPLAYED_HEADER not in first.headers
+    assert second.headers[REPLAYED_HEADER] == "true"
+    assert db_session.scalar(
+        select(func.count()).where(
+            Experiment.description == TEST_EXPERIMENT_DESCRIPTION
+        )
+    ) == 1
+
+
+def test_response_is_stored_with_the_created_rows(
+    test_client, db_session, create_basic_records, monkeypatch
+):
+    def fail_separate_store(*args):
+        raise RuntimeError("the response must be stored by the create transaction")
+
+    monkeypatch.setattr(idempotency, "store_response", fail_separate_store)
+    _, _, team_without_parent, *_ = create_basic_records
+    payload = experiment_payload(team_without_parent.id)
+    headers = {"Idempotency-Key": "create-in-one-transaction"}
+
+    experiment = test_client.post("/experiments/", json=payload, headers=headers)
+    team = test_client.post("/teams/", json={"name": TEST_TEAM_NAME}, headers=headers)
+    assert experiment.status_code == team.status_code == 201
+
+    for endpoint, response in (("/experiments/", experiment), ("/teams/", team)):
+        stored = db_session.get(IdempotencyKey, ("create-in-one-transaction", endpoint))
+        assert stored.status_code == 201
+        assert stored.response_body == response.content
+
+
+def test_response_without_created_rows_is_stored(test_client, create_basic_records):
+    headers = {"Idempotency-Key": "create-or-get-1"}
+    request = {
+        "json": {"name": TEST_TEAM_PARENT_NAME},
+        "params": {"create_or_get": True},
+        "headers": headers,
+    }
+
+    first = test_client.post("/teams/", **request)
+    second = test_client.post("/teams/", **request)
+
+    assert first.status_code == second.status_code == 200
+    assert second.content == first.content
+    assert second.headers[REPLAYED_HEADER] == "true"
+
+
+def test_idempotency_keys_are_scoped_per_endpoint(test_client):
+    headers = {"Idempotency-Key": "shared-key"}
+
+    team = test_client.post("/teams/", json={"name": TEST_TEAM_NAME}, headers=headers)
+    experiment = test_client.post(
+        "/experiments/",
+        json=experiment_payload(team.json()["team_id"]),
+        headers=headers,
+    )
+
+    assert team.status_code == experiment.status_code == 201
+    assert REPLAYED_HEADER not in experiment.headers
+
+
+def test_reused_key_with_different_request_is_rejected(test_client):
+    headers = {"Idempotency-Key": "create-team-1"}
+    test_client.post("/teams/", json={"name": TEST_TEAM_NAME}, headers=headers)
+
+    response = test_client.post(
+        "/teams/", json={"name": f"{TEST_TEAM_NAME} 2"}, headers=headers
+    )
+
+    assert response.status_code == 422
+    assert response.json()["detail"] == IDEMPOTENCY_KEY_REUSED_ERROR
+
+
+def test_request_in_progress_returns_conflict(test_client, db_session):
+    body = b'{"name": "Test Team"}'
+    db_session.add(
+        IdempotencyKey(
+            key="create-team-2",
+            endpoint="/teams/",
+            request_hash=request_fingerprint("POST", "", body),
+            expires_at=datetime.now(timezone.utc) + timedelta(minutes=1),
+        )
+    )
+    db_session.commit()
+
+    response = test_client.post(
+        "/teams/",
+        content=body,
+        headers={
+            "Idempotency-Key": "create-team-2",
+            "Content-Type": "application/json",
+        },
+    )
+
+    assert response.status_code == 409
+    assert response.json()["detail"] == IDEMPOTENCY_KEY_IN_PROGRESS_ERROR
+
+
+def test_failed_request_releases_key(test_client, db_session):
+    payload = {"name": TEST_TEAM_NAME, "parent_team_id": str(get_random_id())}
+    headers = {"Idempotency-Key": "create-team-3"}
+
+    first = test_client.post("/teams/", json=payload, headers=headers)
+    second = test_client.post("/teams/", json=payload, headers=headers)
+
+    assert first.status_code == second.status_code == 404
+    assert second.json()["detail"] == PARENT_TEAM_NOT_FOUND_ERROR
+    assert db_session.get(IdempotencyKey, ("create-team-3", "/teams/")) is None
+
+
+def test_expired_key_is_claimed_again(test_client, db_session):
+    db_session.add(
+        IdempotencyKey(
+            key="create-team-4",
+            endpoint="/teams/",
+            request_hash="0" * 64,
+            status_code=201,
+            response_body=b"{}",
+            expires_at=datetime.now(timezone.utc) - timedelta(seconds=1),
+        )
+    )
+    db_session.commit()
+
+    response = test_client.post(
+        "/teams/",
+        json={"name": TEST_TEAM_NAME},
+        headers={"Idempotency-Key": "create-team-4"},
+    )
+
+    assert response.status_code == 201
+    assert REPLAYED_HEADER not in response.headers
+
+
+@requires_postgresql
+def test_concurrent_claims_admit_one_request():
+    key = f"concurrent-{uuid.uuid4()}"
+    barrier = threading.Barrier(2)
+    outcomes = []
+
+    def claim():
+        with TestingSessionLocal() as db:
+            barrier.wait()
+            try:
+                outcomes.append(claim_key(db, key, "/teams/", "0" * 64))
+            except HTTPException as e:
+                outcomes.append(e.status_code)
+
+    threads = [threading.Thread(target=claim) for _ in range(2)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        with TestingSessionLocal() as db:
+            db.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key))
+            db.commit()
+
+    assert sorted(outcomes, key=str) == [409, None]
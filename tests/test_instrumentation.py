@@ -0,0 +1,65 @@
+import logging
+import re
+
+from src import instrumentation
+
+from .utils import count_queries
+
+SERVER_TIMING_PATTERN = re.compile(
+    r'^db;desc="(\d+) statements";dur=[\d.]+, total;dur=[\d.]+$'
+)
+
+
+def get_timed_statements(response) -> int:
+    match = SERVER_TIMING_PATTERN.match(response.headers["Server-Timing"])
+    assert match is not None
+    return int(match.group(1))
+
+
+def test_server_timing_reports_statements_per_request(
+    test_client, db_session, create_basic_records
+):
+    with count_queries(db_session.connection()) as statements:
+        response = test_client.get("/teams/")
+
+    assert response.status_code == 200
+    assert get_timed_statements(response) == len(statements) > 0
+
+    response = test_client.get("/teams/")
+    assert get_timed_statements(response) == 0
+
+
+def test_server_timing_is_added_to_error_responses(test_client):
+    response = test_client.get(
+        "/snapshot/teams/00000000-0000-0000-0000-000000000000/experiments"
+    )
+
+    assert response.status_code == 404
+    assert get_timed_statements(response) > 0
+
+
+def test_slow_queries_are_logged(
+    test_client, create_basic_records, monkeypatch, caplog
+):
+    monkeypatch.setattr(instrumentation, "SLOW_QUERY_THRESHOLD_MS", 0)
+
+    with caplog.at_level(logging.WARNING, logger=instrumentation.__name__):
+        test_client.get("/teams/")
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert any("FROM teams" in message for message in messages)
+    assert not any("Plan:" in message for message in messages)
+
+
+def test_slow_queries_are_explained_when_enabled(
+    test_client, create_basic_records, monkeypatch, caplog
+):
+    monkeypatch.setattr(instrumentation, "SLOW_QUERY_THRESHOLD_MS", 0)
+    monkeypatch.setattr(instrumentation, "SLOW_QUERY_EXPLAIN", True)
+
+    with caplog.at_level(logging.WARNING, logger=instrumentation.__name__):
+        response = test_client.get("/teams/")
+
+    assert response.status_code == 200
+    assert any("Plan:" in record.getMessage() for record in caplog.records)
+    assert len(response.json()) == 3
@@ -0,0 +1,127 @@
+import os
+import subprocess
+import sys
+
+from prometheus_client import REGISTRY
+from prometheus_client.parser import text_string_to_metric_families
+from sqlalchemy import create_engine
+
+from src.pool_metrics import InstrumentedQueuePool
+
+
+def get_sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_metrics_endpoint_reports_entity_counts(test_client, create_basic_records):
+    response = test_client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("text/plain")
+    samples = {
+        sample.name: sample.value
+        for family in text_string_to_metric_families(response.text)
+        for sample in family.samples
+    }
+    assert samples["teams"] == 3
+    assert samples["experiments"] == 2
+
+
+def test_requests_are_recorded_per_route(test_client, create_basic_records):
+    labels = {"method": "GET", "route": "/teams/"}
+    requests = get_sample(
+        "http_request_duration_seconds_count", status="200", **labels
+    )
+    statements = get_sample("http_request_db_statements_total", **labels)
+
+    test_client.get("/teams/", params={"limit": 2})
+
+    assert (
+        get_sample("http_request_duration_seconds_count", status="200", **labels)
+        == requests + 1
+    )
+    assert get_sample("http_request_db_duration_seconds_count", **labels) > 0
+    assert get_sample("http_request_db_statements_total", **labels) > statements
+
+
+def test_unmatched_requests_share_one_route_label(test_client):
+    labels = {"method": "GET", "route": "unmatched", "status": "404"}
+    requests = get_sample("http_request_duration_seconds_count", **labels)
+
+    test_client.get("/does-not-exist")
+
+    assert get_sample("http_request_duration_seconds_count", **labels) == requests + 1
+
+
+def test_failed_checks_are_counted(test_client, create_basic_records):
+    _, _, team_without_parent, experiment1, _ = create_basic_records
+    check = "check_if_assignments_exist"
+    failures = get_sample("assignment_validation_failures_total", check=check)
+
+    response = test_client.put(
+        f"/experiments/{experiment1.id}/teams",
+        params={"team_ids": [str(team_without_parent.id)]},
+    )
+
+    assert response.status_code == 400
+    assert (
+        get_sample("assignment_validation_failures_total", check=check)
+        == failures + 1
+    )
+
+
+def test_pool_checkouts_are_recorded():
+    pool = InstrumentedQueuePool.__name__
+    checkouts = get_sample("db_pool_checkout_duration_seconds_count", pool=pool)
+    in_use = get_sample("db_pool_connections_in_use", pool=pool)
+    engine = create_engine(
+        os.getenv("TEST_DATABASE_URL"), poolclass=InstrumentedQueuePool
+    )
+    try:
+        with engine.connect():
+            assert get_sample("db_pool_connections_in_use", pool=pool) == in_use + 1
+    finally:
+        engine.dispose()
+
+    assert (
+        get_sample("db_pool_checkout_duration_seconds_count", pool=pool)
+        == checkouts + 1
+    )
+    assert get_sample("db_pool_connections_in_use", pool=pool) == in_use
+
+
+def test_metrics_are_aggregated_across_processes(tmp_path):
+    record_failure = (
+        "from fastapi import HTTPException\n"
+        "from src.crud.experiment import check_if_experiment_exists\n"
+        "try:\n"
+        "    check_if_experiment_exists(None)\n"
+        "except HTTPException:\n"
+        "    pass\n"
+    )
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", record_failure], env=env, check=True)
+
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys\n"
+            "from src.metrics import render_metrics\n"
+            "sys.stdout.buffer.write(render_metrics())\n",
+        ],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+
+    samples = {
+        (sample.name, sample.labels.get("check")): sample.value
+        for family in text_string_to_metric_families(output)
+        for sample in family.samples
+    }
+    assert samples[
+        ("assignment_validation_failures_total", "check_if_experiment_exists")
+    ] == 2
@@ -0,0 +1,46 @@
+import os
+from pathlib import Path
+
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine, text
+
+from src.database import Base
+from src.models import include_object
+
+from .conftest import requires_postgresql
+
+ALEMBIC_INI = Path(__file__).resolve().parents[1] / "alembic.ini"
+MIGRATIONS_SCHEMA = "migrations_test"
+
+
+@requires_postgresql
+def test_migrations_match_models():
+    engine = create_engine(os.getenv("TEST_DATABASE_URL"))
+    with engine.connect() as connection:
+        connection.execute(text(f"DROP SCHEMA IF EXISTS {MIGRATIONS_SCHEMA} CASCADE"))
+        connection.execute(text(f"CREATE SCHEMA {MIGRATIONS_SCHEMA}"))
+        connection.execute(text(f"SET search_path TO {MIGRATIONS_SCHEMA}"))
+        connection.commit()
+
+        config = Config(ALEMBIC_INI)
+        config.attributes["connection"] = connection
+        config.attributes["configure_logger"] = False
+        try:
+            command.upgrade(config, "head")
+            assert compare_metadata(
+                MigrationContext.configure(
+                    connection, opts={"include_object": include_object}
+                ),
+                Base.metadata,
+            ) == []
+            connection.commit()
+
+            command.downgrade(config, "base")
+        finally:
+            connection.rollback()
+            connection.execute(text(f"DROP SCHEMA {MIGRATIONS_SCHEMA} CASCADE"))
+            connection.commit()
+    engine.dispose()
@@ -0,0 +1,52 @@
+import os
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+
+from src.database import SQLALCHEMY_DATABASE_URL, get_engine_options
+from src.pool_metrics import InstrumentedQueuePool
+
+
+def test_pool_metrics_endpoint(test_client):
+    response = test_client.get("/health/db-pool")
+    assert response.status_code == 200
+    metrics = response.json()["sync"]
+    pool_class = get_engine_options(
+        make_url(SQLALCHEMY_DATABASE_URL), is_async=False
+    )["poolclass"]
+    assert metrics["pool_class"] == pool_class.__name__
+    assert {"in_use", "waits"} <= set(metrics)
+    if pool_class is InstrumentedQueuePool:
+        assert {"size", "checked_in", "overflow"} <= set(metrics)
+
+
+def test_pool_metrics_record_checkouts_and_waits():
+    engine = create_engine(
+        os.getenv("TEST_DATABASE_URL"),
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+    )
+    try:
+        connection = engine.connect()
+        assert engine.pool.get_metrics()["in_use"] == 1
+
+        def wait_for_connection():
+            with engine.connect():
+                pass
+
+        waiting = threading.Thread(target=wait_for_connection)
+        waiting.start()
+        time.sleep(0.1)
+        connection.close()
+        waiting.join()
+
+        metrics = engine.pool.get_metrics()
+        assert metrics["checkouts"] == 2
+        assert metrics["waits"] == 1
+        assert metrics["in_use"] == 0
+        assert metrics["checkout_seconds_max"] >= 0.1
+    finally:
+        engine.dispose()
@@ -0,0 +1,194 @@
+import pytest
+from sqlalchemy import event
+
+from src.search import (
+    DescriptionIndex,
+    SearchIndexStore,
+    has_pg_trgm,
+    search_experiments,
+)
+
+from .conftest import requires_postgresql
+from .utils import get_random_id
+
+DESCRIPTIONS = [
+    "Checkout button colour",
+    "New checkout flow",
+    "Recommendation carousel",
+    "Search ranking for 100% of users",
+]
+
+
+def create_experiments(test_client, descriptions=DESCRIPTIONS):
+    team_id = test_client.post("/teams/", json={"name": str(get_random_id())}).json()[
+        "team_id"
+    ]
+    response = test_client.post(
+        "/experiments/bulk",
+        json=[
+            {
+                "description": description,
+                "sample_ratio": 0.5,
+                "allowed_team_assignments": 1,
+                "team_ids": [team_id],
+            }
+            for description in descriptions
+        ],
+    )
+    assert response.status_code == 201
+
+
+def search(test_client, q, **params):
+    response = test_client.get("/experiments/search", params={"q": q, **params})
+    assert response.status_code == 200
+    return [result["description"] for result in response.json()]
+
+
+def test_search_ranks_prefix_matches_first(test_client):
+    create_experiments(test_client)
+
+    assert search(test_client, "checkout") == [
+        "Checkout button colour",
+        "New checkout flow",
+    ]
+    assert search(test_client, "checkout", limit=1) == ["Checkout button colour"]
+
+
+def test_search_tolerates_typos(test_client):
+    create_experiments(test_client)
+
+    response = test_client.get("/experiments/search", params={"q": "recomendation"})
+    results = response.json()
+    assert [result["description"] for result in results] == [
+        "Recommendation carousel"
+    ]
+    assert 0 < results[0]["score"] < 1
+    assert search(test_client, "unrelated words") == []
+
+
+def test_search_by_prefix(test_client):
+    create_experiments(test_client)
+
+    assert search(test_client, "NEW CH", prefix=True) == ["New checkout flow"]
+    assert search(test_client, "checkout flow", prefix=True) == []
+    assert search(test_client, "search ranking for 100%", prefix=True) == [
+        "Search ranking for 100% of users"
+    ]
+    assert search(test_client, "search ranking for 1_", prefix=True) == []
+
+
+def test_search_sees_new_experiments(test_client):
+    create_experiments(test_client)
+    assert search(test_client, "pricing") == []
+
+    create_experiments(test_client, ["Pricing page layout"])
+    assert search(test_client, "pricing") == ["Pricing page layout"]
+    assert search(test_client, "pricing", prefix=True) == ["Pricing page layout"]
+
+
+def test_search_validates_parameters(test_client):
+    assert test_client.get("/experiments/search").status_code == 422
+    assert test_client.get("/experiments/search", params={"q": ""}).status_code == 422
+    assert (
+        test_client.get(
+            "/experiments/search", params={"q": "checkout", "limit": 0}
+        ).status_code
+        == 422
+    )
+    assert search(test_client, "   ") == []
+
+
+class Row:
+    def __init__(self, id, description):
+        self.id = id
+        self.description = description
+        self.sample_ratio = 0.5
+        self.allowed_team_assignments = 1
+
+
+def test_description_index_replaces_updated_rows():
+    experiment_id = get_random_id()
+    index = DescriptionIndex()
+    index.add([Row(experiment_id, "Old name"), Row(get_random_id(), None)])
+    index.add([Row(experiment_id, "New name")])
+
+    assert index.search("old", 10) == []
+    assert index.search_prefix("old", 10) == []
+    assert [result.id for result in index.search("name", 10)] == [experiment_id]
+    assert [result.id for result in index.search_prefix("new", 10)] == [
+        experiment_id
+    ]
+
+
+def test_description_index_finds_substrings_without_shared_trigrams():
+    experiment_id = get_random_id()
+    index = DescriptionIndex()
+    index.add([Row(experiment_id, "next checkout"), Row(get_random_id(), None)])
+
+    assert [result.id for result in index.search("x", 10)] == [experiment_id]
+    assert [result.id for result in index.search("t c", 10)] == [experiment_id]
+    assert index.search("z", 10) == []
+
+
+def test_search_matches_queries_without_trigrams(test_client):
+    create_experiments(test_client)
+
+    assert search(test_client, "%") == ["Search ranking for 100% of users"]
+    assert search(test_client, "x") == []
+
+
+def test_search_index_store_does_not_block_while_querying(
+    db_session, create_basic_records
+):
+    *_, experiment1, experiment2 = create_basic_records
+    store = SearchIndexStore(max_age_seconds=60)
+    index_locked = []
+
+    def before_cursor_execute(*args):
+        index_locked.append(store._index_lock.locked())
+
+    connection = db_session.connection()
+    event.listen(connection, "before_cursor_execute", before_cursor_execute)
+    try:
+        assert len(store.search(db_session, "experiment", 10, False)) == 2
+        store.mark_dirty([experiment1.id])
+        assert len(store.search(db_session, "experiment", 10, False)) == 2
+
+        # A search that finds another refresh in progress does not wait for it.
+        store.mark_dirty([experiment2.id])
+        with store._refresh_lock:
+            assert len(store.search(db_session, "experiment", 10, False)) == 2
+    finally:
+        event.remove(connection, "before_cursor_execute", before_cursor_execute)
+
+    assert index_locked == [False, False]
+
+
+def test_search_index_store_answers_from_database_while_first_build_runs(
+    db_session, create_basic_records
+):
+    store = SearchIndexStore(max_age_seconds=60)
+
+    with store._refresh_lock:
+        assert len(store.search(db_session, "experiment", 10, False)) == 2
+        assert len(store.search(db_session, "EXPERIMENT", 10, True)) == 2
+        assert store.search(db_session, "experiment_", 10, True) == []
+        from_database = store.search(db_session, "xp", 10, False)
+    assert store.index is None
+
+    assert len(from_database) == 2
+    assert store.search(db_session, "xp", 10, False) == from_database
+    assert store.index is not None
+
+
+@requires_postgresql
+def test_search_uses_pg_trgm_when_installed(test_client, db_session):
+    if not has_pg_trgm(db_session):
+        pytest.skip("pg_trgm is not installed")
+    create_experiments(test_client)
+
+    results = search_experiments(db_session, "recomendation", 10)
+    assert [result.description for result in results] == ["Recommendation carousel"]
+    assert [
+        result.description for result in search_experiments(db_session, "checkout", 10)
+    ] == ["Checkout button colour", "New checkout flow"]
@@ -0,0 +1,120 @@
+import uuid
+
+import pytest
+
+from src.messages import TEAM_NOT_FOUND_ERROR
+from src.snapshot import build_snapshot, load_snapshot, snapshot_store
+
+from .utils import TEST_TEAM_NAME, count_queries, get_random_id
+
+
+def snapshot_experiments(snapshot):
+    return {
+        team_id: sorted(snapshot.get_team_experiments(team_id))
+        for team_id in snapshot.team_ids
+    }
+
+
+def test_read_snapshot_team_experiments_includes_ancestors(
+    test_client, create_basic_records
+):
+    team_parent, team_child, _, _, experiment2 = create_basic_records
+    team_parent_id = str(team_parent.id)
+    team_child_id = str(team_child.id)
+    experiment2_id = str(experiment2.id)
+
+    response = test_client.post(
+        "/experiments/",
+        json={
+            "description": TEST_TEAM_NAME,
+            "sample_ratio": 0.1,
+            "allowed_team_assignments": 1,
+            "team_ids": [team_parent_id],
+        },
+    )
+    experiment_id = response.json()["experiment_id"]
+
+    response = test_client.get(f"/snapshot/teams/{team_child_id}/experiments")
+    assert response.status_code == 200
+    assert response.json()["experiments"] == [
+        {
+            "id": experiment2_id,
+            "sample_ratio": 0.8,
+            "assigned_team_id": team_child_id,
+        },
+        {
+            "id": experiment_id,
+            "sample_ratio": 0.1,
+            "assigned_team_id": team_parent_id,
+        },
+    ]
+
+
+def test_read_snapshot_team_experiments_for_not_existing_team(test_client):
+    response = test_client.get(f"/snapshot/teams/{get_random_id()}/experiments")
+    assert response.status_code == 404
+    assert response.json()["detail"] == TEAM_NOT_FOUND_ERROR
+
+
+def test_snapshot_is_refreshed_incrementally_after_writes(
+    test_client, db_session, create_basic_records
+):
+    team_parent, team_child, team_without_parent, experiment1, _ = (
+        create_basic_records
+    )
+    team_parent_id = str(team_parent.id)
+    team_child_id = str(team_child.id)
+    team_without_parent_id = str(team_without_parent.id)
+    experiment1_id = str(experiment1.id)
+    test_client.get(f"/snapshot/teams/{team_child_id}/experiments")
+    version = snapshot_store.snapshot.version
+
+    response = test_client.post(
+        "/teams/", json={"name": TEST_TEAM_NAME, "parent_team_id": team_child_id}
+    )
+    team_id = response.json()["team_id"]
+    test_client.put(
+        f"/experiments/{experiment1_id}/teams", params={"team_ids": [team_parent_id]}
+    )
+
+    with count_queries(db_session.connection()) as statements:
+        response = test_client.get(f"/snapshot/teams/{team_id}/experiments")
+    assert len(statements) == 3
+    assert all(" IN (" in statement for statement in statements)
+    assert response.json()["snapshot_version"] > version
+    assert experiment1_id in [
+        experiment["id"] for experiment in response.json()["experiments"]
+    ]
+
+    response = test_client.get(f"/snapshot/teams/{team_without_parent_id}/experiments")
+    assert experiment1_id not in [
+        experiment["id"] for experiment in response.json()["experiments"]
+    ]
+    assert snapshot_experiments(snapshot_store.snapshot) == snapshot_experiments(
+        build_snapshot(db_session)
+    )
+
+
+def test_export_snapshot(test_client, db_session, create_basic_records):
+    response = test_client.get("/snapshot/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/octet-stream"
+
+    snapshot = load_snapshot(response.content)
+    assert snapshot.version == int(response.headers["X-Snapshot-Version"])
+    assert snapshot_experiments(snapshot) == snapshot_experiments(
+        build_snapshot(db_session)
+    )
+    assert len(response.content) % 8 == 0
+
+
+def test_load_snapshot_rejects_invalid_blobs(db_session, create_basic_records):
+    blob = build_snapshot(db_session).to_bytes()
+
+    with pytest.raises(ValueError):
+        load_snapshot(b"NOTASNAP" + blob[8:])
+    with pytest.raises(ValueError):
+        load_snapshot(blob[:-8])
+    with pytest.raises(ValueError):
+        load_snapshot(blob[:8] + (2).to_bytes(4, "little") + blob[12:])
+    assert isinstance(load_snapshot(blob).team_ids[0], uuid.UUID)
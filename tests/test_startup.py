@@ -0,0 +1,50 @@
+import json
+import os
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+from src import database
+from src.main import create_app
+
+IMPORT_TIME_BUDGET_SECONDS = 2.0
+UNREACHABLE_DATABASE_URL = "postgresql://nobody@unreachable.invalid:5432/nothing"
+
+
+def test_importing_the_app_is_fast_and_does_not_touch_the_database():
+    env = {**os.environ, "DATABASE_URL": UNREACHABLE_DATABASE_URL}
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import json, sys, time\n"
+            "started = time.perf_counter()\n"
+            "import src.main\n"
+            "elapsed = time.perf_counter() - started\n"
+            "print(json.dumps({\n"
+            "    'elapsed': elapsed,\n"
+            "    'engine': src.main.SessionLocal.kw.get('bind') is not None,\n"
+            "    'modules': sorted({'numpy', 'psycopg2', 'asyncpg'} & set(sys.modules)),\n"
+            "}))\n",
+        ],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    result = json.loads(output)
+
+    assert not result["engine"]
+    assert result["modules"] == []
+    assert result["elapsed"] < IMPORT_TIME_BUDGET_SECONDS
+
+
+def test_lifespan_creates_and_disposes_engines():
+    with TestClient(create_app()) as client:
+        assert database.engine is not None
+        assert database.SessionLocal.kw["bind"] is database.engine
+        assert client.get("/").status_code == 200
+
+    assert database.engine is None
+    assert database.get_pool_metrics() == {}
@@ -1,14 +1,44 @@
+import asyncio
+import json
+import threading
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import delete, select
+
+from src import bulk_import
+from src.bulk_import import parse_team_row, read_team_import
+from src.config import NEXT_CURSOR_HEADER
+from src.crud.team import create_team, import_teams, update_team_parent
+from src.crud.team_closure import lock_team_hierarchy, move_team_in_closure
 from src.messages import (
+    CANNOT_ASSIGN_CHILD_WITH_PARENT_TO_EXPERIMENT_ERROR,
+    CANNOT_MOVE_TEAM_UNDER_ITS_DESCENDANT_ERROR,
+    INVALID_IMPORT_ROW_ERROR,
     PARENT_TEAM_NOT_FOUND_ERROR,
+    PARENT_TEAM_NOT_IMPORTED_ERROR,
+    TEAM_ALREADY_EXISTS_MSG,
     TEAM_CREATED_SUCCESFULLY_MSG,
+    TEAM_EXISTS_WITH_DIFFERENT_PARENT_ERROR,
+    TEAM_NAME_DUPLICATED_IN_IMPORT_ERROR,
+    TEAM_NOT_FOUND_ERROR,
+    TEAM_PARENT_CYCLE_IN_IMPORT_ERROR,
+    TEAM_PARENT_UPDATED_MSG,
     TEAM_WITH_NAME_EXISTS,
+    TEAMS_IMPORTED_MSG,
+    UNSUPPORTED_IMPORT_FORMAT_ERROR,
 )
+from src.models import ChangeLog, Team, team_closure
 
+from .conftest import IS_POSTGRESQL, TestingSessionLocal, requires_postgresql
 from .utils import (
+    TEST_EXPERIMENT_DESCRIPTION,
     TEST_TEAM_CHILD_NAME,
     TEST_TEAM_NAME,
     TEST_TEAM_PARENT_NAME,
     TEST_TEAM_WITHOUT_PARENT_NAME,
+    count_queries,
     get_random_id,
 )
 
@@ -55,14 +85,83 @@ def test_create_team_with_not_existing_parent(test_client):
     assert data["detail"] == PARENT_TEAM_NOT_FOUND_ERROR
 
 
-def test_create_team_with_not_unique_name(test_client, create_basic_records):
+def test_create_team_with_not_unique_name(
+    test_client, db_session, create_basic_records
+):
     response_data = {"name": TEST_TEAM_PARENT_NAME}
-    response = test_client.post("/teams/", json=response_data)
+    with count_queries(db_session.connection()) as statements:
+        response = test_client.post("/teams/", json=response_data)
+    assert len(statements) == (1 if IS_POSTGRESQL else 2)
     assert response.status_code == 400
     data = response.json()
     assert data["detail"] == TEAM_WITH_NAME_EXISTS
 
 
+@requires_postgresql
+def test_create_team_inserts_team_and_closure_in_one_statement(
+    test_client, db_session, create_basic_records
+):
+    team_parent, *_ = create_basic_records
+    team_parent_id = team_parent.id
+
+    with count_queries(db_session.connection()) as statements:
+        response = test_client.post(
+            "/teams/",
+            json={"name": TEST_TEAM_NAME, "parent_team_id": str(team_parent_id)},
+        )
+    assert response.status_code == 201
+    assert "pg_advisory_xact_lock_shared" in statements[0]
+    assert "INSERT INTO team_closure" in statements[1]
+    assert not any("INSERT INTO teams" in statement for statement in statements[2:])
+
+    team_id = response.json()["team_id"]
+    closure_rows = db_session.execute(
+        select(team_closure.c.ancestor_id, team_closure.c.depth).where(
+            team_closure.c.descendant_id == team_id
+        )
+    ).all()
+    assert sorted(closure_rows, key=lambda row: row.depth) == [
+        (uuid.UUID(team_id), 0),
+        (team_parent_id, 1),
+    ]
+
+
+def test_create_or_get_team_returns_existing_team(test_client, create_basic_records):
+    _, team_child, *_ = create_basic_records
+    team_child_id = str(team_child.id)
+    team_parent_id = str(team_child.parent_team)
+
+    response = test_client.post(
+        "/teams/",
+        params={"create_or_get": True},
+        json={"name": TEST_TEAM_CHILD_NAME, "parent_team_id": team_parent_id},
+    )
+    assert response.status_code == 200
+    assert response.json() == {
+        "message": TEAM_ALREADY_EXISTS_MSG,
+        "team_id": team_child_id,
+        "created": False,
+    }
+
+
+def test_create_or_get_team_creates_missing_team(test_client):
+    response = test_client.post(
+        "/teams/", params={"create_or_get": True}, json={"name": TEST_TEAM_NAME}
+    )
+    assert response.status_code == 201
+    assert response.json()["created"] is True
+
+
+def test_create_or_get_team_with_different_parent(test_client, create_basic_records):
+    response = test_client.post(
+        "/teams/",
+        params={"create_or_get": True},
+        json={"name": TEST_TEAM_CHILD_NAME},
+    )
+    assert response.status_code == 409
+    assert response.json()["detail"] == TEAM_EXISTS_WITH_DIFFERENT_PARENT_ERROR
+
+
 def test_get_teams_without_data(test_client):
     response = test_client.get("/teams/")
     assert response.status_code == 204
@@ -80,3 +179,317 @@ def test_get_teams_with_data(test_client, create_basic_records):
     assert data[1]["parent_team"] == None
     assert data[2]["name"] == TEST_TEAM_WITHOUT_PARENT_NAME
     assert data[2]["parent_team"] == None
+
+
+def test_get_teams_pagination(test_client, create_basic_records):
+    response = test_client.get("/teams/", params={"limit": 2})
+    assert response.status_code == 200
+    data = response.json()
+    assert [team["name"] for team in data] == [
+        TEST_TEAM_CHILD_NAME,
+        TEST_TEAM_PARENT_NAME,
+    ]
+
+    response = test_client.get(
+        "/teams/",
+        params={"limit": 2, "cursor": response.headers[NEXT_CURSOR_HEADER]},
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert [team["name"] for team in data] == [TEST_TEAM_WITHOUT_PARENT_NAME]
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+
+def test_update_team_parent(test_client, create_basic_records):
+    team_parent, _, team_without_parent, *_ = create_basic_records
+    team_parent_id = str(team_parent.id)
+    team_without_parent_id = str(team_without_parent.id)
+
+    response = test_client.put(
+        f"/teams/{team_without_parent_id}/parent",
+        json={"parent_team_id": team_parent_id},
+    )
+    assert response.status_code == 200
+    assert response.json()["message"] == TEAM_PARENT_UPDATED_MSG
+
+    response = test_client.get(
+        "/experiments/",
+        params={"team_name": TEST_TEAM_PARENT_NAME, "include_descendants": True},
+    )
+    assert len(response.json()) == 2
+
+    response = test_client.put(
+        f"/teams/{team_without_parent_id}/parent", json={"parent_team_id": None}
+    )
+    assert response.status_code == 200
+
+    response = test_client.get(
+        "/experiments/",
+        params={"team_name": TEST_TEAM_PARENT_NAME, "include_descendants": True},
+    )
+    assert len(response.json()) == 1
+
+
+def test_update_team_parent_to_own_descendant(test_client, create_basic_records):
+    team_parent, team_child, *_ = create_basic_records
+    response = test_client.put(
+        f"/teams/{team_parent.id}/parent", json={"parent_team_id": str(team_child.id)}
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == CANNOT_MOVE_TEAM_UNDER_ITS_DESCENDANT_ERROR
+
+
+def test_update_team_parent_to_team_sharing_experiment(
+    test_client, create_basic_records
+):
+    _, team_child, team_without_parent, *_ = create_basic_records
+    response = test_client.put(
+        f"/teams/{team_child.id}/parent",
+        json={"parent_team_id": str(team_without_parent.id)},
+    )
+    assert response.status_code == 400
+    assert (
+        response.json()["detail"] == CANNOT_ASSIGN_CHILD_WITH_PARENT_TO_EXPERIMENT_ERROR
+    )
+
+
+def test_update_parent_of_not_existing_team(test_client):
+    response = test_client.put(
+        f"/teams/{get_random_id()}/parent", json={"parent_team_id": None}
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"] == TEAM_NOT_FOUND_ERROR
+
+
+def test_import_teams_from_json_lines(test_client, create_basic_records):
+    team_parent, *_ = create_basic_records
+    team_parent_id = str(team_parent.id)
+    lines = [
+        {"name": "Grandchild", "parent_team": "Imported child"},
+        {"name": "Imported child", "parent_team": TEST_TEAM_PARENT_NAME},
+        {"name": "Imported root"},
+        {"name": TEST_TEAM_CHILD_NAME},
+        {"name": "Orphan", "parent_team": "Not existing team name"},
+        {"name": "Imported root"},
+    ]
+    body = "\n".join(json.dumps(line) for line in lines) + "\nnot json\n"
+    json_error = "Expecting value: line 1 column 1 (char 0)"
+    response = test_client.post(
+        "/teams/bulk",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 201
+    data = response.json()
+    assert data["message"] == TEAMS_IMPORTED_MSG
+    assert data["created"] == 3
+    assert [(error["line"], error["detail"]) for error in data["errors"]] == [
+        (4, TEAM_WITH_NAME_EXISTS),
+        (5, PARENT_TEAM_NOT_FOUND_ERROR),
+        (6, TEAM_NAME_DUPLICATED_IN_IMPORT_ERROR),
+        (7, INVALID_IMPORT_ROW_ERROR.format(error=json_error)),
+    ]
+
+    response = test_client.get("/teams/", params={"limit": 10})
+    parents = {team["name"]: team["parent_team"] for team in response.json()}
+    ids = {team["name"]: team["id"] for team in response.json()}
+    assert parents["Imported child"] == team_parent_id
+    assert parents["Grandchild"] == ids["Imported child"]
+    assert parents["Imported root"] is None
+
+    response_data = {
+        "description": TEST_EXPERIMENT_DESCRIPTION,
+        "sample_ratio": 0.5,
+        "allowed_team_assignments": 2,
+        "team_ids": [ids["Grandchild"], ids[TEST_TEAM_PARENT_NAME]],
+    }
+    response = test_client.post("/experiments/", json=response_data)
+    assert response.status_code == 400
+
+
+def test_import_teams_from_csv(test_client):
+    body = "name,parent_team\nChild,Root\nRoot,\nLoop A,Loop B\nLoop B,Loop A\n"
+    response = test_client.post(
+        "/teams/bulk", content=body, headers={"Content-Type": "text/csv"}
+    )
+    assert response.status_code == 201
+    data = response.json()
+    assert data["created"] == 2
+    assert [error["name"] for error in data["errors"]] == ["Loop A", "Loop B"]
+    assert {error["detail"] for error in data["errors"]} == {
+        TEAM_PARENT_CYCLE_IN_IMPORT_ERROR
+    }
+
+
+def test_import_teams_rejects_descendants_of_rows_with_unknown_parent(test_client):
+    body = "name,parent_team\nB,A\nC,B\nA,Not existing team name\n"
+    response = test_client.post(
+        "/teams/bulk", content=body, headers={"Content-Type": "text/csv"}
+    )
+    assert response.status_code == 201
+    data = response.json()
+    assert data["created"] == 0
+    assert [(error["name"], error["detail"]) for error in data["errors"]] == [
+        ("B", PARENT_TEAM_NOT_IMPORTED_ERROR),
+        ("C", PARENT_TEAM_NOT_IMPORTED_ERROR),
+        ("A", PARENT_TEAM_NOT_FOUND_ERROR),
+    ]
+
+
+def test_import_teams_from_csv_with_stray_quote(test_client):
+    body = 'name,parent_team\nO"Brien,\nB,O"Brien\n'
+    response = test_client.post(
+        "/teams/bulk", content=body, headers={"Content-Type": "text/csv"}
+    )
+    assert response.status_code == 201
+    assert response.json()["created"] == 2
+
+    response = test_client.get("/teams/", params={"limit": 10})
+    parents = {team["name"]: team["parent_team"] for team in response.json()}
+    ids = {team["name"]: team["id"] for team in response.json()}
+    assert parents == {'O"Brien': None, "B": ids['O"Brien']}
+
+
+def test_import_rows_are_parsed_as_lines_arrive(monkeypatch):
+    chunks = [b'name,parent_team\r\n"Multi\n', b'line",\r\nRo', b"ot,\r\n"]
+    chunks_read = []
+    parsed_after = []
+
+    class StreamingRequest:
+        headers = {"content-type": "text/csv"}
+
+        async def stream(self):
+            for chunk in chunks:
+                chunks_read.append(chunk)
+                yield chunk
+
+    def record_parse(line, data):
+        parsed_after.append(len(chunks_read))
+        return parse_team_row(line, data)
+
+    monkeypatch.setattr(bulk_import, "parse_team_row", record_parse)
+    rows, errors = asyncio.run(read_team_import(StreamingRequest()))
+
+    assert errors == []
+    assert rows == [
+        {"line": 3, "name": "Multi\nline", "parent_team": None},
+        {"line": 4, "name": "Root", "parent_team": None},
+    ]
+    assert parsed_after == [2, 3]
+
+
+def test_import_teams_with_unsupported_format(test_client):
+    response = test_client.post(
+        "/teams/bulk", content="name", headers={"Content-Type": "text/plain"}
+    )
+    assert response.status_code == 415
+    assert response.json()["detail"] == UNSUPPORTED_IMPORT_FORMAT_ERROR
+
+
+@requires_postgresql
+def test_crossing_moves_cannot_create_a_cycle():
+    with TestingSessionLocal() as db:
+        first_id = uuid.UUID(create_team(db, f"cycle-{uuid.uuid4()}", None)["team_id"])
+        second_id = uuid.UUID(create_team(db, f"cycle-{uuid.uuid4()}", None)["team_id"])
+    team_ids = [first_id, second_id]
+    barrier = threading.Barrier(2)
+    outcomes = []
+
+    def move(team_id, parent_team_id):
+        with TestingSessionLocal() as db:
+            barrier.wait()
+            try:
+                update_team_parent(db, team_id, parent_team_id)
+                outcomes.append(None)
+            except HTTPException as e:
+                outcomes.append(e.detail)
+
+    threads = [
+        threading.Thread(target=move, args=(first_id, second_id)),
+        threading.Thread(target=move, args=(second_id, first_id)),
+    ]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        delete_teams(team_ids)
+
+    assert sorted(outcomes, key=str) == [
+        CANNOT_MOVE_TEAM_UNDER_ITS_DESCENDANT_ERROR,
+        None,
+    ]
+
+
+def create_team_under(db, name, parent_team_id):
+    return create_team(db, name, parent_team_id)["team_id"]
+
+
+def import_team_under(db, name, parent_team_id):
+    parent_name = db.scalar(select(Team.name).where(Team.id == parent_team_id))
+    import_teams(db, [{"line": 2, "name": name, "parent_team": parent_name}])
+    return db.scalar(select(Team.id).where(Team.name == name))
+
+
+@requires_postgresql
+@pytest.mark.parametrize("add_team", [create_team_under, import_team_under])
+def test_new_team_waits_for_a_move_of_its_parent(add_team):
+    with TestingSessionLocal() as db:
+        old_root_id, new_root_id = (
+            uuid.UUID(create_team(db, f"move-{uuid.uuid4()}", None)["team_id"])
+            for _ in range(2)
+        )
+        parent_id = uuid.UUID(
+            create_team(db, f"move-{uuid.uuid4()}", old_root_id)["team_id"]
+        )
+    child_ids = []
+
+    def add_child():
+        with TestingSessionLocal() as db:
+            child_id = add_team(db, f"move-{uuid.uuid4()}", parent_id)
+            child_ids.append(uuid.UUID(str(child_id)))
+
+    thread = threading.Thread(target=add_child)
+    try:
+        with TestingSessionLocal() as mover:
+            lock_team_hierarchy(mover)
+            mover.query(Team).filter(Team.id == parent_id).update(
+                {"parent_team": new_root_id}
+            )
+            move_team_in_closure(mover, parent_id, new_root_id)
+
+            thread.start()
+            thread.join(timeout=0.5)
+            assert thread.is_alive()
+            mover.commit()
+        thread.join()
+
+        with TestingSessionLocal() as db:
+            closure_rows = db.execute(
+                select(team_closure.c.ancestor_id, team_closure.c.depth).where(
+                    team_closure.c.descendant_id == child_ids[0]
+                )
+            ).all()
+        assert sorted(closure_rows, key=lambda row: row.depth) == [
+            (child_ids[0], 0),
+            (parent_id, 1),
+            (new_root_id, 2),
+        ]
+    finally:
+        if thread.is_alive():
+            thread.join()
+        delete_teams([old_root_id, new_root_id, parent_id, *child_ids])
+
+
+def delete_teams(team_ids):
+    with TestingSessionLocal() as db:
+        db.execute(delete(ChangeLog).where(ChangeLog.entity_id.in_(team_ids)))
+        db.execute(
+            delete(team_closure).where(team_closure.c.descendant_id.in_(team_ids))
+        )
+        db.execute(
+            Team.__table__.update().where(Team.id.in_(team_ids)).values(parent_team=None)
+        )
+        db.execute(delete(Team).where(Team.id.in_(team_ids)))
+        db.commit()
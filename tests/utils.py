@@ -1,4 +1,7 @@
 import uuid
+from contextlib import contextmanager
+
+from sqlalchemy import event
 
 TEST_EXPERIMENT_DESCRIPTION = "Test Experiment"
 TEST_TEAM_NAME = "Test Team"
@@ -9,3 +12,32 @@ TEST_TEAM_WITHOUT_PARENT_NAME = "Team without parent"
 
 def get_random_id() -> uuid.UUID:
     return uuid.uuid4()
+
+
+@contextmanager
+def count_queries(connection):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(connection, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(connection, "before_cursor_execute", before_cursor_execute)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+
+    def incr(self, key):
+        self.values[key] = int(self.values.get(key, 0)) + 1
+        return self.values[key]